@@ -0,0 +1,175 @@
+import itertools
+import os
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from geo import with_stop_areas
+from records import from_wall_epoch
+
+# ----------------------------
+# ARRIVAL ARCHIVE
+# ----------------------------
+# Append-only Parquet archive of every GPS-backed arrival observation, one row per
+# (poll, stop, arrival) as a records.Arrival. Layout:
+#
+#   <archive_dir>/service_date=2026-02-05/route=23/part-103400-000001.parquet
+#
+# Segment files are never rewritten: the writer buffers rows and rolls a new file per
+# (service_date, route) once the buffer is big or old enough. The reader only opens the
+# partition folders for the dates/routes asked for.
+
+# Trips after midnight still belong to the previous service day
+SERVICE_DAY_START_HOUR = 3
+
+# Columns written for each records.Arrival. Parquet dictionary-encodes the repeated
+# strings (route, headsign, vehicle, ...) on its own.
+SCHEMA = pa.schema([
+    ("poll_time", pa.timestamp("s")),
+    ("stop_id", pa.string()),
+    ("id", pa.string()),
+    ("trip", pa.string()),
+    ("route", pa.string()),
+    ("headsign", pa.string()),
+    ("vehicle", pa.string()),
+    ("direction", pa.string()),
+    ("shape", pa.string()),
+    ("date", pa.string()),
+    ("stopTime", pa.string()),
+    ("stop_time", pa.timestamp("s")),
+    ("estimated", pa.int8()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("canceled", pa.int8()),
+])
+
+def service_date_for(ts: datetime) -> date:
+    return (ts - timedelta(hours=SERVICE_DAY_START_HOUR)).date()
+
+def partition_dir(archive_dir: Path, service_date: date, route: str) -> Path:
+    # quote() so routes like "A LINE" are safe folder names
+    return Path(archive_dir) / f"service_date={service_date.isoformat()}" / f"route={quote(route, safe='')}"
+
+def records_to_table(arrivals: list) -> pa.Table:
+    """Column-at-a-time conversion of records.Arrival objects to SCHEMA."""
+    columns = {}
+    for name in SCHEMA.names:
+        values = [getattr(a, name) for a in arrivals]
+        if name == "stop_time":
+            # 0 means the API date/stopTime didn't parse
+            values = [v or None for v in values]
+        columns[name] = values
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+# ----------------------------
+# WRITER
+# ----------------------------
+class ArchiveWriter:
+    def __init__(self, archive_dir: Path, segment_max_rows: int = 50_000,
+                 segment_max_seconds: float = 900):
+        self.archive_dir = Path(archive_dir)
+        self.segment_max_rows = segment_max_rows
+        self.segment_max_seconds = segment_max_seconds
+
+        self._buffers = {}  # (service_date, route) -> list of records.Arrival
+        self._rows = 0
+        self._opened_at = None
+        self._seq = itertools.count(1)
+
+    def append(self, arrivals):
+        """Buffer records.Arrival objects (one stop's GPS-backed arrivals from one poll)."""
+        if not arrivals:
+            return
+
+        poll_time = arrivals[0].poll_time
+        if self._opened_at is None:
+            self._opened_at = poll_time
+
+        key_date = service_date_for(from_wall_epoch(poll_time))
+        for a in arrivals:
+            self._buffers.setdefault((key_date, a.route or "unknown"), []).append(a)
+            self._rows += 1
+
+        if self._rows >= self.segment_max_rows:
+            self.flush()
+        elif poll_time - self._opened_at >= self.segment_max_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered partition to a new segment file."""
+        for (service_date, route), rows in self._buffers.items():
+            out_dir = partition_dir(self.archive_dir, service_date, route)
+            out_dir.mkdir(parents=True, exist_ok=True)
+
+            stamp = from_wall_epoch(rows[0].poll_time).strftime("%H%M%S")
+            path = out_dir / f"part-{stamp}-{next(self._seq):06d}-{os.getpid()}.parquet"
+            tmp = path.with_suffix(".parquet.tmp")
+
+            table = records_to_table(rows)
+            pq.write_table(table, tmp, compression="zstd")
+            # Readers never see a half-written segment
+            os.replace(tmp, path)
+
+        self._buffers = {}
+        self._rows = 0
+        self._opened_at = None
+
+    def close(self):
+        self.flush()
+
+# ----------------------------
+# READER
+# ----------------------------
+def list_partitions(archive_dir: Path, start_date: date, end_date: date = None, routes=None) -> list:
+    """(service_date, route, folder) for partitions inside [start_date, end_date]."""
+    end_date = end_date or start_date
+    wanted_routes = None if routes is None else {str(r) for r in routes}
+
+    found = []
+    for date_dir in sorted(Path(archive_dir).glob("service_date=*")):
+        d = date.fromisoformat(date_dir.name.split("=", 1)[1])
+        if not (start_date <= d <= end_date):
+            continue
+        for route_dir in sorted(date_dir.glob("route=*")):
+            route = unquote(route_dir.name.split("=", 1)[1])
+            if wanted_routes is None or route in wanted_routes:
+                found.append((d, route, route_dir))
+    return found
+
+def empty_frame(columns=None) -> pd.DataFrame:
+    """No rows, but the archive's columns and dtypes."""
+    table = SCHEMA.empty_table()
+    return (table.select(columns) if columns else table).to_pandas()
+
+def read_partition(folder: Path, columns=None) -> pd.DataFrame:
+    files = sorted(Path(folder).glob("*.parquet"))
+    if not files:
+        return empty_frame(columns)
+    tables = [pq.read_table(f, columns=columns, schema=SCHEMA) for f in files]
+    return pa.concat_tables(tables).to_pandas()
+
+def iter_archive(archive_dir: Path, start_date: date, end_date: date = None, routes=None, columns=None):
+    """Yield (service_date, route, DataFrame) one partition at a time."""
+    for d, route, folder in list_partitions(archive_dir, start_date, end_date, routes):
+        yield d, route, read_partition(folder, columns)
+
+def read_archive(archive_dir: Path, start_date: date, end_date: date = None, routes=None,
+                 columns=None, stop_areas: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    All observations for the requested service dates/routes, with a service_date column.
+    stop_areas: geo.read_stop_areas() to add its tract/district columns by stop_id.
+    """
+    frames = []
+    for d, _route, df in iter_archive(archive_dir, start_date, end_date, routes, columns):
+        df.insert(0, "service_date", d)
+        frames.append(df)
+    if not frames:
+        out = empty_frame(columns)
+        out.insert(0, "service_date", pd.Series([], dtype=object))
+    else:
+        out = pd.concat(frames, ignore_index=True)
+    return with_stop_areas(out, stop_areas)
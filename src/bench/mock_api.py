@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+# ----------------------------
+# LOCAL STAND-IN FOR api.thebus.org
+# ----------------------------
+# Serves the three endpoints the tester/ scripts call, with the same response shapes:
+#
+#   /arrivalsJSON?stop=983    {"stop", "timestamp", "arrivals": [{id, trip, route, ...}]}
+#   /routeJSON?route=551      {"route": [{routeNum, shapeID, firstStop, headsign}]}
+#   /vehicle.JSON?num=4056    {"vehicle": [{number, trip, driver, latitude, longitude, ...}]}
+#
+# Latency, error rate and payload size are configurable so benchmarks can model a slow or
+# flaky API. Counts every request it answers in app["requests"].
+
+DEFAULT_CONFIG = {
+    "latency_ms": 80,          # mean response latency
+    "latency_jitter_ms": 40,   # +- uniform jitter
+    "error_rate": 0.0,         # fraction of requests answered with HTTP 500
+    "arrivals_per_stop": 6,    # arrivals in each arrivalsJSON payload
+    "gps_fraction": 0.5,       # fraction of arrivals with estimated == "1"
+    "routes": ["1", "2", "23", "307", "A"],
+    "dead_stops": [],          # arrivalsJSON for these stops hangs for 60 s
+}
+
+def _pick_time(rng: random.Random) -> str:
+    h, m = rng.randint(5, 22), rng.randint(0, 59)
+    return f"{(h % 12) or 12}:{m:02d} {'AM' if h < 12 else 'PM'}"
+
+async def _simulate(request: web.Request):
+    cfg = request.app["config"]
+    request.app["requests"] += 1
+    delay = cfg["latency_ms"] + random.uniform(-1, 1) * cfg["latency_jitter_ms"]
+    await asyncio.sleep(max(0.0, delay) / 1000)
+    if random.random() < cfg["error_rate"]:
+        raise web.HTTPInternalServerError(text="simulated error")
+
+async def arrivals(request: web.Request) -> web.Response:
+    await _simulate(request)
+    cfg = request.app["config"]
+    stop = request.query.get("stop", "")
+    if stop in cfg["dead_stops"]:
+        await asyncio.sleep(60)
+    rng = random.Random(f"{stop}-{request.app['requests'] // 1000}")
+
+    out = []
+    for i in range(cfg["arrivals_per_stop"]):
+        route = rng.choice(cfg["routes"])
+        out.append({
+            "id": str(rng.randint(1, 99999)),
+            "trip": f"{rng.randint(1, 5000)}_{rng.randint(1, 9)}",
+            "route": route,
+            "headsign": f"{route} HEADSIGN",
+            "vehicle": str(rng.randint(100, 999)),
+            "direction": rng.choice(["East", "West", "North", "South"]),
+            "stopTime": _pick_time(rng),
+            "date": "2/5/2026",
+            "estimated": "1" if rng.random() < cfg["gps_fraction"] else rng.choice(["0", "2"]),
+            "longitude": f"{rng.uniform(-158.25, -157.65):.6f}",
+            "latitude": f"{rng.uniform(21.25, 21.65):.6f}",
+            "shape": f"{route}{rng.randint(0, 2):03d}",
+            "canceled": "0",
+        })
+    return web.json_response({"stop": stop, "timestamp": "10:30 AM", "arrivals": out})
+
+async def route_json(request: web.Request) -> web.Response:
+    await _simulate(request)
+    route = request.query.get("route", "")
+    return web.json_response({"route": [
+        {"routeNum": route, "shapeID": f"{route}{v:03d}", "firstStop": "FIRST", "headsign": f"HS {route}{v:03d}"}
+        for v in range(3)
+    ]})
+
+async def vehicle_json(request: web.Request) -> web.Response:
+    await _simulate(request)
+    num = request.query.get("num", "")
+    rng = random.Random(num)
+    return web.json_response({"vehicle": [{
+        "number": num,
+        "trip": f"{rng.randint(1, 5000)}_{rng.randint(1, 9)}",
+        "driver": str(rng.randint(1000, 9999)),
+        "latitude": f"{rng.uniform(21.25, 21.65):.6f}",
+        "longitude": f"{rng.uniform(-158.25, -157.65):.6f}",
+        "adherence": str(rng.randint(-5, 10)),
+        "last_message": "2/5/2026 10:30:00 AM",
+        "route_short_name": rng.choice(request.app["config"]["routes"]),
+        "headsign": "HEADSIGN",
+    }]})
+
+def make_app(**config) -> web.Application:
+    app = web.Application()
+    app["config"] = {**DEFAULT_CONFIG, **config}
+    app["requests"] = 0
+    # Both spellings the scripts use (with and without a trailing slash)
+    for path, handler in (("/arrivalsJSON", arrivals), ("/routeJSON", route_json), ("/vehicle.JSON", vehicle_json)):
+        app.router.add_get(path, handler)
+        app.router.add_get(path + "/", handler)
+    return app
+
+async def start(host: str = "127.0.0.1", port: int = 0, **config):
+    """Start in the current event loop. Returns (runner, app, base_url)."""
+    app = make_app(**config)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, app, f"http://{host}:{port}"
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local stand-in for api.thebus.org")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    ap.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    ap.add_argument("--arrivals-per-stop", type=int, default=DEFAULT_CONFIG["arrivals_per_stop"])
+    args = ap.parse_args()
+
+    web.run_app(
+        make_app(latency_ms=args.latency_ms, error_rate=args.error_rate, arrivals_per_stop=args.arrivals_per_stop),
+        host="127.0.0.1", port=args.port, access_log=None,
+    )
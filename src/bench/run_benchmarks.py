@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from datetime import datetime
+
+# src/ modules (poller.py, compare.py, ...) live one level up
+SRC_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+# Feed sizes to benchmark (see synth_gtfs.py; 1 is roughly a tenth of the real feed)
+SCALES = [1, 5]
+
+# Poll benchmark: full sweeps (adaptive polling off) against the local mock API
+POLL_CYCLES = 3
+POLL_MAX_CONCURRENT = 32
+MOCK_LATENCY_MS = 80
+MOCK_ERROR_RATE = 0.01
+
+# One JSON line per benchmark run is appended here, and each run is compared with the last
+RESULTS_JSONL = Path(__file__).resolve().parent / "results.jsonl"
+
+# Flag a benchmark when wall time grows by more than this vs the previous run at that scale
+REGRESSION_THRESHOLD = 0.20
+
+# ----------------------------
+# WORKERS (each runs in its own process so peak memory is its own)
+# ----------------------------
+def worker_invariants(data_dir: Path, cold: bool) -> dict:
+    os.environ["THEBUS_DATA_DIR"] = str(data_dir)
+    if cold:
+        shutil.rmtree(data_dir / "thebus_gtfs" / "compiled", ignore_errors=True)
+    # Always a full rebuild: the incremental shortcut isn't what we're timing
+    (data_dir / "routes" / "all_routes_stops_by_variant.fingerprints.json").unlink(missing_ok=True)
+
+    t0 = time.perf_counter()
+    runpy.run_path(str(SRC_DIR / "route" / "invariants.py"), run_name="__main__")
+    return {"wall_s": time.perf_counter() - t0}
+
+def worker_compare(data_dir: Path) -> dict:
+    from compare import run
+
+    out_dir = data_dir / "bench_out"
+    t0 = time.perf_counter()
+    rows = run(
+        data_dir / "routes" / "route_arrivals.json", out_dir / "compare.csv", out_dir / "compare.json",
+        routes=None, gtfs_dir=data_dir / "thebus_gtfs", gtfs_cache_dir=data_dir / "thebus_gtfs" / "compiled",
+    )
+    wall = time.perf_counter() - t0
+    return {"wall_s": wall, "rows": len(rows), "rows_per_s": len(rows) / wall if wall else None}
+
+def worker_poll(data_dir: Path) -> dict:
+    import mock_api
+    from poller import run
+
+    variants_json = data_dir / "routes" / "all_routes_stops_by_variant.json"
+    with open(variants_json, "r", encoding="utf-8") as f:
+        route_keys = list(json.load(f))
+    out_dir = data_dir / "bench_out" / "poll"
+    routes = [{"route_key": k, "out_json": out_dir / f"route_{k}_arrivals.json"} for k in route_keys]
+
+    async def bench():
+        runner, app, base_url = await mock_api.start(latency_ms=MOCK_LATENCY_MS, error_rate=MOCK_ERROR_RATE)
+        try:
+            t0 = time.perf_counter()
+            await run(
+                routes, api_key="bench", all_routes_json=variants_json,
+                max_concurrent=POLL_MAX_CONCURRENT, poll_every_seconds=0, adaptive=False,
+                archive_dir=data_dir / "bench_out" / "archive", arrivals_url=f"{base_url}/arrivalsJSON",
+                vehicle_url=f"{base_url}/vehicle.JSON",
+                max_cycles=POLL_CYCLES, metrics_prom_file=data_dir / "bench_out" / "poller.prom",
+                metrics_jsonl=data_dir / "bench_out" / "poller.jsonl", max_requests_per_second=0,
+                vehicle_events_jsonl=out_dir / "vehicle_stop_events.jsonl",
+                observed_arrivals_jsonl=out_dir / "observed_arrivals.jsonl", gtfs_dir=data_dir / "thebus_gtfs",
+                service_windows=False, live_delays_json=out_dir / "live_delays.json",
+            )
+            return time.perf_counter() - t0, app["requests"]
+        finally:
+            await runner.cleanup()
+
+    wall, requests = asyncio.run(bench())
+    return {
+        "wall_s": wall,
+        "cycle_s": wall / POLL_CYCLES,
+        "requests": requests,
+        "requests_per_s": requests / wall if wall else None,
+        "routes": len(routes),
+    }
+
+WORKERS = {
+    "invariants_cold": lambda d: worker_invariants(d, cold=True),
+    "invariants_warm": lambda d: worker_invariants(d, cold=False),
+    "compare": worker_compare,
+    "poll_cycle": worker_poll,
+}
+
+def run_worker(name: str, data_dir: Path) -> dict:
+    """Run one worker in a child process; adds its peak RSS (MB) to the result."""
+    cmd = [sys.executable, __file__, "--worker", name, "--data-dir", str(data_dir)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    peak_mb = None
+    if hasattr(os, "wait4"):
+        # Read output first so a chatty child can't block on a full pipe
+        out, err = proc.stdout.read(), proc.stderr.read()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak_mb = usage.ru_maxrss / 1024  # KB on Linux
+    else:
+        out, err = proc.communicate()
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark {name} failed:\n{err}")
+    result = json.loads(out.strip().splitlines()[-1])
+    result["peak_rss_mb"] = peak_mb
+    return result
+
+# ----------------------------
+# MAIN
+# ----------------------------
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def previous_results() -> dict:
+    """(benchmark, scale) -> last recorded result."""
+    last = {}
+    if RESULTS_JSONL.exists():
+        with open(RESULTS_JSONL, "r", encoding="utf-8") as f:
+            for line in f:
+                r = json.loads(line)
+                last[(r["benchmark"], r["scale"])] = r
+    return last
+
+def main(scales=SCALES, benchmarks=None, keep_dir: Path = None):
+    from synth_gtfs import generate
+
+    benchmarks = benchmarks or list(WORKERS)
+    previous = previous_results()
+    rev = git_rev()
+    base_dir = Path(keep_dir) if keep_dir else Path(tempfile.mkdtemp(prefix="thebus_bench_"))
+
+    regressions = []
+    try:
+        for scale in scales:
+            data_dir = base_dir / f"scale_{scale}"
+            counts = generate(data_dir, scale)
+            print(f"\n== scale {scale}x: {counts}")
+
+            # The poller needs all_routes_stops_by_variant.json; build it first if we're not timing that
+            if not (data_dir / "routes" / "all_routes_stops_by_variant.json").exists():
+                run_worker("invariants_warm", data_dir)
+
+            for name in benchmarks:
+                result = run_worker(name, data_dir)
+                record = {"benchmark": name, "scale": scale, "git": rev,
+                          "time": datetime.now().isoformat(timespec="seconds"), **counts, **result}
+                with open(RESULTS_JSONL, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+                line = f"{name:<16} wall={result['wall_s']:.3f}s peak_rss={result['peak_rss_mb'] or 0:.0f}MB"
+                if result.get("requests_per_s"):
+                    line += f" req/s={result['requests_per_s']:.0f}"
+                if result.get("rows_per_s"):
+                    line += f" rows/s={result['rows_per_s']:.0f}"
+
+                prev = previous.get((name, scale))
+                if prev and prev.get("wall_s"):
+                    change = result["wall_s"] / prev["wall_s"] - 1
+                    line += f" ({change:+.0%} vs {prev.get('git') or 'previous'})"
+                    if change > REGRESSION_THRESHOLD:
+                        line += "  <-- REGRESSION"
+                        regressions.append((name, scale, change))
+                print(line)
+    finally:
+        if not keep_dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    print(f"\nResults appended to {RESULTS_JSONL}")
+    return regressions
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Offline benchmarks for the poller and GTFS pipeline")
+    ap.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    ap.add_argument("--only", nargs="+", choices=list(WORKERS), help="benchmarks to run (default: all)")
+    ap.add_argument("--keep-dir", type=Path, help="keep the synthetic data in this folder")
+    ap.add_argument("--worker", choices=list(WORKERS), help=argparse.SUPPRESS)
+    ap.add_argument("--data-dir", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        # Worker output is noisy; only the last line (the JSON result) is read back
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = WORKERS[args.worker](args.data_dir)
+        print(json.dumps(result))
+    else:
+        sys.exit(1 if main(args.scales, args.only, args.keep_dir) else 0)
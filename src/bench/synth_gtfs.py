@@ -0,0 +1,128 @@
+import argparse
+import csv
+import json
+import random
+from pathlib import Path
+
+# ----------------------------
+# SYNTHETIC GTFS FEED
+# ----------------------------
+# Writes a TheBus-shaped data folder for offline benchmarks:
+#
+#   <out_dir>/thebus_gtfs/{stops,routes,trips,stop_times,calendar}.txt
+#   <out_dir>/routes/all_routes.json           (routeJSON shape, input to invariants.py)
+#   <out_dir>/routes/route_arrivals.json       (poller snapshot shape, input to compare.py)
+#
+# scale=1 is roughly a tenth of the real feed; stops, routes, trips and stop_times grow
+# linearly with scale (1x-20x). Seeded, so the same scale always gives the same files.
+
+BASE_STOPS = 400
+BASE_ROUTES = 30
+STOPS_PER_SHAPE = 30
+TRIPS_PER_DIRECTION = (2, 12)
+SNAPSHOT_ARRIVALS = 3000
+
+# Honolulu-ish bounding box
+LAT_RANGE = (21.25, 21.65)
+LON_RANGE = (-158.25, -157.65)
+
+def fmt_time(secs: int) -> str:
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+def api_time(secs: int) -> str:
+    h, m = (secs // 3600) % 24, secs % 3600 // 60
+    return f"{(h % 12) or 12}:{m:02d} {'AM' if h < 12 else 'PM'}"
+
+def write_txt(path: Path, rows: list):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+def generate(out_dir: Path, scale: int = 1, seed: int = 1) -> dict:
+    """Write the synthetic feed into out_dir. Returns row counts."""
+    rng = random.Random(seed)
+    gtfs_dir = Path(out_dir) / "thebus_gtfs"
+    routes_dir = Path(out_dir) / "routes"
+    gtfs_dir.mkdir(parents=True, exist_ok=True)
+    routes_dir.mkdir(parents=True, exist_ok=True)
+
+    n_stops = BASE_STOPS * scale
+    stops = [{
+        "stop_id": str(i),
+        "stop_code": str(i),
+        "stop_name": f"STOP {i}",
+        "stop_lat": f"{rng.uniform(*LAT_RANGE):.6f}",
+        "stop_lon": f"{rng.uniform(*LON_RANGE):.6f}",
+    } for i in range(1, n_stops + 1)]
+
+    routes, trips, stop_times, all_routes = [], [], [], {}
+    trip_n = 0
+    for r in range(BASE_ROUTES * scale):
+        short = str(r + 1)
+        route_id = f"{short}_{rng.randint(0, 3)}"
+        routes.append({"route_id": route_id, "route_short_name": short, "route_long_name": f"ROUTE {short}"})
+
+        variants = []
+        for v in range(rng.randint(1, 3)):
+            shape_id = f"{short}{v:03d}"
+            seq = rng.sample(range(1, n_stops + 1), STOPS_PER_SHAPE)
+            for direction_id in ("0", "1"):
+                ordered = seq if direction_id == "0" else seq[::-1]
+                for k in range(rng.randint(*TRIPS_PER_DIRECTION)):
+                    trip_n += 1
+                    trip_id = f"{trip_n}_{rng.randint(1, 9)}"
+                    trips.append({
+                        "route_id": route_id, "service_id": "WK", "trip_id": trip_id,
+                        "direction_id": direction_id, "shape_id": shape_id, "trip_headsign": f"HS {shape_id}",
+                    })
+                    start = 5 * 3600 + k * 1800 + rng.randint(0, 900)
+                    for i, stop_id in enumerate(ordered):
+                        t = fmt_time(start + i * 90)
+                        stop_times.append({
+                            "trip_id": trip_id, "arrival_time": t, "departure_time": t,
+                            "stop_id": str(stop_id), "stop_sequence": str(i + 1),
+                        })
+            variants.append({"routeNum": short, "shapeID": shape_id, "headsign": f"HS {shape_id}", "firstStop": "FIRST"})
+
+        all_routes[short] = {"routeName": f"ROUTE {short}", "routeID": route_id, "route": variants}
+
+    # Real feeds aren't sorted by trip; don't let the benchmark assume they are
+    rng.shuffle(stop_times)
+
+    write_txt(gtfs_dir / "stops.txt", stops)
+    write_txt(gtfs_dir / "routes.txt", routes)
+    write_txt(gtfs_dir / "trips.txt", trips)
+    write_txt(gtfs_dir / "stop_times.txt", stop_times)
+    write_txt(gtfs_dir / "calendar.txt", [{
+        "service_id": "WK", "monday": "1", "tuesday": "1", "wednesday": "1", "thursday": "1",
+        "friday": "1", "saturday": "1", "sunday": "1", "start_date": "20200101", "end_date": "20351231",
+    }])
+    with open(routes_dir / "all_routes.json", "w", encoding="utf-8") as f:
+        json.dump(all_routes, f)
+
+    # Snapshot of GPS arrivals near their scheduled times, for compare.py
+    trip_by_id = {t["trip_id"]: t for t in trips}
+    by_stop = {}
+    for st in rng.sample(stop_times, min(SNAPSHOT_ARRIVALS * scale, len(stop_times))):
+        h, m, s = (int(x) for x in st["arrival_time"].split(":"))
+        est = h * 3600 + m * 60 + s + rng.randint(-300, 600)
+        trip = trip_by_id[st["trip_id"]]
+        by_stop.setdefault(st["stop_id"], []).append({
+            "id": str(rng.randint(1, 99999)), "trip": st["trip_id"], "route": trip["route_id"].split("_")[0],
+            "headsign": trip["trip_headsign"], "vehicle": str(rng.randint(100, 999)), "direction": "East",
+            "stopTime": api_time(est), "date": "2/5/2026", "estimated": "1",
+            "longitude": "-157.8", "latitude": "21.3", "shape": trip["shape_id"], "canceled": "0",
+        })
+    with open(routes_dir / "route_arrivals.json", "w", encoding="utf-8") as f:
+        json.dump([{"stop": k, "timestamp": "10:30 AM", "arrivals": v} for k, v in by_stop.items()], f)
+
+    return {"stops": len(stops), "routes": len(routes), "trips": len(trips), "stop_times": len(stop_times)}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write a synthetic TheBus GTFS feed")
+    ap.add_argument("out_dir", type=Path)
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    print(generate(args.out_dir, args.scale, args.seed))
@@ -0,0 +1,279 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from archive import list_partitions, read_archive, read_partition
+from geo import read_stop_areas, with_stop_areas
+from gtfs_cache import MISSING_TIME, GTFSCache, open_gtfs_cache
+
+# ----------------------------
+# CONFIG (edit these)
+# ----------------------------
+GTFS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\thebus_gtfs")
+GTFS_CACHE_DIR = GTFS_DIR / "compiled"
+
+ROUTES_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes")
+ARCHIVE_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\archive")
+
+# Route(s) to compare, matched against the API "route" field. None = every route.
+ROUTES = ["23"]
+
+# Where arrivals come from:
+#   "archive":  ARCHIVE_DIR for service dates START_DATE..END_DATE (see archive.py)
+#   a Path:     one snapshot JSON written by the poller (list of per-stop API objects),
+#               or observed_arrivals.jsonl (see trips.py) to compare actual arrivals
+SOURCE = "archive"
+START_DATE = date.today()
+END_DATE = None
+
+# "archive" source only: worker processes to spread the service dates over (see COMPARE
+# ACROSS PROCESSES below). None = one per core, at most one per date, once the range has
+# PARALLEL_MIN_DATES service dates; shorter ranges stay in this process, since starting
+# the pool (~0.4 s on the benchmark feed) costs more than comparing a date (~0.15 s).
+# 1 = always in this process.
+WORKERS = None
+PARALLEL_MIN_DATES = 4
+
+OUT_CSV = ROUTES_DIR / "sched_vs_estimated.csv"
+OUT_JSON = ROUTES_DIR / "sched_vs_estimated.json"
+
+# If you only want GPS-backed estimates, keep this True (recommended)
+GPS_ONLY = True  # keeps only arrivals where estimated == "1"
+
+# From geo.py: adds its tract/district columns to every row when the file exists
+STOP_AREAS_CSV = ROUTES_DIR / "stop_areas.csv"
+
+# Output columns, same as compare23.py always wrote (plus the STOP_AREAS_CSV columns)
+OUT_COLUMNS = [
+    "date", "stop_id", "trip_id", "vehicle", "route", "headsign", "direction", "shape",
+    "estimated_flag", "scheduled_arrival_time", "estimated_stopTime",
+    "scheduled_datetime", "estimated_datetime", "diff_minutes",
+]
+
+# ----------------------------
+# LOAD ARRIVALS
+# ----------------------------
+def to_list(x):
+    if isinstance(x, dict):
+        return [x]
+    if isinstance(x, list):
+        return x
+    return []
+
+def arrivals_from_snapshot(payloads: list) -> pd.DataFrame:
+    """Flatten a snapshot (list of per-stop API objects) to one row per arrival."""
+    def field(a, name):
+        return str(a.get(name, ""))
+
+    rows = []
+    for stop_payload in payloads:
+        stop_id = str(stop_payload.get("stop", "")).strip()
+        for a in to_list(stop_payload.get("arrivals", [])):
+            rows.append((
+                stop_id, field(a, "trip"), field(a, "date"), field(a, "stopTime"),
+                field(a, "vehicle"), field(a, "route"), field(a, "headsign"),
+                field(a, "direction"), field(a, "shape"), field(a, "estimated"),
+            ))
+    return pd.DataFrame(rows, columns=[
+        "stop_id", "trip_id", "date", "stopTime", "vehicle", "route", "headsign",
+        "direction", "shape", "estimated",
+    ], dtype=object)
+
+def arrivals_from_observed(path: Path) -> pd.DataFrame:
+    """Inferred arrivals from trips.py, in the same columns as arrivals_from_snapshot."""
+    columns = ["stop_id", "trip", "date", "stopTime", "vehicle", "route", "headsign", "direction", "shape"]
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            o = json.loads(line)
+            rows.append(tuple(str(o.get(c, "")) for c in columns))
+    df = pd.DataFrame(rows, columns=columns, dtype=object).rename(columns={"trip": "trip_id"})
+    df["estimated"] = "1"
+    return df
+
+ARCHIVE_COLUMNS = [
+    "poll_time", "stop_id", "trip", "date", "stopTime", "vehicle", "route", "headsign",
+    "direction", "shape", "estimated",
+]
+
+def _from_archive_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns={"trip": "trip_id"}).drop(columns="service_date", errors="ignore")
+    df["estimated"] = df["estimated"].astype(str)
+    return df
+
+def arrivals_from_archive(archive_dir: Path, start_date: date, end_date: date = None,
+                          routes=None) -> pd.DataFrame:
+    """Archived observations in the same columns as arrivals_from_snapshot, plus poll_time."""
+    return _from_archive_columns(read_archive(archive_dir, start_date, end_date, routes, columns=ARCHIVE_COLUMNS))
+
+# ----------------------------
+# COMPARE (vectorized)
+# ----------------------------
+def compare_arrivals(arrivals: pd.DataFrame, gtfs, gps_only: bool = GPS_ONLY,
+                     routes=None) -> tuple:
+    """
+    Join arrivals to the GTFS schedule on (trip_id, stop_id) and compute
+    diff_minutes = estimated - scheduled. Returns (rows DataFrame, missing_match count).
+    """
+    df = arrivals
+    for c in ("stop_id", "trip_id", "date", "stopTime"):
+        df = df.assign(**{c: df[c].astype(str).str.strip()})
+
+    keep = (df["stop_id"] != "") & (df["trip_id"] != "") & (df["date"] != "") & (df["stopTime"] != "")
+    if gps_only:
+        keep &= df["estimated"].astype(str).str.strip() == "1"
+    if routes is not None:
+        keep &= df["route"].astype(str).str.strip().isin([str(r) for r in routes])
+    df = df[keep]
+
+    # One join against the schedule index for every arrival
+    sched_secs = gtfs.lookup_arrival(df["trip_id"].to_numpy(), df["stop_id"].to_numpy())
+    matched = sched_secs != MISSING_TIME
+    missing_match = int((~matched).sum())
+    df = df[matched]
+    sched_secs = sched_secs[matched].astype(np.int64)
+
+    # API example: date = "2/5/2026", stopTime = "10:34 AM"
+    est_dt = pd.to_datetime(df["date"] + " " + df["stopTime"], format="%m/%d/%Y %I:%M %p", errors="coerce")
+    parsed = est_dt.notna().to_numpy()
+    df, est_dt, sched_secs = df[parsed], est_dt[parsed], sched_secs[parsed]
+
+    # GTFS HH:MM:SS can exceed 24:00:00: seconds past midnight of the estimate's date roll over on their own
+    sched_dt = est_dt.dt.normalize() + pd.to_timedelta(sched_secs, unit="s")
+    diff_min = ((est_dt - sched_dt).dt.total_seconds() / 60.0).round(2)
+
+    h, rem = np.divmod(sched_secs, 3600)
+    m, s = np.divmod(rem, 60)
+    sched_str = (
+        pd.Series(h, index=df.index).astype(str).str.zfill(2) + ":"
+        + pd.Series(m, index=df.index).astype(str).str.zfill(2) + ":"
+        + pd.Series(s, index=df.index).astype(str).str.zfill(2)
+    )
+
+    out = pd.DataFrame({
+        "date": df["date"],
+        "stop_id": df["stop_id"],
+        "trip_id": df["trip_id"],
+        "vehicle": df["vehicle"],
+        "route": df["route"],
+        "headsign": df["headsign"],
+        "direction": df["direction"],
+        "shape": df["shape"],
+        "estimated_flag": df["estimated"],
+        "scheduled_arrival_time": sched_str,                          # HH:MM:SS from GTFS
+        "estimated_stopTime": df["stopTime"],                         # "10:34 AM" from API
+        "scheduled_datetime": sched_dt.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "estimated_datetime": est_dt.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "diff_minutes": diff_min,                                     # e.g., +4.00 or -5.00
+    })
+    if "poll_time" in df.columns:
+        out["poll_time"] = df["poll_time"]
+    return out.reset_index(drop=True), missing_match
+
+# ----------------------------
+# COMPARE ACROSS PROCESSES
+# ----------------------------
+# Service dates don't depend on each other, so a month of archive is split into one task
+# per service date (per (service_date, route) partition when there are fewer dates than
+# workers) and the tasks run in a ProcessPoolExecutor. Workers never receive the GTFS
+# schedule: each opens the compiled cache folder once (np.load mmap_mode="r"), so every
+# process maps the same .npy pages from the OS page cache instead of unpickling a copy.
+# Only partition paths go out and the compared rows come back, merged in archive order.
+
+_worker_gtfs = None
+
+def _init_worker(cache_dir: Path):
+    global _worker_gtfs
+    _worker_gtfs = GTFSCache(cache_dir)
+
+def _compare_in_process(folders: list, gtfs, routes, gps_only: bool) -> tuple:
+    arrivals = pd.concat([read_partition(f, ARCHIVE_COLUMNS) for f in folders], ignore_index=True)
+    return compare_arrivals(_from_archive_columns(arrivals), gtfs, gps_only=gps_only, routes=routes)
+
+def _compare_partitions(folders: list, routes, gps_only: bool) -> tuple:
+    return _compare_in_process(folders, _worker_gtfs, routes, gps_only)
+
+def compare_archive_parallel(archive_dir: Path, start_date: date, end_date: date, gtfs: GTFSCache,
+                             routes=None, gps_only: bool = GPS_ONLY, workers: int = WORKERS) -> tuple:
+    """
+    compare_arrivals over every archive partition in range, split across worker processes.
+    workers: None sizes the pool from the core count and the number of dates (see WORKERS).
+    """
+    partitions = list_partitions(archive_dir, start_date, end_date, routes)
+    if not partitions:
+        return compare_arrivals(arrivals_from_archive(archive_dir, start_date, end_date, routes), gtfs,
+                                gps_only=gps_only, routes=routes)
+
+    by_date = {}
+    for d, _route, folder in partitions:
+        by_date.setdefault(d, []).append(folder)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, len(by_date)) if len(by_date) >= PARALLEL_MIN_DATES else 1
+    tasks = list(by_date.values()) if len(by_date) >= workers else [[folder] for _d, _r, folder in partitions]
+    if workers < 2 or len(tasks) < 2:
+        # Nothing to split: skip the pool's startup
+        return _compare_in_process([f for _d, _r, f in partitions], gtfs, routes, gps_only)
+
+    # gtfs was opened (and compiled if stale) by the caller, so workers can map it as-is
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                             initargs=(gtfs.cache_dir,)) as pool:
+        results = list(pool.map(_compare_partitions, tasks, repeat(routes), repeat(gps_only)))
+
+    rows = pd.concat([r for r, _ in results], ignore_index=True)
+    return rows, sum(m for _, m in results)
+
+# ----------------------------
+# EXPORT CSV + JSON
+# ----------------------------
+def write_outputs(rows: pd.DataFrame, out_csv: Path, out_json: Path):
+    df = rows
+    if not df.empty:
+        df = df.sort_values(["date", "trip_id", "stop_id"])
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out_csv, index=False)
+
+    # JSON export: list of row dicts, in arrival order
+    records = rows.astype({"poll_time": str}).to_dict("records") if "poll_time" in rows.columns \
+        else rows.to_dict("records")
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+
+    print(f"Wrote CSV : {out_csv}")
+    print(f"Wrote JSON: {out_json}")
+
+def run(source, out_csv: Path, out_json: Path, routes=ROUTES, gps_only: bool = GPS_ONLY,
+        gtfs_dir: Path = GTFS_DIR, gtfs_cache_dir: Path = GTFS_CACHE_DIR,
+        archive_dir: Path = ARCHIVE_DIR, start_date: date = START_DATE, end_date: date = END_DATE,
+        stop_areas_csv: Path = STOP_AREAS_CSV, workers: int = WORKERS):
+    gtfs = open_gtfs_cache(gtfs_dir, gtfs_cache_dir)
+
+    if source == "archive" and workers != 1:
+        rows, missing_match = compare_archive_parallel(
+            archive_dir, start_date, end_date, gtfs, routes=routes, gps_only=gps_only, workers=workers,
+        )
+    else:
+        if source == "archive":
+            arrivals = arrivals_from_archive(archive_dir, start_date, end_date, routes)
+        elif Path(source).suffix == ".jsonl":
+            arrivals = arrivals_from_observed(source)
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                arrivals = arrivals_from_snapshot(json.load(f))
+        rows, missing_match = compare_arrivals(arrivals, gtfs, gps_only=gps_only, routes=routes)
+    if stop_areas_csv is not None:
+        rows = with_stop_areas(rows, read_stop_areas(stop_areas_csv))
+    write_outputs(rows, out_csv, out_json)
+
+    print(f"Matched rows: {len(rows)}")
+    print(f"Missing (trip_id, stop_id) matches in GTFS: {missing_match}")
+    return rows
+
+if __name__ == "__main__":
+    run(SOURCE, OUT_CSV, OUT_JSON)
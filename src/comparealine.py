@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from compare import run
+
+# ----------------------------
+# CONFIG (edit these)
+# ----------------------------
+GTFS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\thebus_gtfs")
+
+# Compiled stop_times cache (see gtfs_cache.py); rebuilt automatically when the feed changes
+GTFS_CACHE_DIR = GTFS_DIR / "compiled"
+
+ALINE_ARRIVALS_JSON = Path(
+    r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\aline_arrivals.json"
+)
+
+OUT_CSV = Path(
+    r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\aline_sched_vs_estimated.csv"
+)
+OUT_JSON = Path(
+    r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\aline_sched_vs_estimated.json"
+)
+
+# If you only want GPS-backed estimates, keep this True (recommended)
+GPS_ONLY = True  # keeps only arrivals where estimated == "1"
+
+# aline_arrivals.json keeps every route's GPS arrivals at A LINE stops (ex. Sinclair 983).
+# Set to a list of API "route" values to compare only those buses; None = all of them.
+ROUTES = None
+
+# ----------------------------
+# COMPARE (see compare.py)
+# ----------------------------
+run(
+    ALINE_ARRIVALS_JSON, OUT_CSV, OUT_JSON,
+    routes=ROUTES,
+    gps_only=GPS_ONLY,
+    gtfs_dir=GTFS_DIR,
+    gtfs_cache_dir=GTFS_CACHE_DIR,
+)
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+# ----------------------------
+# RESILIENT API FETCH
+# ----------------------------
+# Wraps every api.thebus.org call the poller makes so one bad stop or endpoint can't eat
+# the cycle:
+#
+#   adaptive timeout   per endpoint, from observed latency (srtt + 4 * rttvar, like TCP),
+#                      clamped to [MIN_TIMEOUT_SECONDS, MAX_TIMEOUT_SECONDS]
+#   retry              transient errors (timeouts, connection errors, 429/5xx) are retried
+#                      with full-jitter exponential backoff, only if the retry still fits
+#                      before the tick deadline
+#   circuit breakers   one per endpoint and one per key (stop_id, vehicle number). After
+#                      FAILURE_THRESHOLD failures in a row the breaker opens and requests
+#                      are skipped. Once its cooldown passes, one probe request runs in the
+#                      background (not in the cycle); success closes it, failure reopens it
+#                      with twice the cooldown, up to MAX_RESET_SECONDS.
+
+MIN_TIMEOUT_SECONDS = 2.0
+MAX_TIMEOUT_SECONDS = 15.0
+
+RETRY_ATTEMPTS = 2            # retries after the first try
+RETRY_BASE_SECONDS = 0.5      # backoff before retry k is uniform(0, base * 2**k)
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+FAILURE_THRESHOLD = 3            # per key
+ENDPOINT_FAILURE_THRESHOLD = 10  # per endpoint (any key), so a few bad stops don't trip it
+RESET_SECONDS = 60.0
+MAX_RESET_SECONDS = 900.0
+
+class CircuitOpen(Exception):
+    """Raised instead of making a request while its circuit breaker is open."""
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in TRANSIENT_STATUS
+    return isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+def request_outcome(exc: BaseException) -> str:
+    """Metrics bucket for a failed request."""
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return "http_error"
+    return "error"
+
+class AdaptiveTimeout:
+    def __init__(self, min_seconds: float = MIN_TIMEOUT_SECONDS, max_seconds: float = MAX_TIMEOUT_SECONDS):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.srtt = None
+        self.rttvar = None
+
+    @property
+    def seconds(self) -> float:
+        if self.srtt is None:
+            return self.max_seconds
+        return min(self.max_seconds, max(self.min_seconds, self.srtt + 4 * self.rttvar))
+
+    def observe(self, seconds: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+
+    def timed_out(self):
+        # Back off like TCP: a timeout means our estimate was too low
+        if self.srtt is not None:
+            self.srtt = min(self.max_seconds, self.srtt * 2)
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_seconds: float = RESET_SECONDS,
+                 max_reset_seconds: float = MAX_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.base_reset = reset_seconds
+        self.max_reset = max_reset_seconds
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_until = None    # time.monotonic(); None = closed
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_until is not None
+
+    def probe_due(self) -> bool:
+        """True once (per cooldown) when an open breaker should be probed."""
+        if self.opened_until is None or self.probing or time.monotonic() < self.opened_until:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_until = None
+        self.probing = False
+        self.reset_seconds = self.base_reset
+
+    def record_failure(self) -> bool:
+        """Returns True if this failure opened (or reopened) the breaker."""
+        self.failures += 1
+        if self.probing:
+            self.probing = False
+            self.reset_seconds = min(self.max_reset, self.reset_seconds * 2)
+            self.opened_until = time.monotonic() + self.reset_seconds
+            return True
+        if self.opened_until is None and self.failures >= self.failure_threshold:
+            self.opened_until = time.monotonic() + self.reset_seconds
+            return True
+        return False
+
+class Endpoint:
+    def __init__(self, name: str, url: str, key_param: str):
+        """key_param: query parameter that identifies the thing asked for ("stop", "num")."""
+        self.name = name
+        self.url = url
+        self.key_param = key_param
+        self.timeout = AdaptiveTimeout()
+        self.breaker = CircuitBreaker(ENDPOINT_FAILURE_THRESHOLD)
+        self.key_breakers = {}
+
+    def key_breaker(self, key: str) -> CircuitBreaker:
+        b = self.key_breakers.get(key)
+        if b is None:
+            b = self.key_breakers[key] = CircuitBreaker()
+        return b
+
+    def open_keys(self) -> list:
+        return [k for k, b in self.key_breakers.items() if b.is_open]
+
+class ApiClient:
+    def __init__(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore, api_key: str,
+                 endpoints: dict, metrics=None, rate_limiter=None):
+        """
+        endpoints:    name -> Endpoint
+        metrics:      metrics.PollMetrics, gets one record per attempt
+        rate_limiter: scheduler.TokenBucket, also charged for retries and probes
+        """
+        self.session = session
+        self.sem = sem
+        self.api_key = api_key
+        self.endpoints = endpoints
+        self.metrics = metrics
+        self.rate_limiter = rate_limiter
+        self._probes = set()
+
+    async def get_json(self, endpoint: str, key: str, wait_turn=None, deadline: float = None):
+        """
+        Fetch endpoint for key. wait_turn is awaited before the first attempt (tick pacing).
+        Raises CircuitOpen without touching the network while a breaker is open.
+        """
+        ep = self.endpoints[endpoint]
+        breaker = ep.key_breaker(key)
+
+        for b in (ep.breaker, breaker):
+            if b.is_open:
+                if b.probe_due():
+                    self._probe(ep, key, b)
+                if wait_turn is not None:
+                    wait_turn.close()
+                raise CircuitOpen(f"{ep.name} {key}" if b is breaker else ep.name)
+
+        if wait_turn is not None:
+            await wait_turn
+
+        attempt = 0
+        while True:
+            try:
+                data = await self._attempt(ep, key)
+            except Exception as e:
+                retry = attempt < RETRY_ATTEMPTS and is_transient(e)
+                if retry:
+                    pause = random.uniform(0, RETRY_BASE_SECONDS * 2 ** attempt)
+                    retry = deadline is None or time.monotonic() + pause + ep.timeout.seconds <= deadline
+                if not retry:
+                    self._failed(ep, key, breaker, e)
+                    raise
+                attempt += 1
+                await asyncio.sleep(pause)
+                if self.rate_limiter and not await self.rate_limiter.acquire(deadline):
+                    self._failed(ep, key, breaker, e)
+                    raise
+                continue
+
+            breaker.record_success()
+            ep.breaker.record_success()
+            return data
+
+    async def _attempt(self, ep: Endpoint, key: str):
+        async with self.sem:
+            # Timed inside the semaphore so queueing behind other requests isn't counted
+            t0 = time.monotonic()
+            timeout = aiohttp.ClientTimeout(total=ep.timeout.seconds)
+            try:
+                async with self.session.get(ep.url, params={"key": self.api_key, ep.key_param: key},
+                                            timeout=timeout) as r:
+                    r.raise_for_status()
+                    body = await r.read()
+                # TheBus doesn't always send application/json
+                data = json.loads(body)
+            except Exception as e:
+                elapsed = time.monotonic() - t0
+                if isinstance(e, asyncio.TimeoutError):
+                    ep.timeout.timed_out()
+                else:
+                    ep.timeout.observe(elapsed)
+                if self.metrics:
+                    self.metrics.record_request(key, elapsed, request_outcome(e), endpoint=ep.name)
+                raise
+
+        elapsed = time.monotonic() - t0
+        ep.timeout.observe(elapsed)
+        if self.metrics:
+            self.metrics.record_request(key, elapsed, "ok", len(body), endpoint=ep.name)
+        return data
+
+    def _failed(self, ep: Endpoint, key: str, breaker: CircuitBreaker, exc: BaseException):
+        if breaker.record_failure():
+            print(f"[WARN] {ep.name} {ep.key_param}={key}: circuit open for {breaker.reset_seconds:.0f}s "
+                  f"after {breaker.failures} failures ({type(exc).__name__})")
+        if ep.breaker.record_failure():
+            print(f"[WARN] {ep.name}: endpoint circuit open for {ep.breaker.reset_seconds:.0f}s")
+
+    def _probe(self, ep: Endpoint, key: str, breaker: CircuitBreaker):
+        """One background request to see if an open breaker can close."""
+        async def probe():
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            try:
+                await self._attempt(ep, key)
+            except Exception:
+                if breaker.record_failure():
+                    print(f"[WARN] {ep.name} {ep.key_param}={key}: probe failed, "
+                          f"circuit open for {breaker.reset_seconds:.0f}s")
+            else:
+                breaker.record_success()
+                ep.breaker.record_success()
+                print(f"{ep.name} {ep.key_param}={key}: probe ok, circuit closed")
+
+        task = asyncio.get_running_loop().create_task(probe())
+        self._probes.add(task)
+        task.add_done_callback(self._probes.discard)
+
+    async def close(self):
+        for task in list(self._probes):
+            task.cancel()
+        await asyncio.gather(*self._probes, return_exceptions=True)
+
+    def open_circuits(self) -> int:
+        return sum(ep.breaker.is_open + len(ep.open_keys()) for ep in self.endpoints.values())
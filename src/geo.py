@@ -0,0 +1,198 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# CONFIG (edit these)
+# ----------------------------
+DATA_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data")
+STOPS_TXT = DATA_DIR / "thebus_gtfs" / "stops.txt"
+VARIANTS_JSON = DATA_DIR / "routes" / "all_routes_stops_by_variant.json"
+
+# column name -> (GeoJSON file, feature property holding the polygon's id)
+LAYERS = {
+    "tract": (DATA_DIR / "geo" / "census_tracts.geojson", "GEOID"),
+    "district": (DATA_DIR / "geo" / "council_districts.geojson", "DISTRICT"),
+}
+
+# stop_id -> one column per layer; compare.py and archive.read_archive join on this
+STOP_AREAS_CSV = DATA_DIR / "routes" / "stop_areas.csv"
+
+# ----------------------------
+# STOPS -> POLYGONS (spatial join)
+# ----------------------------
+# methodology.md: "should we do poverty & council districts overlay?". Every stop gets
+# the id of the polygon it falls in, for each layer (census tracts, council districts).
+#
+# No shapely/geopandas: GeoJSON rings become numpy edge arrays, and points are tested
+# against them with a vectorized crossing-number (even-odd) test, so holes and
+# MultiPolygons need no special casing. Points are sorted by longitude once; each
+# polygon's bounding box picks its candidates with a searchsorted on longitude plus a
+# latitude mask, so only points that could be inside a polygon are tested against it.
+# A point on a shared border goes to the first polygon in file order.
+
+# Max (points x edges) tested per numpy call, to bound memory on detailed polygons
+PIP_BLOCK = 2_000_000
+
+def _rings(geometry: dict) -> list:
+    """Every ring (outer and holes) of a Polygon/MultiPolygon, as (n, 2) lon/lat arrays."""
+    gtype = geometry.get("type") if geometry else None
+    if gtype == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif gtype == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return []
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for poly in polygons for ring in poly if len(ring) >= 3]
+
+class PolygonLayer:
+    def __init__(self, ids: list, rings: list):
+        """ids[i] names polygon i; rings[i] is its list of (n, 2) lon/lat arrays."""
+        self.ids = ids
+        self.edges = []     # polygon -> (x0, y0, x1, y1) arrays
+        bbox = []
+        for poly in rings:
+            pts = [r for r in poly if len(r)]
+            x0 = np.concatenate([r[:, 0] for r in pts]) if pts else np.array([])
+            y0 = np.concatenate([r[:, 1] for r in pts]) if pts else np.array([])
+            # Each ring closed on itself (np.roll), whether or not the file repeats the first point
+            x1 = np.concatenate([np.roll(r[:, 0], -1) for r in pts]) if pts else np.array([])
+            y1 = np.concatenate([np.roll(r[:, 1], -1) for r in pts]) if pts else np.array([])
+            self.edges.append((x0, y0, x1, y1))
+            bbox.append((x0.min(), y0.min(), x0.max(), y0.max()) if len(x0) else (np.inf, np.inf, -np.inf, -np.inf))
+        self.bbox = np.array(bbox, dtype=np.float64).reshape(-1, 4)
+
+    def locate(self, lon, lat) -> np.ndarray:
+        """Polygon id for each point (None outside every polygon or without coordinates)."""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        hit = np.full(len(lon), -1, dtype=np.int64)
+
+        order = np.argsort(lon, kind="stable")
+        slon, slat = lon[order], lat[order]
+        for p, (minx, miny, maxx, maxy) in enumerate(self.bbox):
+            a, b = np.searchsorted(slon, minx, side="left"), np.searchsorted(slon, maxx, side="right")
+            if a >= b:
+                continue
+            cand = a + np.flatnonzero((slat[a:b] >= miny) & (slat[a:b] <= maxy))
+            cand = cand[hit[order[cand]] < 0]
+            if len(cand):
+                inside = self._contains(p, slon[cand], slat[cand])
+                hit[order[cand[inside]]] = p
+
+        ids = np.asarray(self.ids, dtype=object)
+        return np.where(hit >= 0, ids[np.maximum(hit, 0)], None)
+
+    def _contains(self, p: int, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Even-odd crossing test of points (x, y) against every edge of polygon p."""
+        x0, y0, x1, y1 = self.edges[p]
+        inside = np.zeros(len(x), dtype=bool)
+        step = max(1, PIP_BLOCK // max(1, len(x0)))
+        for i in range(0, len(x), step):
+            px, py = x[i:i + step, None], y[i:i + step, None]
+            # Edge straddles the horizontal line through the point...
+            straddles = (y0 > py) != (y1 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # ...and crosses it to the right of the point
+                cross_x = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+            crossings = (straddles & (px < cross_x)).sum(axis=1)
+            inside[i:i + step] = crossings % 2 == 1
+        return inside
+
+def load_layer(path: Path, id_property: str) -> PolygonLayer:
+    """Polygon/MultiPolygon features of a GeoJSON file (lon/lat, ex. EPSG:4326)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    ids, rings = [], []
+    for i, feat in enumerate(data.get("features", [])):
+        r = _rings(feat.get("geometry"))
+        if not r:
+            continue
+        props = feat.get("properties") or {}
+        ids.append(str(props.get(id_property, i)).strip())
+        rings.append(r)
+    return PolygonLayer(ids, rings)
+
+# ----------------------------
+# STOPS
+# ----------------------------
+def stops_from_gtfs(stops_txt: Path) -> pd.DataFrame:
+    stops = pd.read_csv(stops_txt, dtype=str, usecols=["stop_id", "stop_lat", "stop_lon"]).fillna("")
+    return pd.DataFrame({
+        "stop_id": stops["stop_id"].str.strip(),
+        "stop_lat": pd.to_numeric(stops["stop_lat"], errors="coerce"),
+        "stop_lon": pd.to_numeric(stops["stop_lon"], errors="coerce"),
+    })
+
+def stops_from_variants(all_data: dict) -> pd.DataFrame:
+    """Every stop in all_routes_stops_by_variant.json (first coordinates seen per stop_id)."""
+    rows = {}
+    for route in all_data.values():
+        for v in route.get("variants", []):
+            by_dir = v.get("by_direction", {})
+            if not isinstance(by_dir, dict):
+                continue
+            for drec in by_dir.values():
+                for s in drec.get("stops_ordered", []):
+                    if isinstance(s, dict):
+                        sid = str(s.get("stop_id", "")).strip()
+                        if sid and sid not in rows:
+                            rows[sid] = (s.get("stop_lat"), s.get("stop_lon"))
+    df = pd.DataFrame([(sid, lat, lon) for sid, (lat, lon) in rows.items()],
+                      columns=["stop_id", "stop_lat", "stop_lon"])
+    df["stop_lat"] = pd.to_numeric(df["stop_lat"], errors="coerce")
+    df["stop_lon"] = pd.to_numeric(df["stop_lon"], errors="coerce")
+    return df
+
+def assign_areas(stops: pd.DataFrame, layers: dict) -> pd.DataFrame:
+    """stops (stop_id, stop_lat, stop_lon) plus one column per layer name -> PolygonLayer."""
+    out = stops.copy()
+    for name, layer in layers.items():
+        out[name] = layer.locate(out["stop_lon"].to_numpy(), out["stop_lat"].to_numpy())
+    return out
+
+# ----------------------------
+# JOIN TO OUTPUTS
+# ----------------------------
+def read_stop_areas(path: Path = STOP_AREAS_CSV) -> pd.DataFrame:
+    """stop_areas.csv indexed by stop_id (layer columns only), or None if it isn't there."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return df.drop(columns=["stop_lat", "stop_lon"], errors="ignore").set_index("stop_id")
+
+def with_stop_areas(df: pd.DataFrame, areas: pd.DataFrame) -> pd.DataFrame:
+    """Add the layer columns of read_stop_areas() to a frame with a stop_id column ("" if unknown)."""
+    if areas is None or "stop_id" not in df.columns:
+        return df
+    joined = areas.reindex(df["stop_id"].astype(str).str.strip().to_numpy())
+    out = df.copy()
+    for c in areas.columns:
+        out[c] = joined[c].fillna("").to_numpy()
+    return out
+
+def run(stops_txt: Path = STOPS_TXT, variants_json: Path = VARIANTS_JSON, layers: dict = LAYERS,
+        out_csv: Path = STOP_AREAS_CSV) -> pd.DataFrame:
+    frames = []
+    if stops_txt is not None and Path(stops_txt).exists():
+        frames.append(stops_from_gtfs(stops_txt))
+    if variants_json is not None and Path(variants_json).exists():
+        with open(variants_json, "r", encoding="utf-8") as f:
+            frames.append(stops_from_variants(json.load(f)))
+    stops = pd.concat(frames, ignore_index=True).drop_duplicates("stop_id", keep="first")
+
+    loaded = {name: load_layer(path, prop) for name, (path, prop) in layers.items()}
+    out = assign_areas(stops, loaded)
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(out_csv, index=False)
+    for name in loaded:
+        print(f"{name}: {out[name].notna().sum()} / {len(out)} stops inside a polygon")
+    print(f"Wrote CSV : {out_csv}")
+    return out
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gtfs_reader import MISSING_TIME, iter_stop_times
+
+# ----------------------------
+# COMPILED GTFS CACHE
+# ----------------------------
+# stop_times.txt is the biggest file in the feed and both invariants.py and compare23.py
+# used to re-parse it as strings on every run. compile_gtfs() turns the feed into a folder
+# of .npy arrays that open memory-mapped in milliseconds:
+#
+#   vocab.json            trip_id / stop_id / route_id / shape_id / service_id strings;
+#                         every other file refers to them by integer code (list index)
+#   trip_*.npy            per-trip route, shape, service and direction codes
+#   stop_lat/lon.npy      per-stop coordinates
+#   st_*.npy              stop_times sorted by (trip, stop_sequence), times as int seconds
+#   trip_start.npy        trip code t owns st_* rows [trip_start[t], trip_start[t + 1])
+#   sched_key/arrival.npy sorted trip_code * n_stops + stop_code -> scheduled arrival,
+#                         first (lowest stop_sequence) visit when a trip repeats a stop
+#   manifest.json         source file hashes; written last, so a cache without it is incomplete
+#
+# open_gtfs_cache() recompiles automatically when any source .txt hash changes. Files whose
+# size and mtime are unchanged aren't re-hashed, so an up-to-date open stays fast.
+#
+# Each compile writes a new version folder, <cache_dir>/v<time>-<pid>-<random>, and only
+# then points <cache_dir>/current.json at it (os.replace of one small file, atomic), so
+# processes compiling at the same time never share a folder and readers never see a
+# half-written one. GTFSCache resolves current.json once and maps every array of that
+# version when it opens, so a later compile doesn't pull files out from under it.
+# Superseded versions are deleted by a later compile once they've been superseded for
+# CLEANUP_AFTER_SECONDS; one still mapped on Windows can't be, and is retried next time.
+
+CACHE_VERSION = 1
+POINTER_FILE = "current.json"
+CLEANUP_AFTER_SECONDS = 3600
+SOURCE_FILES = ["trips.txt", "stop_times.txt", "stops.txt", "routes.txt"]
+
+def seconds_to_gtfs_time(secs: int) -> str:
+    secs = int(secs)
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _source_state(gtfs_dir: Path, previous: dict) -> dict:
+    """{file: {size, mtime, sha256}} reusing previous hashes when size/mtime match."""
+    state = {}
+    for name in SOURCE_FILES:
+        path = gtfs_dir / name
+        if not path.exists():
+            continue
+        st = path.stat()
+        old = previous.get(name, {})
+        if old.get("size") == st.st_size and old.get("mtime") == st.st_mtime_ns:
+            digest = old["sha256"]
+        else:
+            digest = _file_hash(path)
+        state[name] = {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": digest}
+    return state
+
+def _codes(values: pd.Series, vocab: list, index: dict) -> np.ndarray:
+    """Map strings to codes in vocab, appending unseen values (in first-seen order)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        local, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        local, uniques = pd.factorize(values)
+    for v in uniques:
+        if v not in index:
+            index[v] = len(vocab)
+            vocab.append(v)
+    mapping = np.fromiter((index[v] for v in uniques), dtype=np.int32, count=len(uniques))
+    return np.where(local >= 0, mapping[local], -1).astype(np.int32)
+
+# ----------------------------
+# VERSIONS
+# ----------------------------
+def _replace(src: Path, dst: Path, attempts: int = 20):
+    """os.replace, retried while another process has dst open for a moment (Windows)."""
+    for i in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+def _write_json(path: Path, obj):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    _replace(tmp, path)
+
+def current_version_dir(cache_dir: Path):
+    """The version folder current.json points at, or None if there's no complete cache."""
+    try:
+        with open(Path(cache_dir) / POINTER_FILE, "r", encoding="utf-8") as f:
+            name = json.load(f)["version"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    version = Path(cache_dir) / name
+    return version if (version / "manifest.json").exists() else None
+
+def _cleanup(cache_dir: Path, keep: str):
+    """Delete versions superseded long enough ago, and files of the old unversioned layout."""
+    cutoff = time.time() - CLEANUP_AFTER_SECONDS
+    for d in cache_dir.glob("v*"):
+        if d.is_dir() and d.name != keep and d.stat().st_mtime < cutoff:
+            shutil.rmtree(d, ignore_errors=True)
+    # Pointer temp files left by a crashed compile
+    stale = [f for f in cache_dir.glob(".*.tmp") if f.stat().st_mtime < cutoff]
+    for f in [*stale, *cache_dir.glob("*.npy"), cache_dir / "vocab.json", cache_dir / "manifest.json"]:
+        try:
+            f.unlink()
+        except OSError:
+            pass
+
+# ----------------------------
+# COMPILE
+# ----------------------------
+def compile_gtfs(gtfs_dir: Path, cache_dir: Path, sources: dict = None) -> Path:
+    """Compile the feed into a new version folder under cache_dir and make it current."""
+    gtfs_dir, cache_dir = Path(gtfs_dir), Path(cache_dir)
+
+    trips = pd.read_csv(gtfs_dir / "trips.txt", dtype=str).fillna("")
+    stops = pd.read_csv(gtfs_dir / "stops.txt", dtype=str).fillna("")
+    vocab = {k: [] for k in ("trip_id", "stop_id", "route_id", "shape_id", "service_id")}
+    index = {k: {} for k in vocab}
+
+    # trips.txt / stops.txt order first, so codes are stable and easy to eyeball
+    trip_code = _codes(trips["trip_id"], vocab["trip_id"], index["trip_id"])
+    stop_code = _codes(stops["stop_id"], vocab["stop_id"], index["stop_id"])
+
+    arrays = {
+        "trip_route": _codes(trips["route_id"], vocab["route_id"], index["route_id"]),
+        "trip_shape": _codes(trips.get("shape_id", pd.Series([""] * len(trips))).str.strip(),
+                             vocab["shape_id"], index["shape_id"]),
+        "trip_service": _codes(trips["service_id"], vocab["service_id"], index["service_id"]),
+        "trip_direction": pd.to_numeric(trips.get("direction_id", pd.Series([""] * len(trips))),
+                                        errors="coerce").fillna(-1).to_numpy(dtype=np.int8),
+    }
+    # trips.txt rows are in trip_code order only if trip_ids are unique; reorder to be sure
+    for name in list(arrays):
+        out = np.full(len(vocab["trip_id"]), -1, dtype=arrays[name].dtype)
+        out[trip_code] = arrays[name]
+        arrays[name] = out
+
+    lat = np.full(len(vocab["stop_id"]), np.nan)
+    lon = np.full(len(vocab["stop_id"]), np.nan)
+    if "stop_lat" in stops.columns and "stop_lon" in stops.columns:
+        lat[stop_code] = pd.to_numeric(stops["stop_lat"], errors="coerce")
+        lon[stop_code] = pd.to_numeric(stops["stop_lon"], errors="coerce")
+
+    # stop_times is streamed in chunks and turned into int arrays as it goes, so its
+    # string columns never exist all at once. It may mention trips/stops missing from
+    # trips.txt/stops.txt; they get codes too.
+    parts = {k: [] for k in ("trip", "stop", "seq", "arrival", "departure")}
+    st_cols = ["trip_id", "stop_id", "stop_sequence", "arrival_time", "departure_time"]
+    for chunk in iter_stop_times(gtfs_dir / "stop_times.txt", st_cols):
+        parts["trip"].append(_codes(chunk["trip_id"], vocab["trip_id"], index["trip_id"]))
+        parts["stop"].append(_codes(chunk["stop_id"], vocab["stop_id"], index["stop_id"]))
+        parts["seq"].append(chunk["stop_sequence"].to_numpy(dtype=np.int32))
+        parts["arrival"].append(chunk["arrival_time"].to_numpy(dtype=np.int32))
+        parts["departure"].append(chunk["departure_time"].to_numpy(dtype=np.int32))
+    st_trip, st_stop, st_seq, st_arrival, st_departure = (
+        np.concatenate(p) if p else np.array([], dtype=np.int32) for p in parts.values()
+    )
+    del parts
+
+    n_trips, n_stops = len(vocab["trip_id"]), len(vocab["stop_id"])
+    for name in ("trip_route", "trip_shape", "trip_service", "trip_direction"):
+        if len(arrays[name]) < n_trips:
+            arrays[name] = np.concatenate(
+                [arrays[name], np.full(n_trips - len(arrays[name]), -1, dtype=arrays[name].dtype)]
+            )
+    if len(lat) < n_stops:
+        pad = np.full(n_stops - len(lat), np.nan)
+        lat, lon = np.concatenate([lat, pad]), np.concatenate([lon, pad])
+
+    order = np.lexsort((st_seq, st_trip))
+    st_trip, st_stop, st_seq = st_trip[order], st_stop[order], st_seq[order]
+    st_arrival, st_departure = st_arrival[order], st_departure[order]
+    trip_start = np.searchsorted(st_trip, np.arange(n_trips + 1)).astype(np.int64)
+
+    # (trip, stop) -> arrival, first visit wins (rows are already in sequence order)
+    key = st_trip.astype(np.int64) * n_stops + st_stop
+    key_order = np.argsort(key, kind="stable")
+    sorted_key = key[key_order]
+    first = np.ones(len(sorted_key), dtype=bool)
+    first[1:] = sorted_key[1:] != sorted_key[:-1]
+
+    arrays.update({
+        "stop_lat": lat,
+        "stop_lon": lon,
+        "st_trip": st_trip,
+        "st_stop": st_stop,
+        "st_seq": st_seq,
+        "st_arrival": st_arrival,
+        "st_departure": st_departure,
+        "trip_start": trip_start,
+        "sched_key": sorted_key[first],
+        "sched_arrival": st_arrival[key_order][first],
+    })
+
+    # A folder of our own; the manifest goes last, so a folder without one is incomplete
+    version = cache_dir / f"v{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{secrets.token_hex(3)}"
+    version.mkdir(parents=True)
+    for name, arr in arrays.items():
+        np.save(version / f"{name}.npy", np.ascontiguousarray(arr))
+    with open(version / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    _write_json(version / "manifest.json", {
+        "version": CACHE_VERSION,
+        "sources": sources if sources is not None else _source_state(gtfs_dir, {}),
+        "n_trips": n_trips,
+        "n_stops": n_stops,
+    })
+
+    previous = current_version_dir(cache_dir)
+    _write_json(cache_dir / POINTER_FILE, {"version": version.name})
+    if previous is not None and previous != version:
+        # Its cleanup grace period starts now
+        try:
+            os.utime(previous)
+        except OSError:
+            pass
+    _cleanup(cache_dir, keep=version.name)
+    return version
+
+# ----------------------------
+# OPEN
+# ----------------------------
+class GTFSCache:
+    def __init__(self, cache_dir: Path):
+        """cache_dir: a cache folder (opens its current version) or one version folder."""
+        path = Path(cache_dir)
+        version = current_version_dir(path)
+        if version is None and not (path / "manifest.json").exists():
+            raise FileNotFoundError(f"No compiled GTFS cache in {path}")
+        # The version folder: hand this to other processes so they open the same build
+        self.cache_dir = version or path
+        with open(self.cache_dir / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        with open(self.cache_dir / "vocab.json", "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+
+        self.trip_ids = vocab["trip_id"]
+        self.stop_ids = vocab["stop_id"]
+        self.route_ids = vocab["route_id"]
+        self.shape_ids = vocab["shape_id"]
+        self.service_ids = vocab["service_id"]
+        self.n_stops = len(self.stop_ids)
+        self._trip_index = None
+        self._stop_index = None
+
+        # Mapped now (which reads nothing yet), so this version's data stays readable even
+        # if a later compile deletes its files
+        for npy in self.cache_dir.glob("*.npy"):
+            setattr(self, npy.stem, np.load(npy, mmap_mode="r"))
+
+    @property
+    def trip_index(self) -> pd.Index:
+        if self._trip_index is None:
+            self._trip_index = pd.Index(self.trip_ids)
+        return self._trip_index
+
+    @property
+    def stop_index(self) -> pd.Index:
+        if self._stop_index is None:
+            self._stop_index = pd.Index(self.stop_ids)
+        return self._stop_index
+
+    def trip_codes(self, trip_ids) -> np.ndarray:
+        """trip_id strings -> codes, -1 for trips the feed doesn't know."""
+        return self.trip_index.get_indexer(pd.Index(trip_ids).astype(str).str.strip())
+
+    def stop_codes(self, stop_ids) -> np.ndarray:
+        """stop_id strings -> codes, -1 for stops the feed doesn't know."""
+        return self.stop_index.get_indexer(pd.Index(stop_ids).astype(str).str.strip())
+
+    def lookup_arrival(self, trip_ids, stop_ids) -> np.ndarray:
+        """Scheduled arrival seconds for each (trip_id, stop_id) pair, MISSING_TIME if not scheduled."""
+        trips = self.trip_codes(trip_ids).astype(np.int64)
+        stops = self.stop_codes(stop_ids).astype(np.int64)
+        out = np.full(len(trips), MISSING_TIME, dtype=np.int32)
+        ok = (trips >= 0) & (stops >= 0)
+        if not ok.any() or not len(self.sched_key):
+            return out
+
+        keys = trips[ok] * self.n_stops + stops[ok]
+        pos = np.searchsorted(self.sched_key, keys)
+        pos = np.minimum(pos, len(self.sched_key) - 1)
+        hit = self.sched_key[pos] == keys
+        found = np.full(len(keys), MISSING_TIME, dtype=np.int32)
+        found[hit] = self.sched_arrival[pos[hit]]
+        out[ok] = found
+        return out
+
+    def stop_times_for_trips(self, trip_ids) -> pd.DataFrame:
+        """stop_times rows for the given trip_ids, sorted by (trip code, stop_sequence)."""
+        codes = np.unique(self.trip_codes(list(trip_ids)))
+        codes = codes[codes >= 0]
+        rows = np.concatenate(
+            [np.arange(self.trip_start[c], self.trip_start[c + 1]) for c in codes]
+            or [np.array([], dtype=np.int64)]
+        )
+        return pd.DataFrame({
+            "trip_id": np.asarray(self.trip_ids, dtype=object)[self.st_trip[rows]],
+            "stop_id": np.asarray(self.stop_ids, dtype=object)[self.st_stop[rows]],
+            "stop_sequence": np.asarray(self.st_seq[rows], dtype=np.int64),
+            "arrival_seconds": np.asarray(self.st_arrival[rows]),
+            "departure_seconds": np.asarray(self.st_departure[rows]),
+        })
+
+def open_gtfs_cache(gtfs_dir: Path, cache_dir: Path = None) -> GTFSCache:
+    """Open the compiled cache for gtfs_dir, (re)compiling it first if the feed changed."""
+    gtfs_dir = Path(gtfs_dir)
+    cache_dir = Path(cache_dir) if cache_dir else gtfs_dir / "compiled"
+
+    previous = {}
+    version = current_version_dir(cache_dir)
+    if version is not None:
+        with open(version / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == CACHE_VERSION:
+            previous = manifest.get("sources", {})
+
+    sources = _source_state(gtfs_dir, previous)
+    if not previous or sources != previous:
+        hashes_same = previous and all(
+            previous.get(k, {}).get("sha256") == v["sha256"] for k, v in sources.items()
+        ) and set(previous) == set(sources)
+        if hashes_same:
+            # Only mtimes moved (ex. the feed was re-copied); just refresh the manifest
+            manifest["sources"] = sources
+            _write_json(version / "manifest.json", manifest)
+        else:
+            print(f"Compiling GTFS cache: {gtfs_dir} -> {cache_dir}")
+            compile_gtfs(gtfs_dir, cache_dir, sources)
+
+    return GTFSCache(cache_dir)
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# ----------------------------
+# STREAMING stop_times.txt READER
+# ----------------------------
+# pd.read_csv(stop_times.txt, dtype=str) materializes every column of every row as Python
+# strings before anything is thrown away, which is the peak-memory event for the whole
+# pipeline. These helpers read it in chunks instead, parse only the requested columns,
+# give them compact dtypes, and can drop rows for unwanted trips before they pile up:
+#
+#   trip_id, stop_id                 category
+#   stop_sequence                    int32
+#   arrival_time, departure_time     int32 seconds past midnight (-1 if blank), when
+#                                    times_as_seconds=True; otherwise category
+#   anything else                    category
+
+CHUNKSIZE = 500_000
+TIME_COLUMNS = ("arrival_time", "departure_time")
+MISSING_TIME = -1
+
+def gtfs_time_to_seconds(times: pd.Series) -> np.ndarray:
+    """Vectorized GTFS "HH:MM:SS" (hours may be >= 24) -> int seconds, MISSING_TIME if blank/bad."""
+    if isinstance(times.dtype, pd.CategoricalDtype):
+        # Parse each distinct time once
+        secs = gtfs_time_to_seconds(pd.Series(times.cat.categories.astype(str)))
+        return np.where(times.cat.codes >= 0, secs[times.cat.codes], MISSING_TIME).astype(np.int32)
+
+    parts = times.astype(str).str.strip().str.split(":", n=2, expand=True)
+    if parts.shape[1] < 3:
+        return np.full(len(times), MISSING_TIME, dtype=np.int32)
+    h = pd.to_numeric(parts[0], errors="coerce")
+    m = pd.to_numeric(parts[1], errors="coerce")
+    s = pd.to_numeric(parts[2], errors="coerce")
+    return (h * 3600 + m * 60 + s).fillna(MISSING_TIME).to_numpy(dtype=np.int32)
+
+def iter_stop_times(path: Path, columns, trip_ids=None, chunksize: int = CHUNKSIZE,
+                    times_as_seconds: bool = True):
+    """Yield stop_times.txt chunks with only `columns`, optionally only rows for `trip_ids`."""
+    columns = list(columns)
+    wanted = set(columns)
+    if trip_ids is not None:
+        wanted.add("trip_id")
+        trip_ids = pd.Index(pd.unique(pd.Series(list(trip_ids), dtype=str)))
+
+    dtype = {c: ("int32" if c == "stop_sequence" else "category") for c in wanted}
+
+    reader = pd.read_csv(
+        path, usecols=lambda c: c in wanted, dtype=dtype, chunksize=chunksize,
+        keep_default_na=False,
+    )
+    for chunk in reader:
+        missing = wanted - set(chunk.columns)
+        if missing:
+            raise ValueError(f"{Path(path).name} missing columns: {missing}")
+
+        if trip_ids is not None:
+            chunk = chunk[chunk["trip_id"].isin(trip_ids)]
+            if chunk.empty:
+                continue
+
+        if times_as_seconds:
+            for c in TIME_COLUMNS:
+                if c in chunk.columns:
+                    chunk[c] = gtfs_time_to_seconds(chunk[c])
+
+        yield chunk[columns]
+
+def concat_chunks(chunks: list, columns) -> pd.DataFrame:
+    """pd.concat that keeps categoricals categorical even when chunk categories differ."""
+    if not chunks:
+        return pd.DataFrame({c: pd.Series(dtype="category") for c in columns})
+    out = {}
+    for c in columns:
+        parts = [ch[c] for ch in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            out[c] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            out[c] = pd.Series(np.concatenate([p.to_numpy() for p in parts]))
+    return pd.DataFrame(out)
+
+def read_stop_times(path: Path, columns, trip_ids=None, chunksize: int = CHUNKSIZE,
+                    times_as_seconds: bool = True) -> pd.DataFrame:
+    """Whole (filtered) stop_times as one compact DataFrame. See iter_stop_times."""
+    chunks = list(iter_stop_times(path, columns, trip_ids, chunksize, times_as_seconds))
+    return concat_chunks(chunks, list(columns))
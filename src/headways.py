@@ -0,0 +1,286 @@
+import json
+import os
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from archive import list_partitions, partition_dir, read_partition
+from gtfs_cache import MISSING_TIME, open_gtfs_cache
+from trips import ARRIVAL_SLACK_SECONDS
+
+# ----------------------------
+# CONFIG (edit these)
+# ----------------------------
+GTFS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\thebus_gtfs")
+GTFS_CACHE_DIR = GTFS_DIR / "compiled"
+
+ARCHIVE_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\archive")
+OUT_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\headways")
+
+# Service dates to roll up (END_DATE None = just START_DATE). Routes None = every route.
+START_DATE = date.today() - timedelta(days=7)
+END_DATE = date.today()
+ROUTES = None
+
+# ----------------------------
+# HEADWAY / BUNCHING ANALYTICS
+# ----------------------------
+# compare.py looks at one arrival at a time (schedule deviation). This looks at the gaps
+# between consecutive buses at each stop. Per archive partition (service_date, route):
+#
+#   1) observed arrivals: the archive holds one row per poll per (trip, stop); the last
+#      poll that listed a (trip, stop) gives its arrival, same rule as trips.py
+#   2) headways: arrivals sorted by (route, direction, stop, arrival) and diffed
+#      within each group; the scheduled headway is the diff of the same two trips'
+#      GTFS times, so overtaking shows up as a negative scheduled headway
+#   3) bunched: headway < BUNCHING_FRACTION of scheduled (BUNCHING_SECONDS without GTFS)
+#      gap:     headway > GAP_FRACTION of scheduled
+#
+# Output, under OUT_DIR, in the archive's partition layout:
+#
+#   headways/service_date=.../route=.../part.parquet   one row per observed headway
+#   hourly/...                                          per (direction, stop, hour of day)
+#   rolling/...                                         percentiles over the trailing
+#                                                       ROLLING_DAYS of headways
+#
+# manifest.json remembers which segment files each partition was built from. Archive
+# segments are append-only, so only partitions with new segments are redone (plus the
+# rolling windows that include them).
+
+BUNCHING_FRACTION = 0.25
+BUNCHING_SECONDS = 120
+GAP_FRACTION = 1.5
+ROLLING_DAYS = 7
+ROLLING_QUANTILES = [0.1, 0.5, 0.9]
+
+GROUP = ["route", "direction", "stop_id"]
+HEADWAY_COLUMNS = GROUP + [
+    "trip", "prev_trip", "vehicle", "arrival", "hour",
+    "headway_min", "sched_headway_min", "headway_ratio", "bunched", "gap",
+]
+ARCHIVE_COLUMNS = ["poll_time", "stop_id", "trip", "route", "vehicle", "direction", "stop_time", "canceled"]
+
+# ----------------------------
+# OBSERVED ARRIVALS
+# ----------------------------
+def observed_arrivals(raw: pd.DataFrame, slack_seconds: int = ARRIVAL_SLACK_SECONDS) -> pd.DataFrame:
+    """
+    One row per (trip, stop) from archived prediction rows:
+    arrival = last prediction, no earlier than the last poll that listed it.
+    (trip, stop) pairs still listed by the partition's final poll aren't done yet and
+    are left out, as are ones whose last prediction was still > slack_seconds away.
+    """
+    df = raw[raw["stop_time"].notna() & (raw["trip"] != "") & (raw["canceled"] != 1)]
+    if df.empty:
+        return pd.DataFrame(columns=GROUP + ["trip", "vehicle", "arrival"])
+
+    df = df.sort_values(["trip", "stop_id", "poll_time"], kind="stable")
+    last = df.drop_duplicates(["trip", "stop_id"], keep="last")
+
+    lead = (last["stop_time"] - last["poll_time"]).dt.total_seconds()
+    done = (last["poll_time"] < df["poll_time"].max()) & (lead <= slack_seconds)
+    last = last[done]
+    arrival = last["stop_time"].where(last["stop_time"] >= last["poll_time"], last["poll_time"])
+    return pd.DataFrame({
+        "route": last["route"].to_numpy(),
+        "direction": last["direction"].to_numpy(),
+        "stop_id": last["stop_id"].to_numpy(),
+        "trip": last["trip"].to_numpy(),
+        "vehicle": last["vehicle"].to_numpy(),
+        "arrival": arrival.to_numpy(),
+    })
+
+# ----------------------------
+# HEADWAYS (vectorized)
+# ----------------------------
+def compute_headways(arrivals: pd.DataFrame, service_date: date, gtfs=None) -> pd.DataFrame:
+    """Consecutive-bus headways within each (route, direction, stop), with schedule adherence."""
+    if arrivals.empty:
+        return pd.DataFrame(columns=HEADWAY_COLUMNS)
+
+    df = arrivals.sort_values(GROUP + ["arrival"], kind="stable").reset_index(drop=True)
+
+    # Row i starts a new group if any key differs from row i - 1
+    new_group = np.zeros(len(df), dtype=bool)
+    new_group[0] = True
+    for c in GROUP:
+        v = df[c].to_numpy()
+        new_group[1:] |= v[1:] != v[:-1]
+
+    t = df["arrival"].to_numpy().astype("datetime64[s]").astype(np.int64)
+    headway = np.empty(len(df))
+    headway[0] = np.nan
+    headway[1:] = t[1:] - t[:-1]
+    headway[new_group] = np.nan
+
+    if gtfs is not None:
+        sched = gtfs.lookup_arrival(df["trip"].to_numpy(), df["stop_id"].to_numpy()).astype(np.float64)
+        sched[sched == MISSING_TIME] = np.nan
+    else:
+        sched = np.full(len(df), np.nan)
+    sched_headway = np.empty(len(df))
+    sched_headway[0] = np.nan
+    sched_headway[1:] = sched[1:] - sched[:-1]
+    sched_headway[new_group] = np.nan
+
+    trips = df["trip"].to_numpy()
+    prev_trip = np.empty(len(df), dtype=object)
+    prev_trip[1:] = trips[:-1]
+    prev_trip[new_group] = None
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        has_sched = sched_headway > 0
+        ratio = np.where(has_sched, headway / sched_headway, np.nan)
+        bunched = np.where(has_sched, headway < BUNCHING_FRACTION * sched_headway, headway < BUNCHING_SECONDS)
+        gap = has_sched & (headway > GAP_FRACTION * sched_headway)
+
+    out = pd.DataFrame({
+        "route": df["route"],
+        "direction": df["direction"],
+        "stop_id": df["stop_id"],
+        "trip": df["trip"],
+        "prev_trip": prev_trip,
+        "vehicle": df["vehicle"],
+        "arrival": df["arrival"],
+        "hour": df["arrival"].dt.hour.to_numpy(),
+        "headway_min": headway / 60.0,
+        "sched_headway_min": sched_headway / 60.0,
+        "headway_ratio": ratio,
+        "bunched": bunched,
+        "gap": gap,
+    })
+    out = out[~new_group].reset_index(drop=True)
+    out.insert(0, "service_date", service_date)
+    return out
+
+def hourly_rollup(headways: pd.DataFrame) -> pd.DataFrame:
+    """Per (route, direction, stop, hour): headway stats, adherence and bunching/gap counts."""
+    keys = GROUP + ["hour"]
+    if headways.empty:
+        return pd.DataFrame(columns=["service_date"] + keys)
+    g = headways.groupby(keys, sort=True, observed=True)
+    out = g.agg(
+        n_headways=("headway_min", "size"),
+        mean_headway_min=("headway_min", "mean"),
+        std_headway_min=("headway_min", "std"),
+        sched_mean_headway_min=("sched_headway_min", "mean"),
+        mean_headway_ratio=("headway_ratio", "mean"),
+        bunched=("bunched", "sum"),
+        gaps=("gap", "sum"),
+    )
+    q = g["headway_min"].quantile([0.5, 0.9]).unstack()
+    out["p50_headway_min"] = q[0.5]
+    out["p90_headway_min"] = q[0.9]
+    # Coefficient of variation: 0 = perfectly even spacing
+    out["cv_headway"] = out["std_headway_min"] / out["mean_headway_min"]
+    out = out.reset_index()
+    out.insert(0, "service_date", headways["service_date"].iloc[0])
+    return out
+
+def rolling_percentiles(headways: pd.DataFrame, service_date: date) -> pd.DataFrame:
+    """Headway percentiles and bunching rate per (route, direction, stop, hour) over a window of days."""
+    keys = GROUP + ["hour"]
+    if headways.empty:
+        return pd.DataFrame(columns=["service_date"] + keys)
+    g = headways.groupby(keys, sort=True, observed=True)
+    out = g["headway_min"].quantile(ROLLING_QUANTILES).unstack()
+    out.columns = [f"p{int(q * 100)}_headway_min" for q in ROLLING_QUANTILES]
+    out["n_headways"] = g.size()
+    out["n_days"] = g["service_date"].nunique()
+    out["bunched_rate"] = g["bunched"].mean()
+    out["gap_rate"] = g["gap"].mean()
+    out = out.reset_index()
+    out.insert(0, "service_date", service_date)
+    return out
+
+# ----------------------------
+# INCREMENTAL RUN
+# ----------------------------
+def _write(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+def _read(path: Path) -> pd.DataFrame:
+    return pq.read_table(path).to_pandas() if path.exists() else pd.DataFrame()
+
+def _segments(folder: Path) -> dict:
+    return {p.name: p.stat().st_size for p in sorted(folder.glob("*.parquet"))}
+
+def _load_manifest(out_dir: Path) -> dict:
+    path = out_dir / "manifest.json"
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(out_dir: Path, manifest: dict):
+    tmp = out_dir / "manifest.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, out_dir / "manifest.json")
+
+def update(archive_dir: Path, out_dir: Path, start_date: date, end_date: date = None, routes=None,
+           gtfs=None, full: bool = False) -> list:
+    """
+    Bring headways/hourly/rolling up to date for partitions in [start_date, end_date].
+    Returns the (service_date, route) partitions that were rebuilt.
+    """
+    out_dir = Path(out_dir)
+    manifest = {} if full else _load_manifest(out_dir)
+
+    changed = []
+    for d, route, folder in list_partitions(archive_dir, start_date, end_date, routes):
+        key = f"{d.isoformat()}/{route}"
+        segments = _segments(folder)
+        if manifest.get(key) == segments:
+            continue
+
+        raw = read_partition(folder, ARCHIVE_COLUMNS)
+        headways = compute_headways(observed_arrivals(raw), d, gtfs)
+        _write(headways, partition_dir(out_dir / "headways", d, route) / "part.parquet")
+        _write(hourly_rollup(headways), partition_dir(out_dir / "hourly", d, route) / "part.parquet")
+        manifest[key] = segments
+        changed.append((d, route))
+
+    # A day's headways feed the rolling windows of the next ROLLING_DAYS - 1 days too
+    redo = set()
+    for d, route in changed:
+        for k in range(ROLLING_DAYS):
+            day = d + timedelta(days=k)
+            if partition_dir(out_dir / "headways", day, route).exists():
+                redo.add((day, route))
+    for day, route in sorted(redo):
+        window = [_read(partition_dir(out_dir / "headways", day - timedelta(days=k), route) / "part.parquet")
+                  for k in range(ROLLING_DAYS)]
+        window = [w for w in window if not w.empty]
+        headways = pd.concat(window, ignore_index=True) if window else pd.DataFrame(columns=HEADWAY_COLUMNS)
+        _write(rolling_percentiles(headways, day), partition_dir(out_dir / "rolling", day, route) / "part.parquet")
+
+    if changed:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        _save_manifest(out_dir, manifest)
+    return changed
+
+def read_rollup(out_dir: Path, kind: str, start_date: date, end_date: date = None, routes=None) -> pd.DataFrame:
+    """kind: "headways", "hourly" or "rolling". All partitions in range, concatenated."""
+    frames = [_read(folder / "part.parquet")
+              for _d, _route, folder in list_partitions(Path(out_dir) / kind, start_date, end_date, routes)]
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def run(archive_dir: Path = ARCHIVE_DIR, out_dir: Path = OUT_DIR, start_date: date = START_DATE,
+        end_date: date = END_DATE, routes=ROUTES, gtfs_dir: Path = GTFS_DIR,
+        gtfs_cache_dir: Path = GTFS_CACHE_DIR, full: bool = False) -> list:
+    gtfs = open_gtfs_cache(gtfs_dir, gtfs_cache_dir) if gtfs_dir is not None else None
+    changed = update(archive_dir, out_dir, start_date, end_date, routes, gtfs, full)
+    print(f"Rebuilt {len(changed)} partition(s) -> {out_dir}")
+    return changed
+
+if __name__ == "__main__":
+    run()
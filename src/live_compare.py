@@ -0,0 +1,199 @@
+import math
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+
+from archive import service_date_for
+from gtfs_cache import MISSING_TIME, seconds_to_gtfs_time
+from records import from_wall_epoch
+from service_windows import active_service_ids
+from trips import service_day_delay
+
+# ----------------------------
+# STREAMING SCHEDULE COMPARISON
+# ----------------------------
+# compare.py's diff_minutes, computed inside the poller as each cycle lands instead of by
+# rereading snapshots and the GTFS feed afterwards:
+#
+#   schedule index   sched_key/sched_arrival from the compiled GTFS cache, cut down to
+#                    trips whose service runs today or yesterday (late trips), rebuilt
+#                    when the date changes
+#   diff_minutes     estimate - scheduled, with the GTFS seconds counted from the trip's
+#                    service day (trips.service_day_delay), so yesterday's 24:30:00 trip
+#                    seen at 00:30 is on time, not -1440
+#   aggregates       per route and per stop, over the LATEST diff of every (trip, stop):
+#                    each cycle a trip's new prediction replaces its previous one in the
+#                    running sums rather than being counted again. A (trip, stop) not seen
+#                    for FINAL_AFTER_SECONDS keeps its last diff and leaves memory.
+#
+# Aggregates reset at the start of each service day.
+
+FINAL_AFTER_SECONDS = 20 * 60
+LATE_MINUTES = 5.0      # diff > this is "late"
+EARLY_MINUTES = -1.0    # diff < this is "early"
+
+class DelayStats:
+    __slots__ = ("n", "total", "total_sq", "late", "early")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.late = 0
+        self.early = 0
+
+    def add(self, diff: float, sign: int = 1):
+        """sign=-1 takes a previously added diff back out."""
+        self.n += sign
+        self.total += sign * diff
+        self.total_sq += sign * diff * diff
+        self.late += sign * (diff > LATE_MINUTES)
+        self.early += sign * (diff < EARLY_MINUTES)
+
+    def to_dict(self) -> dict:
+        if self.n <= 0:
+            return {"n": 0}
+        mean = self.total / self.n
+        var = max(0.0, self.total_sq / self.n - mean * mean)
+        return {
+            "n": self.n,
+            "mean_diff_minutes": round(mean, 2),
+            "std_diff_minutes": round(math.sqrt(var), 2),
+            "late_share": round(self.late / self.n, 3),
+            "early_share": round(self.early / self.n, 3),
+            "on_time_share": round((self.n - self.late - self.early) / self.n, 3),
+        }
+
+class StreamingComparator:
+    def __init__(self, gtfs, gtfs_dir: Path, final_after_seconds: int = FINAL_AFTER_SECONDS):
+        """gtfs: gtfs_cache.GTFSCache for gtfs_dir (opened once by the poller)."""
+        self.gtfs = gtfs
+        self.gtfs_dir = Path(gtfs_dir)
+        self.final_after = final_after_seconds
+
+        self.day = None              # calendar date the schedule index is for
+        self.sched_key = None        # sorted, today's trips only
+        self.sched_arrival = None
+
+        self.service_date = None     # aggregates are for this service day
+        self.latest = {}             # (trip, stop_id) -> [route, diff_minutes, last poll_time]
+        self.by_route = {}
+        self.by_stop = {}
+        self.matched = 0
+        self.unmatched = 0
+
+    def _build_index(self, day: date):
+        g = self.gtfs
+        running = set()
+        for d in (day - timedelta(days=1), day):
+            svc = active_service_ids(self.gtfs_dir, d)
+            if svc is None:
+                running = None
+                break
+            running |= svc
+
+        key = np.asarray(g.sched_key)
+        arrival = np.asarray(g.sched_arrival)
+        keep = arrival != MISSING_TIME
+        if running is not None:
+            svc_ok = np.isin(np.asarray(g.service_ids, dtype=object), list(running))
+            trip_service = np.asarray(g.trip_service)
+            trip_ok = (trip_service >= 0) & svc_ok[np.maximum(trip_service, 0)]
+            keep &= trip_ok[key // g.n_stops]
+        key, arrival = key[keep], arrival[keep]
+        # Copies, so the index no longer depends on the mmap'd files
+        self.sched_key = np.ascontiguousarray(key)
+        self.sched_arrival = np.ascontiguousarray(arrival)
+        self.day = day
+
+    def _lookup(self, trips: list, stops: list) -> np.ndarray:
+        """Scheduled seconds per (trip, stop), MISSING_TIME if not in today's schedule."""
+        t = self.gtfs.trip_codes(trips).astype(np.int64)
+        s = self.gtfs.stop_codes(stops).astype(np.int64)
+        out = np.full(len(t), MISSING_TIME, dtype=np.int64)
+        ok = (t >= 0) & (s >= 0)
+        if not ok.any() or not len(self.sched_key):
+            return out
+        keys = t[ok] * self.gtfs.n_stops + s[ok]
+        pos = np.minimum(np.searchsorted(self.sched_key, keys), len(self.sched_key) - 1)
+        hit = self.sched_key[pos] == keys
+        found = np.full(len(keys), MISSING_TIME, dtype=np.int64)
+        found[hit] = self.sched_arrival[pos[hit]]
+        out[ok] = found
+        return out
+
+    def _stats(self, table: dict, name: str) -> DelayStats:
+        st = table.get(name)
+        if st is None:
+            st = table[name] = DelayStats()
+        return st
+
+    def update(self, poll_time: int, arrivals: list) -> list:
+        """
+        One cycle's records.Arrival objects (GPS-backed). Updates the aggregates and returns
+        one row dict per arrival matched to today's schedule.
+        """
+        now = from_wall_epoch(poll_time)
+        if self.day != now.date():
+            self._build_index(now.date())
+        sd = service_date_for(now)
+        if sd != self.service_date:
+            self.latest, self.by_route, self.by_stop = {}, {}, {}
+            self.matched = self.unmatched = 0
+            self.service_date = sd
+
+        arrivals = [a for a in arrivals if a.trip and a.stop_time]
+        if not arrivals:
+            self._finalize(poll_time)
+            return []
+        sched = self._lookup([a.trip for a in arrivals], [a.stop_id for a in arrivals])
+        est = np.array([a.stop_time for a in arrivals], dtype=np.int64)
+        diff = np.round(service_day_delay(est, sched) / 60.0, 2)
+
+        rows = []
+        for a, s, d in zip(arrivals, sched.tolist(), diff.tolist()):
+            if s == MISSING_TIME:
+                self.unmatched += 1
+                continue
+            self.matched += 1
+            key = (a.trip, a.stop_id)
+            prev = self.latest.get(key)
+            if prev is not None:
+                self._stats(self.by_route, prev[0]).add(prev[1], -1)
+                self._stats(self.by_stop, a.stop_id).add(prev[1], -1)
+            self._stats(self.by_route, a.route).add(d)
+            self._stats(self.by_stop, a.stop_id).add(d)
+            self.latest[key] = [a.route, d, poll_time]
+            rows.append({
+                "date": a.date,
+                "stop_id": a.stop_id,
+                "trip_id": a.trip,
+                "vehicle": a.vehicle,
+                "route": a.route,
+                "scheduled_arrival_time": seconds_to_gtfs_time(s),
+                "estimated_stopTime": a.stopTime,
+                "diff_minutes": d,
+                "poll_time": from_wall_epoch(poll_time).isoformat(),
+            })
+
+        self._finalize(poll_time)
+        return rows
+
+    def _finalize(self, poll_time: int):
+        """Drop (trip, stop) pairs gone quiet; their last diff stays in the aggregates."""
+        cutoff = poll_time - self.final_after
+        for key in [k for k, v in self.latest.items() if v[2] < cutoff]:
+            del self.latest[key]
+
+    def summary(self, poll_time: int) -> dict:
+        """JSON-ready live delay picture for this service day."""
+        return {
+            "service_date": self.service_date.isoformat() if self.service_date else None,
+            "updated": from_wall_epoch(poll_time).isoformat(),
+            "matched": self.matched,
+            "unmatched": self.unmatched,
+            "open_pairs": len(self.latest),
+            "routes": {r: st.to_dict() for r, st in sorted(self.by_route.items())},
+            "stops": {s: st.to_dict() for s, st in sorted(self.by_stop.items())},
+        }
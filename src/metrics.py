@@ -0,0 +1,236 @@
+import bisect
+import json
+import os
+from pathlib import Path
+from datetime import datetime
+
+# ----------------------------
+# POLLER METRICS
+# ----------------------------
+# Collected by poller.run for every cycle and exported two ways:
+#
+#   Prometheus textfile  rewritten atomically after each cycle, for node_exporter's
+#                        textfile collector (counters are cumulative since start)
+#   JSON lines           one summary object appended per cycle, for grepping/pandas
+#
+# Every series carries a tracker="..." label (the route keys being polled) so a fleet of
+# trackers can share one textfile directory and still be told apart.
+
+# Request latency histogram buckets, seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0)
+
+# Stops listed as slowest in each JSON-lines record
+SLOW_STOPS_LOGGED = 5
+
+class Histogram:
+    """Cumulative Prometheus-style histogram."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def prom_lines(self, name: str, labels: str) -> list:
+        lines = []
+        running = 0
+        for le, n in zip(self.buckets + ("+Inf",), self.counts):
+            running += n
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {running}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _percentile(sorted_values: list, q: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class PollMetrics:
+    def __init__(self, tracker: str, budget_seconds: float, prom_file: Path = None,
+                 jsonl_file: Path = None, writer=None):
+        """
+        tracker:        label value identifying this poller process
+        budget_seconds: time one cycle is allowed to take (the poll interval)
+        prom_file:      Prometheus textfile to rewrite each cycle (None = off)
+        jsonl_file:     JSON-lines log to append to each cycle (None = off)
+        writer:         optional writer.BackgroundWriter to hand both files to, instead of
+                        writing them from the calling thread
+        """
+        self.writer = writer
+        self.tracker = tracker
+        self.budget_seconds = budget_seconds
+        self.prom_file = Path(prom_file) if prom_file else None
+        self.jsonl_file = Path(jsonl_file) if jsonl_file else None
+
+        # Cumulative, exported to Prometheus
+        self.latency = {}           # endpoint -> Histogram
+        self.requests = {}          # (endpoint, outcome) -> count
+        self.stop_errors = {}       # (stop_id, kind) -> count, arrivalsJSON only
+        self.stop_polls = {}        # stop_id -> successful polls
+        self.stop_gps = {}          # stop_id -> GPS-backed arrivals seen
+        self.bytes_received = 0
+        self.cycles = 0
+        self.overruns = 0
+        self.deferred = 0           # requests pushed to the next tick
+        self.skipped_ticks = 0
+        self.circuit_skips = 0      # requests not made because a circuit breaker was open
+        self.open_circuits = 0
+        self.cycle_seconds = Histogram(buckets=(1, 5, 10, 20, 30, 45, 60, 90, 120))
+        self.last_cycle = {}
+
+        # Reset every cycle
+        self._cycle_requests = []   # (stop_id, seconds, outcome, nbytes), arrivalsJSON only
+        self._cycle_gps = {}
+        self._cycle_circuit_skips = 0
+
+    # ---- recording (called from the poll loop) ----
+    def record_request(self, key: str, seconds: float, outcome: str, nbytes: int = 0,
+                       endpoint: str = "arrivalsJSON"):
+        """One request attempt. outcome: "ok", "http_error", "timeout" or "error"."""
+        hist = self.latency.get(endpoint)
+        if hist is None:
+            hist = self.latency[endpoint] = Histogram()
+        hist.observe(seconds)
+        self.requests[endpoint, outcome] = self.requests.get((endpoint, outcome), 0) + 1
+        self.bytes_received += nbytes
+        if endpoint != "arrivalsJSON":
+            return
+        if outcome != "ok":
+            self.stop_errors[key, outcome] = self.stop_errors.get((key, outcome), 0) + 1
+        self._cycle_requests.append((key, seconds, outcome, nbytes))
+
+    def record_circuit_skip(self):
+        self.circuit_skips += 1
+        self._cycle_circuit_skips += 1
+
+    def record_stop(self, stop_id: str, gps_arrivals: int):
+        self.stop_polls[stop_id] = self.stop_polls.get(stop_id, 0) + 1
+        self.stop_gps[stop_id] = self.stop_gps.get(stop_id, 0) + gps_arrivals
+        self._cycle_gps[stop_id] = gps_arrivals
+
+    def end_cycle(self, cycle_start: datetime, duration: float, deferred: int = 0,
+                  skipped_ticks: int = 0, open_circuits: int = 0):
+        """Close out one cycle: update cycle metrics and write both exports."""
+        self.open_circuits = open_circuits
+        overrun = max(0.0, duration - self.budget_seconds)
+        self.cycles += 1
+        self.deferred += deferred
+        self.skipped_ticks += skipped_ticks
+        self.overruns += overrun > 0
+        self.cycle_seconds.observe(duration)
+
+        reqs = self._cycle_requests
+        latencies = sorted(r[1] for r in reqs)
+        outcomes = {}
+        for r in reqs:
+            outcomes[r[2]] = outcomes.get(r[2], 0) + 1
+        slowest = sorted(reqs, key=lambda r: r[1], reverse=True)[:SLOW_STOPS_LOGGED]
+
+        self.last_cycle = {
+            "tracker": self.tracker,
+            "cycle": self.cycles,
+            "start": cycle_start.isoformat(timespec="seconds"),
+            "duration_s": round(duration, 3),
+            "budget_s": self.budget_seconds,
+            "overrun_s": round(overrun, 3),
+            "requests": len(reqs),
+            "outcomes": outcomes,
+            "deferred": deferred,
+            "skipped_ticks": skipped_ticks,
+            "circuit_skips": self._cycle_circuit_skips,
+            "open_circuits": open_circuits,
+            "bytes": sum(r[3] for r in reqs),
+            "latency_p50_s": _percentile(latencies, 0.50),
+            "latency_p95_s": _percentile(latencies, 0.95),
+            "latency_max_s": latencies[-1] if latencies else None,
+            "slowest_stops": [{"stop_id": r[0], "seconds": round(r[1], 3), "outcome": r[2]} for r in slowest],
+            "failed_stops": sorted(r[0] for r in reqs if r[2] != "ok"),
+            "stops_with_gps": sum(1 for n in self._cycle_gps.values() if n),
+            "gps_arrivals": sum(self._cycle_gps.values()),
+        }
+
+        if self.jsonl_file:
+            self.write_jsonl()
+        if self.prom_file:
+            self.write_prom()
+
+        self._cycle_requests = []
+        self._cycle_gps = {}
+        self._cycle_circuit_skips = 0
+
+    # ---- exports ----
+    def write_jsonl(self):
+        if self.writer:
+            self.writer.offer("jsonl", (self.jsonl_file, [self.last_cycle]))
+            return
+        self.jsonl_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.jsonl_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.last_cycle) + "\n")
+
+    def prom_text(self) -> str:
+        t = f'tracker="{_escape(self.tracker)}"'
+        last = self.last_cycle
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        metric("thebus_request_duration_seconds", "histogram", "API request latency by endpoint.",
+               [line for ep, h in sorted(self.latency.items())
+                for line in h.prom_lines("thebus_request_duration_seconds", f'{t},endpoint="{ep}"')])
+        metric("thebus_requests_total", "counter", "API request attempts by endpoint and outcome.",
+               [f'thebus_requests_total{{{t},endpoint="{ep}",outcome="{o}"}} {n}'
+                for (ep, o), n in sorted(self.requests.items())])
+        metric("thebus_circuit_skips_total", "counter", "Requests skipped while a circuit breaker was open.",
+               [f"thebus_circuit_skips_total{{{t}}} {self.circuit_skips}"])
+        metric("thebus_open_circuits", "gauge", "Circuit breakers currently open.",
+               [f"thebus_open_circuits{{{t}}} {self.open_circuits}"])
+        metric("thebus_stop_errors_total", "counter", "Failed arrivalsJSON requests by stop and kind.",
+               [f'thebus_stop_errors_total{{{t},stop="{_escape(s)}",kind="{k}"}} {n}'
+                for (s, k), n in sorted(self.stop_errors.items())])
+        metric("thebus_response_bytes_total", "counter", "Response body bytes received.",
+               [f"thebus_response_bytes_total{{{t}}} {self.bytes_received}"])
+        metric("thebus_stop_polls_total", "counter", "Successful polls by stop.",
+               [f'thebus_stop_polls_total{{{t},stop="{_escape(s)}"}} {n}' for s, n in sorted(self.stop_polls.items())])
+        metric("thebus_stop_gps_arrivals_total", "counter", "GPS-backed arrivals seen by stop.",
+               [f'thebus_stop_gps_arrivals_total{{{t},stop="{_escape(s)}"}} {n}' for s, n in sorted(self.stop_gps.items())])
+        metric("thebus_cycle_duration_seconds", "histogram", "Poll cycle duration.",
+               self.cycle_seconds.prom_lines("thebus_cycle_duration_seconds", t))
+        metric("thebus_cycle_budget_seconds", "gauge", "Time one cycle is allowed to take.",
+               [f"thebus_cycle_budget_seconds{{{t}}} {self.budget_seconds}"])
+        metric("thebus_last_cycle_duration_seconds", "gauge", "Duration of the latest cycle.",
+               [f"thebus_last_cycle_duration_seconds{{{t}}} {last.get('duration_s', 0)}"])
+        metric("thebus_last_cycle_overrun_seconds", "gauge", "How far the latest cycle ran past its budget.",
+               [f"thebus_last_cycle_overrun_seconds{{{t}}} {last.get('overrun_s', 0)}"])
+        metric("thebus_cycle_overruns_total", "counter", "Cycles that ran past their budget.",
+               [f"thebus_cycle_overruns_total{{{t}}} {self.overruns}"])
+        metric("thebus_deferred_requests_total", "counter", "Requests pushed to the next tick.",
+               [f"thebus_deferred_requests_total{{{t}}} {self.deferred}"])
+        metric("thebus_skipped_ticks_total", "counter", "Ticks skipped because a cycle ran past them.",
+               [f"thebus_skipped_ticks_total{{{t}}} {self.skipped_ticks}"])
+        metric("thebus_cycles_total", "counter", "Completed poll cycles.",
+               [f"thebus_cycles_total{{{t}}} {self.cycles}"])
+        metric("thebus_last_cycle_timestamp_seconds", "gauge", "Unix time the latest cycle finished.",
+               [f"thebus_last_cycle_timestamp_seconds{{{t}}} {datetime.now().timestamp():.0f}"])
+        return "\n".join(lines) + "\n"
+
+    def write_prom(self):
+        if self.writer:
+            self.writer.offer("file", (self.prom_file, self.prom_text()))
+            return
+        # Write-then-rename so the collector never reads a half-written file
+        self.prom_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.prom_file.with_name(f".{self.prom_file.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prom_text())
+        os.replace(tmp, self.prom_file)
@@ -0,0 +1,566 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+
+import aiohttp
+
+from archive import ArchiveWriter
+from fetch import ApiClient, CircuitOpen, Endpoint
+from gtfs_cache import open_gtfs_cache
+from metrics import PollMetrics
+from records import StopPoll, wall_epoch
+from route_index import open_route_index
+from trips import TripTracker
+from snapshots import DeltaSnapshotWriter
+from service_windows import ServiceWindows
+from live_compare import StreamingComparator
+from scheduler import AdaptiveStopScheduler, DeferredRequest, TickScheduler, TokenBucket
+from vehicles import (StopIndex, VehicleTracker, load_stop_index, position_from_vehicle_json,
+                      positions_from_arrivals)
+from writer import (AtomicFileSink, BackgroundWriter, CallbackSink, JsonLinesSink, ParquetSink,
+                    SqliteSink)
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+API_KEY = "PUT_YOUR_KEY_HERE"
+
+ALL_ROUTES_STOPS_BY_VARIANT_JSON = Path(
+    r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\all_routes_stops_by_variant.json"
+)
+# invariants.py also writes all_routes_stops_by_variant.index.sqlite next to it; while that
+# is current, only the routes polled here are read from it (see route_index.py)
+
+ROUTES_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes")
+
+# Append-only Parquet archive of every GPS-backed arrival (see archive.py).
+# Set to None to disable.
+ARCHIVE_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\archive")
+
+# Keep overwriting each route's out_json with the latest cycle (what compare23.py reads)
+WRITE_SNAPSHOTS = True
+
+# Also keep every cycle's snapshot, delta-encoded, in <out_json stem>_deltas/<date>.jsonl
+# with a full keyframe every KEYFRAME_EVERY_CYCLES (see snapshots.py; read_snapshot()
+# rebuilds any cycle). Turn WRITE_SNAPSHOTS off if only the history is needed.
+WRITE_SNAPSHOT_DELTAS = True
+KEYFRAME_EVERY_CYCLES = 60
+
+ARRIVALS_URL = "http://api.thebus.org/arrivalsJSON"
+VEHICLE_URL = "http://api.thebus.org/vehicle.JSON"
+
+# Routes tracked by this process. Each one writes its own out_json every cycle,
+# in the same shape the old per-route tracker scripts wrote.
+#   route_key:   key in all_routes_stops_by_variant.json
+#   out_json:    output file (list of per-stop API objects)
+#   only_route:  optional, also require arrival["route"] == this (track_23.py behavior)
+#   extra_stops: optional, stop_ids polled on top of the route's own stops
+#   extra_stops_first: optional, list extra_stops before the route's stops (default after)
+#   stop_fields: optional, keep only these keys (and "arrivals") of each per-stop object,
+#                ex. ("stop", "timestamp") for route/parse_routes.py
+ROUTES = [
+    {
+        "route_key": "307",
+        "out_json": ROUTES_DIR / "route_307_arrivals.json",
+    },
+    {
+        "route_key": "23",
+        "out_json": ROUTES_DIR / "route_23_arrivals.json",
+        "only_route": "23",
+    },
+    {
+        "route_key": "A LINE",
+        "out_json": ROUTES_DIR / "aline_arrivals.json",
+        "extra_stops": ["983"],  # Sinclair
+    },
+]
+
+# Cycles start on wall-clock ticks every POLL_EVERY_SECONDS (see scheduler.py), with
+# requests spread over the first TICK_SPREAD_FRACTION of the tick. Requests that can't
+# start before TICK_DEADLINE_FRACTION of the tick are deferred to the next one.
+POLL_EVERY_SECONDS = 60
+TICK_SPREAD_FRACTION = 0.75
+TICK_DEADLINE_FRACTION = 0.9
+
+# Max arrivalsJSON requests in flight at once, across ALL routes. Per-request timeouts
+# adapt to observed latency, up to fetch.MAX_TIMEOUT_SECONDS (see fetch.py).
+MAX_CONCURRENT_REQUESTS = 8
+
+# Token-bucket limit on arrivalsJSON requests, across ALL routes (0 = unlimited)
+MAX_REQUESTS_PER_SECOND = 10
+REQUEST_BURST = 8
+
+# Adaptive polling (see scheduler.py): stops with GPS buses approaching, and the next
+# LOOKAHEAD_STOPS after them, are polled every cycle. Idle stops back off 1, 2, 4, ...
+# cycles, but are always refreshed at least every MAX_STOP_INTERVAL_CYCLES cycles.
+ADAPTIVE_POLLING = True
+LOOKAHEAD_STOPS = 3
+MAX_STOP_INTERVAL_CYCLES = 8
+
+# Vehicle tracking (see vehicles.py): snap the buses behind this cycle's GPS arrivals to
+# nearby stops and append arrive/depart events per (trip, stop). Positions come from the
+# bus lat/lon in the arrivals payload. Set VEHICLE_EVENTS_JSONL to None to disable.
+VEHICLE_EVENTS_JSONL = ROUTES_DIR / "vehicle_stop_events.jsonl"
+# Also ask vehicle.JSON for each of those buses every cycle (one request per vehicle, on
+# top of the arrivals requests). Off: the endpoint currently answers 404 (methodology.md).
+POLL_VEHICLE_ENDPOINT = False
+
+# Observed arrivals (see trips.py): one record per (trip, stop), inferred from when the
+# trip's prediction drops off that stop. With GTFS_DIR set, only (trip, stop) pairs in
+# the GTFS schedule are tracked and each record gets its scheduled time and delay.
+# Set OBSERVED_ARRIVALS_JSONL to None to disable.
+OBSERVED_ARRIVALS_JSONL = ROUTES_DIR / "observed_arrivals.jsonl"
+GTFS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\thebus_gtfs")
+
+# Only poll a stop inside its GTFS service windows for today (see service_windows.py):
+# its tracked routes' scheduled visits from calendar.txt/calendar_dates.txt, widened by
+# the lead/lag margins. Needs GTFS_DIR.
+SERVICE_WINDOWS = True
+SERVICE_WINDOW_LEAD_MINUTES = 20
+SERVICE_WINDOW_LAG_MINUTES = 30
+
+# Live schedule comparison (see live_compare.py): every cycle's GPS arrivals are matched
+# to today's GTFS schedule as they come in, and running per-route/per-stop delay stats are
+# rewritten to LIVE_DELAYS_JSON. LIVE_COMPARE_JSONL (None = off) also appends one row per
+# matched arrival, like compare.py's output. Needs GTFS_DIR.
+LIVE_DELAYS_JSON = ROUTES_DIR / "live_delays.json"
+LIVE_COMPARE_JSONL = None
+
+# Optional SQLite copy of observed arrivals and vehicle stop events (None = off).
+# All output is written by a background thread (see writer.py), never by the poll loop.
+SQLITE_DB = None
+
+# Per-cycle metrics (see metrics.py): a Prometheus textfile rewritten every cycle and a
+# JSON-lines log appended to every cycle. Set either to None to disable.
+METRICS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\metrics")
+METRICS_PROM_FILE = METRICS_DIR / "poller.prom"
+METRICS_JSONL = METRICS_DIR / "poller.jsonl"
+
+# ----------------------------
+# HELPERS
+# ----------------------------
+def to_list(x):
+    if isinstance(x, dict):
+        return [x]
+    if isinstance(x, list):
+        return x
+    return []
+
+def load_route_stop_ids(all_data: dict, route_key: str, extra_stops=()) -> list:
+    """Unique stop_ids across every variant/direction of a route, in first-seen order."""
+    if route_key not in all_data:
+        raise KeyError(
+            f"Route '{route_key}' not found in all_routes_stops_by_variant.json\n"
+            f"Example keys: {list(all_data.keys())[:30]}"
+        )
+
+    stop_ids = {}
+    for v in all_data[route_key].get("variants", []):
+        by_dir = v.get("by_direction", {})
+        if not isinstance(by_dir, dict):
+            continue
+        for drec in by_dir.values():
+            stops_ordered = drec.get("stops_ordered", [])
+            if not isinstance(stops_ordered, list):
+                continue
+            for s in stops_ordered:
+                if isinstance(s, dict):
+                    sid = str(s.get("stop_id", "")).strip()
+                    if sid:
+                        stop_ids[sid] = None
+
+    for sid in extra_stops:
+        sid = str(sid).strip()
+        if sid:
+            stop_ids[sid] = None
+
+    return list(stop_ids)
+
+def load_route_stop_sequences(all_data: dict, route_key: str) -> list:
+    """One ordered stop_id list per variant/direction of a route."""
+    sequences = []
+    for v in all_data.get(route_key, {}).get("variants", []):
+        by_dir = v.get("by_direction", {})
+        if not isinstance(by_dir, dict):
+            continue
+        for drec in by_dir.values():
+            stops_ordered = drec.get("stops_ordered", [])
+            if not isinstance(stops_ordered, list):
+                continue
+            seq = [str(s.get("stop_id", "")).strip() for s in stops_ordered if isinstance(s, dict)]
+            sequences.append([sid for sid in seq if sid])
+    return sequences
+
+def filter_gps_arrivals(data: dict, only_route: str = None) -> list:
+    """Arrivals with estimated == "1" (and matching route, if only_route is set)."""
+    gps_arrivals = []
+    for a in to_list(data.get("arrivals", [])):
+        if str(a.get("estimated", "")).strip() != "1":
+            continue
+        if only_route is not None and str(a.get("route", "")).strip() != only_route:
+            continue
+        gps_arrivals.append(a)
+    return gps_arrivals
+
+# ----------------------------
+# API FETCH (retries, timeouts and circuit breakers live in fetch.py)
+# ----------------------------
+def make_endpoints(arrivals_url: str = ARRIVALS_URL, vehicle_url: str = VEHICLE_URL) -> dict:
+    return {
+        "arrivalsJSON": Endpoint("arrivalsJSON", arrivals_url, "stop"),
+        "vehicle.JSON": Endpoint("vehicle.JSON", vehicle_url, "num"),
+    }
+
+async def fetch_arrivals(client: ApiClient, stop_id: str, wait_turn=None, deadline: float = None) -> dict:
+    return await client.get_json("arrivalsJSON", stop_id, wait_turn, deadline)
+
+async def fetch_vehicle(client: ApiClient, vehicle: str, wait_turn=None, deadline: float = None) -> dict:
+    # methodology.md: this endpoint has been returning 404; its breaker keeps that cheap
+    return await client.get_json("vehicle.JSON", vehicle, wait_turn, deadline)
+
+async def fetch_vehicles(client: ApiClient, vehicles: list, ticks: TickScheduler = None) -> dict:
+    """One vehicle.JSON call per vehicle, rate limited. Returns vehicle -> payload or exception."""
+    deadline = ticks.deadline if ticks else None
+    results = await asyncio.gather(
+        *(fetch_vehicle(client, v, ticks.token() if ticks else None, deadline) for v in vehicles),
+        return_exceptions=True,
+    )
+    return dict(zip(vehicles, results))
+
+async def fetch_stops(client: ApiClient, stop_ids: list, ticks: TickScheduler = None) -> dict:
+    """
+    One arrivalsJSON call per stop. Returns stop_id -> payload (or the exception raised;
+    DeferredRequest for stops that didn't fit in this tick, CircuitOpen for stops skipped
+    by a circuit breaker).
+    """
+    n = len(stop_ids)
+    deadline = ticks.deadline if ticks else None
+    results = await asyncio.gather(
+        *(fetch_arrivals(client, sid, ticks.slot(i, n) if ticks else None, deadline)
+          for i, sid in enumerate(stop_ids)),
+        return_exceptions=True,
+    )
+    return dict(zip(stop_ids, results))
+
+# ----------------------------
+# STOP -> ROUTE FAN-OUT
+# ----------------------------
+def build_stop_subscriptions(routes: list) -> dict:
+    """stop_id -> route_keys that poll it. Shared stops (ex. Sinclair 983) appear once."""
+    subs = {}
+    for route in routes:
+        for sid in route["stop_ids"]:
+            subs.setdefault(sid, []).append(route["route_key"])
+    return subs
+
+def api_stop_object(data: dict, gps_arrivals: list) -> dict:
+    """The stop's arrivalsJSON object as received (same keys, same order), with only its GPS arrivals."""
+    out = dict(data)
+    out["arrivals"] = gps_arrivals
+    return out
+
+def route_output(route: dict, polls: dict, api_stops: dict) -> list:
+    """
+    Per-stop objects for one route. api_stops: stop_id -> api_stop_object() for this cycle,
+    written back as the API sent them; polls (the matching StopPolls) pick the route's arrivals.
+    """
+    # Output is a LIST of per-stop API objects (outer structure unchanged),
+    # only includes stops that have >=1 GPS-backed arrival
+    only_route = route.get("only_route")
+    stop_fields = route.get("stop_fields")
+    output = []
+    for stop_id in route["stop_ids"]:
+        stop = api_stops.get(stop_id)
+        if stop is None:
+            continue
+
+        if only_route is not None:
+            # poll.arrivals are parsed from stop["arrivals"], in the same order
+            arrivals = [d for a, d in zip(polls[stop_id].arrivals, stop["arrivals"]) if a.route == only_route]
+            if not arrivals:
+                continue
+            stop = api_stop_object(stop, arrivals)
+        if stop_fields:
+            kept = {k: stop.get(k, "") for k in stop_fields}
+            if "stop" in kept:
+                kept["stop"] = str(stop.get("stop", stop_id))
+            kept["arrivals"] = stop["arrivals"]
+            stop = kept
+        output.append(stop)
+
+    return output
+
+# ----------------------------
+# MAIN LOOP
+# ----------------------------
+async def run(routes: list, api_key: str = API_KEY,
+              all_routes_json: Path = ALL_ROUTES_STOPS_BY_VARIANT_JSON,
+              max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+              poll_every_seconds: float = POLL_EVERY_SECONDS,
+              adaptive: bool = ADAPTIVE_POLLING,
+              archive_dir: Path = ARCHIVE_DIR,
+              write_snapshots: bool = WRITE_SNAPSHOTS,
+              write_snapshot_deltas: bool = WRITE_SNAPSHOT_DELTAS,
+              arrivals_url: str = ARRIVALS_URL,
+              vehicle_url: str = VEHICLE_URL,
+              max_cycles: int = None,
+              metrics_prom_file: Path = METRICS_PROM_FILE,
+              metrics_jsonl: Path = METRICS_JSONL,
+              max_requests_per_second: float = MAX_REQUESTS_PER_SECOND,
+              vehicle_events_jsonl: Path = VEHICLE_EVENTS_JSONL,
+              poll_vehicle_endpoint: bool = POLL_VEHICLE_ENDPOINT,
+              observed_arrivals_jsonl: Path = OBSERVED_ARRIVALS_JSONL,
+              gtfs_dir: Path = GTFS_DIR,
+              sqlite_db: Path = SQLITE_DB,
+              service_windows: bool = SERVICE_WINDOWS,
+              live_delays_json: Path = LIVE_DELAYS_JSON,
+              live_compare_jsonl: Path = LIVE_COMPARE_JSONL):
+    """Poll forever (or for max_cycles cycles, for benchmarks) and write every route's output."""
+    # The compiled index from invariants.py only reads the routes asked for; without it
+    # (or if it's stale) fall back to loading the whole JSON
+    index = open_route_index(all_routes_json)
+    all_data = None
+    if index is None:
+        with open(all_routes_json, "r", encoding="utf-8") as f:
+            all_data = json.load(f)
+
+    routes = [dict(r) for r in routes]
+    stop_sequences = []
+    for route in routes:
+        if index is not None:
+            route["stop_ids"] = list(dict.fromkeys(
+                index.route_stop_ids(route["route_key"])
+                + [s for s in (str(x).strip() for x in route.get("extra_stops", ())) if s]
+            ))
+            stop_sequences.extend(index.route_stop_sequences(route["route_key"]))
+        else:
+            route["stop_ids"] = load_route_stop_ids(all_data, route["route_key"], route.get("extra_stops", ()))
+            stop_sequences.extend(load_route_stop_sequences(all_data, route["route_key"]))
+        if route.get("extra_stops_first"):
+            extras = [s for s in (str(x).strip() for x in route.get("extra_stops", ())) if s]
+            route["stop_ids"] = list(dict.fromkeys(extras + route["stop_ids"]))
+        if write_snapshot_deltas:
+            out_json = Path(route["out_json"])
+            route["deltas"] = DeltaSnapshotWriter(
+                out_json.parent / f"{out_json.stem}_deltas", route["stop_ids"], KEYFRAME_EVERY_CYCLES,
+            )
+        print(f"Loaded route '{route['route_key']}' unique stops: {len(route['stop_ids'])}")
+
+    tracker = None
+    if vehicle_events_jsonl and index is not None:
+        # Only the tracked routes' stops and shapes
+        stops_by_shape = {}
+        for route in routes:
+            for shape, sids in index.route_shapes(route["route_key"]).items():
+                stops_by_shape.setdefault(shape, set()).update(sids)
+        coords = index.stop_coords({sid for r in routes for sid in r["stop_ids"]})
+        tracker = VehicleTracker(StopIndex(coords), stops_by_shape)
+    elif vehicle_events_jsonl:
+        tracker = VehicleTracker(*load_stop_index(all_data))
+    if index is not None:
+        index.close()
+    del all_data
+
+    # Opened once and shared by everything below
+    wants_gtfs = observed_arrivals_jsonl or service_windows or live_delays_json or live_compare_jsonl
+    gtfs = open_gtfs_cache(gtfs_dir) if gtfs_dir and wants_gtfs else None
+
+    trip_tracker = None
+    if observed_arrivals_jsonl:
+        trip_tracker = TripTracker(gtfs)
+
+    windows = None
+    if service_windows and gtfs is not None:
+        windows = ServiceWindows(gtfs_dir, gtfs, routes, SERVICE_WINDOW_LEAD_MINUTES, SERVICE_WINDOW_LAG_MINUTES)
+
+    live = None
+    if (live_delays_json or live_compare_jsonl) and gtfs is not None:
+        live = StreamingComparator(gtfs, gtfs_dir)
+
+    stop_subs = build_stop_subscriptions(routes)
+    total_subscriptions = sum(len(r["stop_ids"]) for r in routes)
+    print(f"Unique stops to poll: {len(stop_subs)} (route-stop pairs: {total_subscriptions})")
+
+    scheduler = None
+    if adaptive:
+        scheduler = AdaptiveStopScheduler(
+            list(stop_subs), stop_sequences,
+            lookahead_stops=LOOKAHEAD_STOPS,
+            max_interval_cycles=MAX_STOP_INTERVAL_CYCLES,
+        )
+
+    sinks = {
+        "file": AtomicFileSink(),
+        "jsonl": JsonLinesSink(),
+        "deltas": CallbackSink({r["route_key"]: r["deltas"].write for r in routes if "deltas" in r}),
+    }
+    if archive_dir:
+        sinks["archive"] = ParquetSink(ArchiveWriter(archive_dir))
+    if sqlite_db:
+        sinks["sqlite"] = SqliteSink(sqlite_db)
+    writer = BackgroundWriter(sinks)
+
+    metrics = None
+    if metrics_prom_file or metrics_jsonl:
+        metrics = PollMetrics(
+            "+".join(r["route_key"] for r in routes), poll_every_seconds,
+            prom_file=metrics_prom_file, jsonl_file=metrics_jsonl, writer=writer,
+        )
+
+    sem = asyncio.Semaphore(max_concurrent)
+    rate_limiter = TokenBucket(max_requests_per_second, REQUEST_BURST)
+    ticks = TickScheduler(
+        poll_every_seconds, rate_limiter,
+        spread_fraction=TICK_SPREAD_FRACTION, deadline_fraction=TICK_DEADLINE_FRACTION,
+    )
+    deferred = []
+    async with aiohttp.ClientSession() as session:
+        client = ApiClient(session, sem, api_key, make_endpoints(arrivals_url, vehicle_url), metrics, rate_limiter)
+        try:
+            cycles_done = 0
+            while max_cycles is None or cycles_done < max_cycles:
+                await ticks.wait_for_tick()
+                if ticks.skipped_ticks:
+                    print(f"[WARN] previous cycle overran: skipped {ticks.skipped_ticks} tick(s)")
+                poll_time = datetime.now()
+                cycle_start = poll_time.isoformat()
+                t0 = time.monotonic()
+
+                # Stops deferred last tick go first
+                due = scheduler.due_stops() if scheduler else list(stop_subs)
+                deferred_set = set(deferred)
+                due = deferred + [sid for sid in due if sid not in deferred_set]
+                deferred = []
+                if windows:
+                    # Out-of-service stops aren't polled; the scheduler keeps them due
+                    n_due = len(due)
+                    due = windows.active_stops(due, poll_time)
+                    off_service = n_due - len(due)
+                payloads = await fetch_stops(client, due, ticks)
+
+                # Raw payloads are dropped here; everything downstream uses compact records.
+                # Only the GPS arrival dicts are kept, for this cycle's snapshots (never on
+                # the records, which the archive buffers for minutes).
+                poll_ts = wall_epoch(poll_time)
+                polls = {}
+                api_stops = {}
+                gps_by_stop = {}      # stops that got a response or a real failure
+                circuit_open = 0
+                cycle_arrivals = []
+                for stop_id, data in payloads.items():
+                    if isinstance(data, DeferredRequest):
+                        # Not polled at all; the adaptive scheduler leaves it due
+                        deferred.append(stop_id)
+                        continue
+                    if isinstance(data, CircuitOpen):
+                        # Never requested either (logged when the breaker opened); left out
+                        # of gps_by_stop, so the adaptive scheduler keeps it due
+                        circuit_open += 1
+                        if metrics:
+                            metrics.record_circuit_skip()
+                        continue
+                    if isinstance(data, BaseException):
+                        print(f"[WARN] stop {stop_id} (routes {', '.join(stop_subs[stop_id])}) failed: "
+                              f"{type(data).__name__}: {data}")
+                        gps_by_stop[stop_id] = None
+                        continue
+
+                    gps_arrivals = filter_gps_arrivals(data)
+                    poll = StopPoll.from_api(poll_ts, stop_id, data, gps_arrivals)
+                    polls[stop_id] = poll
+                    if gps_arrivals:
+                        api_stops[stop_id] = api_stop_object(data, gps_arrivals)
+                    gps_by_stop[stop_id] = bool(poll.arrivals)
+                    if metrics:
+                        metrics.record_stop(stop_id, len(poll.arrivals))
+                    cycle_arrivals.extend(poll.arrivals)
+                del payloads
+                if archive_dir:
+                    await writer.put("archive", cycle_arrivals)
+
+                if scheduler:
+                    scheduler.end_cycle(gps_by_stop)
+
+                if trip_tracker:
+                    observed = trip_tracker.update(poll_ts, polls)
+                    if observed:
+                        await writer.put("jsonl", (observed_arrivals_jsonl, observed))
+                        if sqlite_db:
+                            await writer.put("sqlite", ("observed_arrivals", observed))
+
+                if live:
+                    rows = live.update(poll_ts, cycle_arrivals)
+                    if live_compare_jsonl and rows:
+                        await writer.put("jsonl", (live_compare_jsonl, rows))
+                    if live_delays_json:
+                        await writer.put("file", (live_delays_json, live.summary(poll_ts)))
+
+                if tracker:
+                    positions = positions_from_arrivals(polls)
+                    if poll_vehicle_endpoint and positions:
+                        for vehicle, data in (await fetch_vehicles(client, list(positions), ticks)).items():
+                            if not isinstance(data, BaseException):
+                                positions[vehicle] = position_from_vehicle_json(data, positions[vehicle])
+                    events = tracker.update(positions.values())
+                    if events:
+                        await writer.put("jsonl", (vehicle_events_jsonl, events))
+                        if sqlite_db:
+                            await writer.put("sqlite", ("vehicle_stop_events", events))
+
+                for route in routes:
+                    output = route_output(route, polls, api_stops)
+                    if write_snapshots:
+                        await writer.put("file", (route["out_json"], output))
+                    if write_snapshot_deltas:
+                        await writer.put("deltas", (route["route_key"], poll_time, output))
+                    print(
+                        f"Route '{route['route_key']}' @ {cycle_start} | "
+                        f"stops_with_estimated1={len(output)} | "
+                        f"stops_polled={sum(sid in gps_by_stop for sid in route['stop_ids'])}/{len(route['stop_ids'])}"
+                    )
+
+                duration = time.monotonic() - t0
+                if metrics:
+                    metrics.end_cycle(poll_time, duration, deferred=len(deferred),
+                                      skipped_ticks=ticks.skipped_ticks,
+                                      open_circuits=client.open_circuits())
+                print(
+                    f"Cycle done in {duration:.1f}s | routes={len(routes)} | "
+                    f"requests={len(gps_by_stop)} | deferred={len(deferred)} | circuit_open={circuit_open} | "
+                    f"off_service={off_service if windows else 0} | "
+                    f"unique_stops={len(stop_subs)} | route_stop_pairs={total_subscriptions}"
+                )
+
+                cycles_done += 1
+        finally:
+            await client.close()
+            # Drains the queue, then closes the archive/SQLite sinks
+            await asyncio.to_thread(writer.close)
+
+def single_route_options(out_json: Path) -> dict:
+    """
+    run() keyword arguments for the single-route trackers (track_*.py): metrics named after
+    out_json, and none of the shared extras (vehicle events, observed arrivals, service
+    windows, live delays), so several trackers can run side by side without GTFS_DIR or
+    overwriting each other's files. Run poller.py itself for the extras.
+    """
+    stem = Path(out_json).stem
+    return {
+        "metrics_prom_file": METRICS_DIR / f"{stem}.prom",
+        "metrics_jsonl": METRICS_DIR / f"{stem}.jsonl",
+        "vehicle_events_jsonl": None,
+        "poll_vehicle_endpoint": False,
+        "observed_arrivals_jsonl": None,
+        "gtfs_dir": None,
+        "service_windows": False,
+        "live_delays_json": None,
+        "live_compare_jsonl": None,
+    }
+
+def main(routes: list = ROUTES, **kwargs):
+    asyncio.run(run(routes, **kwargs))
+
+if __name__ == "__main__":
+    main()
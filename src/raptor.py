@@ -0,0 +1,318 @@
+import json
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from gtfs_cache import MISSING_TIME, open_gtfs_cache, seconds_to_gtfs_time
+from gtfs_reader import gtfs_time_to_seconds
+from service_windows import active_service_ids
+from vehicles import load_stop_index
+
+# ----------------------------
+# CONFIG (edit these)
+# ----------------------------
+DATA_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data")
+GTFS_DIR = DATA_DIR / "thebus_gtfs"
+GTFS_CACHE_DIR = GTFS_DIR / "compiled"
+VARIANTS_JSON = DATA_DIR / "routes" / "all_routes_stops_by_variant.json"
+
+ORIGIN_STOP = "1"
+# Only trips running on this date (calendar.txt/calendar_dates.txt); None = every trip
+SERVICE_DATE = date.today()
+DEPART_TIME = "08:00:00"
+BUDGET_MINUTES = 30
+OUT_CSV = DATA_DIR / "routes" / f"isochrone_stop_{ORIGIN_STOP}.csv"
+
+# ----------------------------
+# RAPTOR TRANSIT ROUTING
+# ----------------------------
+# methodology.md asks "where can you commute to in 30 mins with public transit". This
+# answers it with RAPTOR (Delling et al.): round k finds the earliest arrival at every
+# stop using at most k trips, by scanning route patterns instead of a graph.
+#
+# Network (build_network), built on invariants.py's variant/stop structure:
+#   - only trips whose (shape, direction) is a variant in all_routes_stops_by_variant.json
+#   - trips with the same stop sequence share a pattern; a pattern is split further
+#     until no trip overtakes another (RAPTOR's FIFO assumption)
+#   - walking transfers between stops within MAX_WALK_METERS, found with the same grid
+#     index vehicles.py uses, at WALK_SPEED_MPS in a straight line
+#
+# Every pattern position (pattern, stop) is one slot in flat arrays, and each slot's
+# departures are one sorted run in a flat key array (slot * KEY_STRIDE + departure). A
+# round is then a handful of numpy calls over every pattern at once:
+#   1) first catchable trip at each slot: one searchsorted for all slots
+#   2) trip ridden at each slot: running minimum of (1) within the pattern, shifted by one
+#   3) arrivals from (2), folded into stops with np.minimum.at, then walking transfers
+#
+# Times are GTFS seconds past midnight of the service day.
+
+MAX_WALK_METERS = 400.0
+WALK_SPEED_MPS = 1.2
+MAX_TRANSFERS = 3
+
+UNREACHED = 1 << 22          # larger than any GTFS time, smaller than KEY_STRIDE
+KEY_STRIDE = 1 << 23
+
+class TransitNetwork:
+    def __init__(self, stop_ids, stop_lat, stop_lon, slot_stop, slot_pattern, pattern_start,
+                 pattern_trips, col_start, departures, arrivals, pattern_label,
+                 transfer_from, transfer_to, transfer_seconds, stop_index):
+        self.stop_ids = stop_ids                  # code -> stop_id
+        self.stop_code = {s: i for i, s in enumerate(stop_ids)}
+        self.stop_lat = stop_lat
+        self.stop_lon = stop_lon
+        self.slot_stop = slot_stop                # slot -> stop code
+        self.slot_pattern = slot_pattern          # slot -> pattern
+        self.pattern_start = pattern_start        # pattern p owns slots [start[p], start[p + 1])
+        self.pattern_trips = pattern_trips        # pattern -> number of trips
+        self.col_start = col_start                # slot -> start of its run in departures/arrivals
+        self.departures = departures              # per slot, trips in pattern order
+        self.arrivals = arrivals
+        self.pattern_label = pattern_label        # pattern -> "route shape/direction"
+        self.transfer_from = transfer_from
+        self.transfer_to = transfer_to
+        self.transfer_seconds = transfer_seconds
+        self.stop_index = stop_index              # vehicles.StopIndex
+
+        self.slot_trips = pattern_trips[slot_pattern]
+        self.keys = (np.repeat(np.arange(len(slot_stop), dtype=np.int64), self.slot_trips) * KEY_STRIDE
+                     + departures)
+        # Segmented running minimum trick: subtract a per-pattern offset larger than any
+        # trip count, so one np.minimum.accumulate never carries across patterns
+        self.pattern_offset = slot_pattern.astype(np.int64) * (int(pattern_trips.max(initial=0)) + 1)
+        first = np.zeros(len(slot_stop), dtype=bool)
+        first[pattern_start[:-1]] = True
+        self.slot_first = first
+
+    @property
+    def n_stops(self) -> int:
+        return len(self.stop_ids)
+
+    @property
+    def n_patterns(self) -> int:
+        return len(self.pattern_trips)
+
+    # ---- queries ----
+    def origins_near(self, lat: float, lon: float, max_walk_m: float = MAX_WALK_METERS) -> dict:
+        """stop_id -> walking seconds from a point (ex. a census tract centroid)."""
+        return {sid: d / WALK_SPEED_MPS for d, sid in self.stop_index.near(lat, lon, max_walk_m)
+                if sid in self.stop_code}
+
+    def earliest_arrival(self, origins: dict, depart_seconds: int, max_transfers: int = MAX_TRANSFERS,
+                         max_seconds: int = None) -> np.ndarray:
+        """
+        origins: stop_id -> seconds to reach it (0 for the origin stop itself).
+        Earliest arrival (GTFS seconds) at every stop code, UNREACHED if none.
+        max_seconds: ignore arrivals later than depart_seconds + max_seconds (prunes the search).
+        """
+        best = np.full(self.n_stops, UNREACHED, dtype=np.int64)
+        start = np.array([self.stop_code[s] for s in origins], dtype=np.int64)
+        best[start] = depart_seconds + np.array([int(round(v)) for v in origins.values()], dtype=np.int64)
+        limit = UNREACHED if max_seconds is None else depart_seconds + max_seconds
+        self._walk(best, best.copy(), limit)
+
+        for _ in range(max_transfers + 1):
+            transit = self._scan(best)
+            transit[transit > limit] = UNREACHED
+            improved = transit < best
+            if not improved.any():
+                break
+            best = np.minimum(best, transit)
+            self._walk(best, np.where(improved, transit, UNREACHED), limit)
+        return best
+
+    def isochrone(self, origins: dict, depart_seconds: int, budget_seconds: int,
+                  max_transfers: int = MAX_TRANSFERS) -> pd.DataFrame:
+        """Stops reachable within budget_seconds: stop_id, arrival (HH:MM:SS), minutes."""
+        best = self.earliest_arrival(origins, depart_seconds, max_transfers, budget_seconds)
+        reached = np.flatnonzero(best <= depart_seconds + budget_seconds)
+        return pd.DataFrame({
+            "stop_id": np.asarray(self.stop_ids, dtype=object)[reached],
+            "stop_lat": self.stop_lat[reached],
+            "stop_lon": self.stop_lon[reached],
+            "arrival_time": [seconds_to_gtfs_time(t) for t in best[reached]],
+            "minutes": (best[reached] - depart_seconds) / 60.0,
+        }).sort_values("minutes", kind="stable").reset_index(drop=True)
+
+    # ---- one RAPTOR round ----
+    def _scan(self, best: np.ndarray) -> np.ndarray:
+        ready = best[self.slot_stop]
+        first_trip = np.searchsorted(self.keys, np.arange(len(ready), dtype=np.int64) * KEY_STRIDE + ready)
+        # == slot_trips ("no trip") when nothing departs after ready, incl. unreached stops
+        catch = first_trip - self.col_start
+
+        ridden = np.minimum.accumulate(catch - self.pattern_offset) + self.pattern_offset
+        # Ridden at slot i = boarded at some slot before i
+        on = np.empty_like(ridden)
+        on[1:] = ridden[:-1]
+        on[self.slot_first] = self.slot_trips[self.slot_first]
+
+        ok = on < self.slot_trips
+        transit = np.full(self.n_stops, UNREACHED, dtype=np.int64)
+        np.minimum.at(transit, self.slot_stop[ok], self.arrivals[self.col_start[ok] + on[ok]])
+        return transit
+
+    def _walk(self, best: np.ndarray, source: np.ndarray, limit: int):
+        """
+        Relax walking transfers out of stops with a finite time in source, into best (in
+        place). Walks chain (stop to stop to stop) until nothing improves, the same as
+        RAPTOR's transitively closed footpaths.
+        """
+        while True:
+            t = source[self.transfer_from] + self.transfer_seconds
+            ok = t < np.minimum(best[self.transfer_to], limit + 1)
+            if not ok.any():
+                return
+            before = best.copy()
+            np.minimum.at(best, self.transfer_to[ok], t[ok])
+            source = np.where(best < before, best, UNREACHED)
+
+# ----------------------------
+# BUILD
+# ----------------------------
+def _fill_missing_times(times: np.ndarray) -> np.ndarray:
+    """Interpolate blank (non-timepoint) stop times within one trip."""
+    ok = times != MISSING_TIME
+    if ok.all() or not ok.any():
+        return times
+    idx = np.arange(len(times))
+    return np.round(np.interp(idx, idx[ok], times[ok])).astype(times.dtype)
+
+def _fifo_split(trips: list) -> list:
+    """[(arr, dep)] sorted by first departure -> groups where no trip overtakes an earlier one."""
+    groups = []
+    for arr, dep in trips:
+        for g in groups:
+            last_arr, last_dep = g[-1]
+            if (dep >= last_dep).all() and (arr >= last_arr).all():
+                g.append((arr, dep))
+                break
+        else:
+            groups.append([(arr, dep)])
+    return groups
+
+def build_network(all_data: dict, gtfs, service_ids=None, max_walk_m: float = MAX_WALK_METERS) -> TransitNetwork:
+    """
+    all_data: all_routes_stops_by_variant.json. gtfs: gtfs_cache.GTFSCache.
+    service_ids: only trips with these GTFS service_ids (ex. the ones running on one date).
+    """
+    index, _ = load_stop_index(all_data)
+
+    # (shape code, direction_id) -> route label, for the variants invariants.py resolved
+    shape_code = {s: i for i, s in enumerate(gtfs.shape_ids)}
+    variants = {}
+    for route_name, route in all_data.items():
+        for v in route.get("variants", []):
+            sc = shape_code.get(str(v.get("shapeID", "")).strip())
+            for direction_id in (v.get("by_direction") or {}):
+                if sc is not None and str(direction_id).strip().lstrip("-").isdigit():
+                    variants[(sc, int(direction_id))] = f"{route_name} {v.get('shapeID')}/{direction_id}"
+
+    trip_shape = np.asarray(gtfs.trip_shape)
+    trip_direction = np.asarray(gtfs.trip_direction)
+    keep = np.array([(s, d) in variants for s, d in zip(trip_shape.tolist(), trip_direction.tolist())], dtype=bool)
+    if service_ids is not None:
+        wanted = np.isin(np.asarray(gtfs.service_ids, dtype=object), list(service_ids))
+        trip_service = np.asarray(gtfs.trip_service)
+        keep &= (trip_service >= 0) & wanted[np.maximum(trip_service, 0)]
+
+    trip_start = np.asarray(gtfs.trip_start)
+    st_stop, st_arrival, st_departure = gtfs.st_stop, gtfs.st_arrival, gtfs.st_departure
+
+    # Group trips by exact stop sequence
+    by_sequence = {}
+    for t in np.flatnonzero(keep):
+        a, b = trip_start[t], trip_start[t + 1]
+        if b - a < 2:
+            continue
+        stops = np.asarray(st_stop[a:b])
+        arr = _fill_missing_times(np.asarray(st_arrival[a:b], dtype=np.int64))
+        dep = _fill_missing_times(np.asarray(st_departure[a:b], dtype=np.int64))
+        if (arr == MISSING_TIME).all():
+            continue
+        dep = np.where(dep == MISSING_TIME, arr, dep)
+        key = stops.tobytes()
+        if key not in by_sequence:
+            by_sequence[key] = (stops, variants[(trip_shape[t], trip_direction[t])], [])
+        by_sequence[key][2].append((arr, dep))
+
+    # Network stop codes: every stop a pattern visits
+    used = np.unique(np.concatenate([s for s, _, _ in by_sequence.values()] or [np.array([], dtype=np.int32)]))
+    gtfs_to_net = np.full(gtfs.n_stops, -1, dtype=np.int64)
+    gtfs_to_net[used] = np.arange(len(used))
+    stop_ids = [gtfs.stop_ids[c] for c in used]
+
+    slot_stop, slot_pattern, pattern_trips, labels = [], [], [], []
+    dep_runs, arr_runs = [], []
+    for stops, label, trips in by_sequence.values():
+        trips.sort(key=lambda x: int(x[1][0]))
+        for group in _fifo_split(trips):
+            p = len(pattern_trips)
+            dep = np.stack([d for _, d in group])        # (trips, stops)
+            arr = np.stack([a for a, _ in group])
+            slot_stop.append(gtfs_to_net[stops])
+            slot_pattern.append(np.full(len(stops), p, dtype=np.int64))
+            pattern_trips.append(len(group))
+            labels.append(label)
+            # Slot-major: each slot's departures over the pattern's trips are one sorted run
+            dep_runs.append(dep.T.ravel())
+            arr_runs.append(arr.T.ravel())
+
+    slot_stop = np.concatenate(slot_stop) if slot_stop else np.array([], dtype=np.int64)
+    slot_pattern = np.concatenate(slot_pattern) if slot_pattern else np.array([], dtype=np.int64)
+    pattern_trips = np.array(pattern_trips, dtype=np.int64)
+    pattern_start = np.zeros(len(pattern_trips) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(slot_pattern, minlength=len(pattern_trips)), out=pattern_start[1:])
+    slot_trips = pattern_trips[slot_pattern]
+    col_start = np.zeros(len(slot_stop), dtype=np.int64)
+    np.cumsum(slot_trips[:-1], out=col_start[1:])
+    departures = np.concatenate(dep_runs) if dep_runs else np.array([], dtype=np.int64)
+    arrivals = np.concatenate(arr_runs) if arr_runs else np.array([], dtype=np.int64)
+
+    # Walking transfers between network stops, from the grid index
+    lat = np.full(len(stop_ids), np.nan)
+    lon = np.full(len(stop_ids), np.nan)
+    t_from, t_to, t_secs = [], [], []
+    code = {s: i for i, s in enumerate(stop_ids)}
+    for sid, (x, y) in zip(index.stop_ids, index.xy):
+        i = code.get(sid)
+        if i is None:
+            continue
+        lat[i], lon[i] = y / index.m_per_lat, x / index.m_per_lon
+        for d, other in index.near(lat[i], lon[i], max_walk_m):
+            j = code.get(other)
+            if j is not None and j != i:
+                t_from.append(i)
+                t_to.append(j)
+                t_secs.append(int(round(d / WALK_SPEED_MPS)))
+
+    return TransitNetwork(
+        stop_ids, lat, lon, slot_stop, slot_pattern, pattern_start, pattern_trips, col_start,
+        departures, arrivals, labels,
+        np.array(t_from, dtype=np.int64), np.array(t_to, dtype=np.int64),
+        np.array(t_secs, dtype=np.int64), index,
+    )
+
+def load_network(variants_json: Path = VARIANTS_JSON, gtfs_dir: Path = GTFS_DIR,
+                 gtfs_cache_dir: Path = GTFS_CACHE_DIR, service_date: date = SERVICE_DATE) -> TransitNetwork:
+    """Network of the trips running on service_date (every trip if None or the feed has no calendar)."""
+    with open(variants_json, "r", encoding="utf-8") as f:
+        all_data = json.load(f)
+    service_ids = active_service_ids(gtfs_dir, service_date) if service_date else None
+    return build_network(all_data, open_gtfs_cache(gtfs_dir, gtfs_cache_dir), service_ids)
+
+def run(origin_stop: str = ORIGIN_STOP, depart_time: str = DEPART_TIME, budget_minutes: float = BUDGET_MINUTES,
+        out_csv: Path = OUT_CSV, service_date: date = SERVICE_DATE, network: TransitNetwork = None) -> pd.DataFrame:
+    network = network or load_network(service_date=service_date)
+    depart = int(gtfs_time_to_seconds(pd.Series([depart_time]))[0])
+    iso = network.isochrone({origin_stop: 0}, depart, int(budget_minutes * 60))
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    iso.to_csv(out_csv, index=False)
+    print(f"{len(iso)} stops within {budget_minutes} min of stop {origin_stop} leaving {depart_time}")
+    print(f"Wrote CSV : {out_csv}")
+    return iso
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,155 @@
+import calendar
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# ----------------------------
+# COMPACT ARRIVAL RECORDS
+# ----------------------------
+# The pollers used to keep the raw r.json() dict for every stop, every cycle: ~13 fresh
+# str objects per arrival in a per-arrival dict. Arrival keeps the same fields in
+# __slots__ instead, with:
+#   - categorical fields (route, headsign, direction, shape, vehicle, ...) interned,
+#     so every record points at one shared str per distinct value
+#   - times as int seconds
+#   - estimated/canceled as int, lat/lon as float
+#
+# All int times are "wall-clock epoch" seconds: calendar.timegm() of the naive local
+# (Honolulu) datetime. They round-trip through from_wall_epoch() and naive Parquet
+# timestamps without any timezone math.
+
+def wall_epoch(dt: datetime) -> int:
+    return calendar.timegm(dt.timetuple())
+
+def from_wall_epoch(ts: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=ts)
+
+@lru_cache(maxsize=8192)
+def parse_api_stop_time(date_str: str, time_str: str) -> int:
+    """
+    API example:
+      date = "2/5/2026"
+      stopTime = "10:34 AM"
+    Only a few thousand distinct (date, stopTime) pairs exist per day, so cache them.
+    """
+    try:
+        return wall_epoch(datetime.strptime(f"{date_str} {time_str}", "%m/%d/%Y %I:%M %p"))
+    except ValueError:
+        return 0
+
+def _intern(x) -> str:
+    return sys.intern(str(x).strip()) if x is not None else ""
+
+def _int(x, default=0) -> int:
+    try:
+        return int(str(x).strip())
+    except (TypeError, ValueError):
+        return default
+
+def _float(x) -> float:
+    try:
+        return float(str(x).strip())
+    except (TypeError, ValueError):
+        return float("nan")
+
+class Arrival:
+    __slots__ = (
+        "poll_time", "stop_id", "id", "trip", "route", "headsign", "vehicle", "direction",
+        "shape", "date", "stopTime", "stop_time", "estimated", "latitude", "longitude", "canceled",
+    )
+
+    def __init__(self, poll_time, stop_id, id, trip, route, headsign, vehicle, direction,
+                 shape, date, stopTime, stop_time, estimated, latitude, longitude, canceled):
+        self.poll_time = poll_time   # int, when we polled
+        self.stop_id = stop_id
+        self.id = id
+        self.trip = trip
+        self.route = route
+        self.headsign = headsign
+        self.vehicle = vehicle
+        self.direction = direction
+        self.shape = shape
+        self.date = date             # "2/5/2026" (interned, kept so snapshots match the API)
+        self.stopTime = stopTime     # "10:34 AM" (interned)
+        self.stop_time = stop_time   # int, date + stopTime parsed
+        self.estimated = estimated   # int: 1 GPS, 0 no GPS, 2 too far out
+        self.latitude = latitude
+        self.longitude = longitude
+        self.canceled = canceled
+
+    @classmethod
+    def from_api(cls, poll_time: int, stop_id: str, a: dict) -> "Arrival":
+        date_str = _intern(a.get("date"))
+        time_str = _intern(a.get("stopTime"))
+        return cls(
+            poll_time,
+            _intern(stop_id),
+            _intern(a.get("id")),
+            _intern(a.get("trip")),
+            _intern(a.get("route")),
+            _intern(a.get("headsign")),
+            _intern(a.get("vehicle")),
+            _intern(a.get("direction")),
+            _intern(a.get("shape")),
+            date_str,
+            time_str,
+            parse_api_stop_time(date_str, time_str),
+            _int(a.get("estimated"), -1),
+            _float(a.get("latitude")),
+            _float(a.get("longitude")),
+            _int(a.get("canceled")),
+        )
+
+    def to_api(self) -> dict:
+        """Back to the arrivalsJSON arrival shape (all strings) for JSON snapshots."""
+        return {
+            "id": self.id,
+            "trip": self.trip,
+            "route": self.route,
+            "headsign": self.headsign,
+            "vehicle": self.vehicle,
+            "direction": self.direction,
+            "stopTime": self.stopTime,
+            "date": self.date,
+            "estimated": str(self.estimated),
+            "longitude": _coord_str(self.longitude),
+            "latitude": _coord_str(self.latitude),
+            "shape": self.shape,
+            "canceled": str(self.canceled),
+        }
+
+    def __repr__(self):
+        return f"Arrival(stop={self.stop_id}, trip={self.trip}, route={self.route}, stopTime={self.stopTime})"
+
+def _coord_str(x: float) -> str:
+    return "" if x != x else repr(x)
+
+class StopPoll:
+    """One stop's response from one poll, holding only its GPS-backed arrivals."""
+    __slots__ = ("stop_id", "timestamp", "poll_time", "arrivals")
+
+    def __init__(self, stop_id, timestamp, poll_time, arrivals):
+        self.stop_id = stop_id
+        self.timestamp = timestamp   # API "timestamp" string (interned)
+        self.poll_time = poll_time   # int
+        self.arrivals = arrivals     # tuple of Arrival
+
+    @classmethod
+    def from_api(cls, poll_time: int, stop_id: str, data: dict, gps_arrivals: list) -> "StopPoll":
+        # Keyed by the stop_id we asked for, so routes and the archive always agree
+        stop_id = _intern(stop_id)
+        return cls(
+            stop_id,
+            _intern(data.get("timestamp", "")),
+            poll_time,
+            tuple(Arrival.from_api(poll_time, stop_id, a) for a in gps_arrivals),
+        )
+
+    def to_api(self, arrivals=None) -> dict:
+        """Outer arrivalsJSON object, same shape the trackers always wrote."""
+        arrivals = self.arrivals if arrivals is None else arrivals
+        return {
+            "stop": self.stop_id,
+            "timestamp": self.timestamp,
+            "arrivals": [a.to_api() for a in arrivals],
+        }
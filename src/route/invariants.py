@@ -1,21 +1,48 @@
+import hashlib
 import json
+import os
+import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+# gtfs_cache.py lives one level up in src/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from gtfs_cache import open_gtfs_cache
+from route_index import index_path_for, write_route_index
+
 # ------------------------------------------------------------
 # CONFIG (change these if needed)
 # ------------------------------------------------------------
-ALL_ROUTES_JSON = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\all_routes.json")
+# THEBUS_DATA_DIR overrides the data folder (bench/run_benchmarks.py points it at a synthetic feed)
+DATA_DIR = Path(os.environ.get(
+    "THEBUS_DATA_DIR", r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data"
+))
 
-GTFS_DIR = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\thebus_gtfs")
+ALL_ROUTES_JSON = DATA_DIR / "routes" / "all_routes.json"
+
+GTFS_DIR = DATA_DIR / "thebus_gtfs"
 TRIPS_TXT = GTFS_DIR / "trips.txt"
 STOP_TIMES_TXT = GTFS_DIR / "stop_times.txt"
 STOPS_TXT = GTFS_DIR / "stops.txt"
 ROUTES_TXT = GTFS_DIR / "routes.txt"
 
-OUT_JSON = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\all_routes_stops_by_variant.json")
-OUT_CSV  = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\all_routes_stops_by_variant.csv")
-OUT_MISSING_JSON = Path(r"C:\Users\1saku\Desktop\Mega Code\UHERO\Transportation\TheBus\data\routes\missing_variants.json")
+# Compiled stop_times cache (see gtfs_cache.py); rebuilt automatically when the feed changes
+GTFS_CACHE_DIR = GTFS_DIR / "compiled"
+
+OUT_JSON = DATA_DIR / "routes" / "all_routes_stops_by_variant.json"
+OUT_CSV  = DATA_DIR / "routes" / "all_routes_stops_by_variant.csv"
+OUT_MISSING_JSON = DATA_DIR / "routes" / "missing_variants.json"
+
+# Compact route -> stops / stop -> routes index the pollers load lazily (see route_index.py)
+OUT_INDEX_SQLITE = index_path_for(OUT_JSON)
+
+# Incremental mode: only rebuild routes whose fingerprint (API variants + the GTFS trips and
+# stops they resolve to) changed since the last run, and patch the three outputs in place.
+# Falls back to a full rebuild when any previous output or the fingerprint file is missing.
+INCREMENTAL = True
+OUT_FINGERPRINTS_JSON = OUT_JSON.with_name("all_routes_stops_by_variant.fingerprints.json")
 
 # How to label direction_id. GTFS does NOT guarantee 0=outbound, 1=inbound universally,
 # but this is a common convention. Keep both direction_id and this label.
@@ -29,11 +56,9 @@ with open(ALL_ROUTES_JSON, "r", encoding="utf-8") as f:
 
 routes = pd.read_csv(ROUTES_TXT, dtype=str).fillna("")
 trips = pd.read_csv(TRIPS_TXT, dtype=str).fillna("")
-stop_times = pd.read_csv(STOP_TIMES_TXT, dtype=str).fillna("")
+gtfs = open_gtfs_cache(GTFS_DIR, GTFS_CACHE_DIR)
 stops = pd.read_csv(STOPS_TXT, dtype=str).fillna("")
 
-stop_times["stop_sequence"] = stop_times["stop_sequence"].astype(int)
-
 # Quick lookup: GTFS route_id by route_short_name (just in case you want it)
 route_short_to_ids = (
     routes.groupby(routes["route_short_name"].str.strip())["route_id"]
@@ -42,27 +67,117 @@ route_short_to_ids = (
 )
 
 # ------------------------------------------------------------
-# HELPERS
+# REPRESENTATIVE TRIPS (picked for every shape/direction at once)
 # ------------------------------------------------------------
-def pick_representative_trip_id(df: pd.DataFrame) -> str:
-    """Pick a stable trip_id for a (shape_id, direction_id) group."""
-    return df.sort_values("trip_id").iloc[0]["trip_id"]
+# A variant's representative trip is the lowest trip_id among its trips in each
+# direction_id. Variants whose API routeID appears in GTFS for that shape only use
+# trips with that route_id, so keep both groupings and choose per variant below.
+trips["shape_key"] = trips["shape_id"].astype(str).str.strip()
+has_direction_id = "direction_id" in trips.columns
+
+shape_keys = set(trips["shape_key"])
+shape_route_pairs = set(zip(trips["shape_key"], trips["route_id"]))
+
+def direction_groups(group_cols: list) -> dict:
+    """group key -> [(direction_id, representative trip_id, num trips), ...] sorted by direction_id."""
+    if not has_direction_id:
+        return {}
+    g = (
+        trips.groupby(group_cols + ["direction_id"], sort=True, dropna=False)["trip_id"]
+        .agg(["min", "size"])
+        .reset_index()
+    )
+    out = {}
+    keys = zip(*(g[c] for c in group_cols)) if len(group_cols) > 1 else g[group_cols[0]]
+    for key, direction_id, rep_trip_id, n in zip(keys, g["direction_id"], g["min"], g["size"]):
+        out.setdefault(key, []).append((str(direction_id).strip(), rep_trip_id, int(n)))
+    return out
+
+dirs_by_shape = direction_groups(["shape_key"])
+dirs_by_shape_route = direction_groups(["shape_key", "route_id"])
 
-def get_ordered_stops_for_trip(trip_id: str) -> pd.DataFrame:
-    """Return ordered stops for a trip_id, with stop metadata joined."""
-    st = stop_times[stop_times["trip_id"] == trip_id].copy()
-    st = st.sort_values("stop_sequence")
-    merged = st.merge(stops, on="stop_id", how="left", suffixes=("", "_stop"))
-    return merged
+# ------------------------------------------------------------
+# ORDERED STOPS FOR EVERY REPRESENTATIVE TRIP (read from the cache, one merge)
+# ------------------------------------------------------------
+rep_trip_ids = {rep for groups in (dirs_by_shape, dirs_by_shape_route)
+                for dirs in groups.values() for _, rep, _ in dirs}
+
+rep_stop_times = gtfs.stop_times_for_trips(rep_trip_ids)[["trip_id", "stop_id", "stop_sequence"]]
+merged = rep_stop_times.merge(stops, on="stop_id", how="left", suffixes=("", "_stop"))
+merged = merged.reset_index(drop=True)
+
+has_stop_code = "stop_code" in merged.columns
+stop_cols = ["stop_sequence", "stop_id", "stop_name", "stop_lat", "stop_lon"]
+if has_stop_code:
+    stop_cols.append("stop_code")
+for c in stop_cols:
+    if c not in merged.columns:
+        merged[c] = ""
+
+# JSON stop entries for every row, plus each trip's [start, end) slice into them
+stop_entries = merged[stop_cols].to_dict("records")
+trip_slices = {
+    trip_id: (int(pos[0]), int(pos[-1]) + 1)
+    for trip_id, pos in merged.groupby("trip_id", sort=False).indices.items()
+}
+
+# ------------------------------------------------------------
+# PER-ROUTE FINGERPRINTS (for incremental mode)
+# ------------------------------------------------------------
+FINGERPRINT_VERSION = 1
+
+def resolve_variant(route_id_from_api: str, v: dict):
+    """(shape_id, dir_groups, reason). dir_groups is None when the variant can't be built."""
+    shape_id = str(v.get("shapeID", "")).strip()
+    if not shape_id:
+        return shape_id, None, "variant missing shapeID"
+    if shape_id not in shape_keys:
+        return shape_id, None, "no trips found with this shape_id"
+    if not has_direction_id:
+        return shape_id, None, "direction_id not present in trips.txt"
+
+    # If API routeID exists in GTFS trips route_id for this shape, enforce it; otherwise skip enforcement
+    if route_id_from_api and (shape_id, route_id_from_api) in shape_route_pairs:
+        return shape_id, dirs_by_shape_route[(shape_id, route_id_from_api)], None
+    return shape_id, dirs_by_shape[shape_id], None
+
+# Hash of every representative trip's ordered stop rows (stop_times + stops.txt columns)
+row_hashes = pd.util.hash_pandas_object(merged[stop_cols].astype(str), index=False).to_numpy()
+trip_hashes = {
+    trip_id: hashlib.sha256(row_hashes[start:end].tobytes()).hexdigest()
+    for trip_id, (start, end) in trip_slices.items()
+}
+
+def route_fingerprint(route_obj: dict) -> str:
+    route_id_from_api = str(route_obj.get("routeID", "")).strip()
+    parts = [FINGERPRINT_VERSION, DIRECTION_LABEL, route_obj]
+    for v in route_obj.get("route", []):
+        _, dir_groups, _ = resolve_variant(route_id_from_api, v)
+        parts.append([(d, rep, n, trip_hashes.get(rep)) for d, rep, n in dir_groups or []])
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+fingerprints = {name: route_fingerprint(obj) for name, obj in all_routes.items()}
+
+previous_fingerprints = {}
+if INCREMENTAL and all(p.exists() for p in (OUT_JSON, OUT_CSV, OUT_MISSING_JSON, OUT_FINGERPRINTS_JSON)):
+    with open(OUT_FINGERPRINTS_JSON, "r", encoding="utf-8") as f:
+        previous_fingerprints = json.load(f)
+
+routes_to_build = [name for name in all_routes if previous_fingerprints.get(name) != fingerprints[name]]
+print(f"Routes to rebuild: {len(routes_to_build)} / {len(all_routes)}")
 
 # ------------------------------------------------------------
 # BUILD OUTPUTS
 # ------------------------------------------------------------
 out_json = {}
-csv_rows = []
 missing = []
 
-for route_short_name, route_obj in all_routes.items():
+# One row per (variant, direction) that has stops; expanded to CSV rows at the end
+csv_assignments = []
+csv_slices = []
+
+for route_short_name in routes_to_build:
+    route_obj = all_routes[route_short_name]
     # route_short_name is the key in your all_routes.json ("1", "2", "A", etc.)
     # route_obj contains routeName, routeID, and route (variants list)
     route_id_from_api = str(route_obj.get("routeID", "")).strip()
@@ -75,60 +190,20 @@ for route_short_name, route_obj in all_routes.items():
     }
 
     for v in variants:
-        shape_id = str(v.get("shapeID", "")).strip()
         headsign = v.get("headsign", "")
         first_stop = v.get("firstStop", "")
         route_num = v.get("routeNum", route_short_name)
 
-        if not shape_id:
-            missing.append({
-                "route_short_name": route_short_name,
-                "routeID": route_id_from_api,
-                "reason": "variant missing shapeID",
-                "variant": v
-            })
-            continue
-
-        # Filter trips by shape_id (and route_id if it matches; if not, fall back to shape only)
-        t_shape = trips[trips["shape_id"].astype(str).str.strip() == shape_id].copy()
-
-        if t_shape.empty:
-            missing.append({
-                "route_short_name": route_short_name,
-                "routeID": route_id_from_api,
-                "shape_id": shape_id,
-                "reason": "no trips found with this shape_id",
-                "variant": v
-            })
+        shape_id, dir_groups, reason = resolve_variant(route_id_from_api, v)
+        if dir_groups is None:
+            item = {"route_short_name": route_short_name, "routeID": route_id_from_api}
+            if shape_id:
+                item["shape_id"] = shape_id
+            item["reason"] = reason
+            item["variant"] = v
+            missing.append(item)
             continue
 
-        # If API routeID exists in GTFS trips route_id, enforce it; otherwise skip enforcement
-        if route_id_from_api and (t_shape["route_id"] == route_id_from_api).any():
-            t_shape = t_shape[t_shape["route_id"] == route_id_from_api].copy()
-
-        if t_shape.empty:
-            missing.append({
-                "route_short_name": route_short_name,
-                "routeID": route_id_from_api,
-                "shape_id": shape_id,
-                "reason": "shape_id found but none match route_id from API",
-                "variant": v
-            })
-            continue
-
-        # Split by direction_id (0/1)
-        if "direction_id" not in t_shape.columns:
-            missing.append({
-                "route_short_name": route_short_name,
-                "routeID": route_id_from_api,
-                "shape_id": shape_id,
-                "reason": "direction_id not present in trips.txt",
-                "variant": v
-            })
-            continue
-
-        dir_groups = t_shape.groupby("direction_id", dropna=False)
-
         variant_record = {
             "routeNum": route_num,
             "shapeID": shape_id,
@@ -137,12 +212,8 @@ for route_short_name, route_obj in all_routes.items():
             "by_direction": {}
         }
 
-        for direction_id, gdir in dir_groups:
-            direction_id = str(direction_id).strip()
-            rep_trip_id = pick_representative_trip_id(gdir)
-
-            merged = get_ordered_stops_for_trip(rep_trip_id)
-            if merged.empty:
+        for direction_id, rep_trip_id, num_trips in dir_groups:
+            if rep_trip_id not in trip_slices:
                 missing.append({
                     "route_short_name": route_short_name,
                     "routeID": route_id_from_api,
@@ -154,47 +225,76 @@ for route_short_name, route_obj in all_routes.items():
                 })
                 continue
 
-            # Build ordered stops list for JSON
-            stop_list = []
-            for _, row in merged.iterrows():
-                stop_entry = {
-                    "stop_sequence": int(row["stop_sequence"]),
-                    "stop_id": row.get("stop_id", ""),
-                    "stop_name": row.get("stop_name", ""),
-                    "stop_lat": row.get("stop_lat", ""),
-                    "stop_lon": row.get("stop_lon", "")
-                }
-                if "stop_code" in merged.columns:
-                    stop_entry["stop_code"] = row.get("stop_code", "")
-                stop_list.append(stop_entry)
-
-                # Add CSV row
-                csv_rows.append({
-                    "route_short_name": route_short_name,
-                    "route_id": route_id_from_api,
-                    "routeNum": route_num,
-                    "shape_id": shape_id,
-                    "headsign": headsign,
-                    "firstStop": first_stop,
-                    "direction_id": direction_id,
-                    "direction_label": DIRECTION_LABEL.get(direction_id, f"direction_{direction_id}"),
-                    "representative_trip_id": rep_trip_id,
-                    "stop_sequence": int(row["stop_sequence"]),
-                    "stop_id": row.get("stop_id", ""),
-                    "stop_name": row.get("stop_name", ""),
-                    "stop_lat": row.get("stop_lat", ""),
-                    "stop_lon": row.get("stop_lon", "")
-                })
+            start, end = trip_slices[rep_trip_id]
+            direction_label = DIRECTION_LABEL.get(direction_id, f"direction_{direction_id}")
 
             variant_record["by_direction"][direction_id] = {
-                "direction_label": DIRECTION_LABEL.get(direction_id, f"direction_{direction_id}"),
+                "direction_label": direction_label,
                 "representative_trip_id": rep_trip_id,
-                "num_trips_in_this_direction": int(len(gdir)),
-                "stops_ordered": stop_list
+                "num_trips_in_this_direction": num_trips,
+                "stops_ordered": stop_entries[start:end]
             }
 
+            csv_assignments.append({
+                "route_short_name": route_short_name,
+                "route_id": route_id_from_api,
+                "routeNum": route_num,
+                "shape_id": shape_id,
+                "headsign": headsign,
+                "firstStop": first_stop,
+                "direction_id": direction_id,
+                "direction_label": direction_label,
+                "representative_trip_id": rep_trip_id,
+            })
+            csv_slices.append((start, end))
+
         out_json[route_short_name]["variants"].append(variant_record)
 
+# CSV: each (variant, direction) row repeated once per stop, next to its stop columns
+if csv_assignments:
+    counts = np.array([end - start for start, end in csv_slices])
+    positions = np.concatenate([np.arange(start, end) for start, end in csv_slices])
+
+    df_csv = pd.DataFrame(csv_assignments).loc[np.repeat(np.arange(len(csv_assignments)), counts)]
+    df_csv = df_csv.reset_index(drop=True)
+    stop_part = merged.loc[positions, ["stop_sequence", "stop_id", "stop_name", "stop_lat", "stop_lon"]]
+    df_csv = pd.concat([df_csv, stop_part.reset_index(drop=True)], axis=1)
+else:
+    df_csv = pd.DataFrame([])
+
+# ------------------------------------------------------------
+# PATCH PREVIOUS OUTPUTS (incremental mode)
+# ------------------------------------------------------------
+# Unchanged routes keep their previous JSON entry, CSV rows and missing items; everything
+# is re-assembled in all_routes.json order so the files match a full rebuild. Routes
+# removed from all_routes.json drop out.
+if previous_fingerprints:
+    with open(OUT_JSON, "r", encoding="utf-8") as f:
+        prev_json = json.load(f)
+    with open(OUT_MISSING_JSON, "r", encoding="utf-8") as f:
+        prev_missing = json.load(f)
+    prev_csv = pd.read_csv(OUT_CSV, dtype=str, keep_default_na=False)
+
+    rebuilt = set(routes_to_build)
+    out_json = {
+        name: out_json[name] if name in rebuilt else prev_json[name]
+        for name in all_routes
+    }
+
+    missing_by_route = {}
+    for item in prev_missing:
+        if item["route_short_name"] not in rebuilt:
+            missing_by_route.setdefault(item["route_short_name"], []).append(item)
+    for item in missing:
+        missing_by_route.setdefault(item["route_short_name"], []).append(item)
+    missing = [item for name in all_routes for item in missing_by_route.get(name, [])]
+
+    csv_parts = dict(tuple(prev_csv.groupby("route_short_name", sort=False))) if not prev_csv.empty else {}
+    if not df_csv.empty:
+        csv_parts.update(dict(tuple(df_csv.groupby("route_short_name", sort=False))))
+    pieces = [csv_parts[name] for name in all_routes if name in csv_parts]
+    df_csv = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame([])
+
 # ------------------------------------------------------------
 # WRITE FILES
 # ------------------------------------------------------------
@@ -203,15 +303,22 @@ OUT_JSON.parent.mkdir(parents=True, exist_ok=True)
 with open(OUT_JSON, "w", encoding="utf-8") as f:
     json.dump(out_json, f, indent=2)
 
-df_csv = pd.DataFrame(csv_rows)
 df_csv.to_csv(OUT_CSV, index=False)
 
 with open(OUT_MISSING_JSON, "w", encoding="utf-8") as f:
     json.dump(missing, f, indent=2)
 
+# After OUT_JSON, so the index is never older than the JSON it came from
+write_route_index(out_json, OUT_INDEX_SQLITE)
+
+# Written last: if anything above failed, the next run rebuilds everything
+with open(OUT_FINGERPRINTS_JSON, "w", encoding="utf-8") as f:
+    json.dump(fingerprints, f, indent=2)
+
 print("Saved JSON:", OUT_JSON)
 print("Saved CSV :", OUT_CSV)
 print("Saved missing report:", OUT_MISSING_JSON)
+print("Saved route index:", OUT_INDEX_SQLITE)
 print("Routes processed:", len(out_json))
 print("CSV rows:", len(df_csv))
 print("Missing items:", len(missing))
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+# ----------------------------
+# COMPILED ROUTE INDEX
+# ----------------------------
+# all_routes_stops_by_variant.json is tens of MB of nested variants, and every poller used
+# to json.load() all of it to read a handful of routes. invariants.py also writes this
+# SQLite file next to it (<json stem>.index.sqlite) with just what the pollers need:
+#
+#   routes       route_key -> stop_ids (deduplicated, first-seen order), stop_sequences
+#                (one list per variant/direction) and shapes ({shape_id: stop_ids}),
+#                each a compact JSON text column decoded only when that route is asked for
+#   stops        stop_id -> stop_lat, stop_lon
+#   stop_routes  stop_id -> route_key, both ways indexed (stop fan-out)
+#
+# RouteIndex opens it read-only; a query costs one primary-key lookup, so a poller's
+# startup no longer grows with the size of the whole network.
+
+INDEX_VERSION = 1
+
+def index_path_for(variants_json: Path) -> Path:
+    variants_json = Path(variants_json)
+    return variants_json.with_name(variants_json.stem + ".index.sqlite")
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+# ----------------------------
+# WRITE (from invariants.py)
+# ----------------------------
+def route_rows(all_data: dict):
+    """(route_key, stop_ids, sequences, shapes, {stop_id: (lat, lon)}) per route."""
+    for route_key, route in all_data.items():
+        stop_ids, sequences, shapes, coords = {}, [], {}, {}
+        for v in route.get("variants", []):
+            by_dir = v.get("by_direction", {})
+            if not isinstance(by_dir, dict):
+                continue
+            shape_stops = shapes.setdefault(str(v.get("shapeID", "")).strip(), {})
+            for drec in by_dir.values():
+                stops_ordered = drec.get("stops_ordered", [])
+                if not isinstance(stops_ordered, list):
+                    continue
+                seq = []
+                for s in stops_ordered:
+                    if not isinstance(s, dict):
+                        continue
+                    sid = str(s.get("stop_id", "")).strip()
+                    if not sid:
+                        continue
+                    seq.append(sid)
+                    stop_ids[sid] = None
+                    shape_stops[sid] = None
+                    try:
+                        coords[sid] = (float(s.get("stop_lat")), float(s.get("stop_lon")))
+                    except (TypeError, ValueError):
+                        pass
+                sequences.append(seq)
+        shapes = {k: list(v) for k, v in shapes.items() if k and v}
+        yield route_key, list(stop_ids), sequences, shapes, coords
+
+def write_route_index(all_data: dict, path: Path):
+    """Write the index for all_routes_stops_by_variant.json data (temp file, then os.replace)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE routes (route_key TEXT PRIMARY KEY, stop_ids TEXT, stop_sequences TEXT, shapes TEXT);
+            CREATE TABLE stops (stop_id TEXT PRIMARY KEY, stop_lat REAL, stop_lon REAL);
+            CREATE TABLE stop_routes (stop_id TEXT, route_key TEXT, PRIMARY KEY (stop_id, route_key)) WITHOUT ROWID;
+            CREATE INDEX stop_routes_by_route ON stop_routes (route_key);
+        """)
+        route_table, stop_routes, coords = [], [], {}
+        for route_key, stop_ids, sequences, shapes, route_coords in route_rows(all_data):
+            route_table.append((route_key, _dumps(stop_ids), _dumps(sequences), _dumps(shapes)))
+            stop_routes.extend((sid, route_key) for sid in stop_ids)
+            for sid, c in route_coords.items():
+                coords.setdefault(sid, c)
+        conn.executemany("INSERT INTO routes VALUES (?, ?, ?, ?)", route_table)
+        conn.executemany("INSERT OR IGNORE INTO stop_routes VALUES (?, ?)", stop_routes)
+        conn.executemany("INSERT INTO stops VALUES (?, ?, ?)", [(s, lat, lon) for s, (lat, lon) in coords.items()])
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+# ----------------------------
+# READ (pollers)
+# ----------------------------
+class RouteIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(f"file:{self.path.as_posix()}?mode=ro", uri=True)
+        version = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != INDEX_VERSION:
+            raise ValueError(f"{self.path}: route index version {version} != {INDEX_VERSION}, rerun invariants.py")
+
+    def _route(self, route_key: str, column: str):
+        row = self.conn.execute(f"SELECT {column} FROM routes WHERE route_key = ?", (route_key,)).fetchone()
+        if row is None:
+            raise KeyError(f"Route '{route_key}' not found in {self.path.name}\nExample keys: {self.route_keys()[:30]}")
+        return json.loads(row[0])
+
+    def route_keys(self) -> list:
+        return [r[0] for r in self.conn.execute("SELECT route_key FROM routes ORDER BY rowid")]
+
+    def route_stop_ids(self, route_key: str) -> list:
+        return self._route(route_key, "stop_ids")
+
+    def route_stop_sequences(self, route_key: str) -> list:
+        return self._route(route_key, "stop_sequences")
+
+    def route_shapes(self, route_key: str) -> dict:
+        """shape_id -> stop_ids on that shape."""
+        return self._route(route_key, "shapes")
+
+    def routes_for_stop(self, stop_id: str) -> list:
+        return [r[0] for r in self.conn.execute(
+            "SELECT route_key FROM stop_routes WHERE stop_id = ? ORDER BY route_key", (stop_id,))]
+
+    def stop_coords(self, stop_ids) -> dict:
+        """stop_id -> (lat, lon) for the ones that have coordinates."""
+        out = {}
+        stop_ids = list(stop_ids)
+        for i in range(0, len(stop_ids), 500):
+            chunk = stop_ids[i:i + 500]
+            out.update((sid, (lat, lon)) for sid, lat, lon in self.conn.execute(
+                f"SELECT stop_id, stop_lat, stop_lon FROM stops WHERE stop_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+        return out
+
+    def close(self):
+        self.conn.close()
+
+def open_route_index(variants_json: Path, index_path: Path = None):
+    """
+    RouteIndex for all_routes_stops_by_variant.json, or None if there's no index or it is
+    older than the JSON (invariants.py writes the JSON first, then the index).
+    """
+    index_path = Path(index_path) if index_path else index_path_for(variants_json)
+    if not index_path.exists():
+        return None
+    if Path(variants_json).exists() and Path(variants_json).stat().st_mtime > index_path.stat().st_mtime:
+        print(f"[WARN] {index_path.name} is older than {Path(variants_json).name}; loading the JSON instead")
+        return None
+    return RouteIndex(index_path)
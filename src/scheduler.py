@@ -0,0 +1,168 @@
+import asyncio
+import math
+import time
+
+# ----------------------------
+# ADAPTIVE STOP POLLING
+# ----------------------------
+# A stop with GPS-backed (estimated == "1") arrivals is "hot" and is polled every cycle,
+# along with the next few stops after it in stops_ordered (the bus will get there next).
+# A stop with nothing to report backs off exponentially: every 1, 2, 4, 8, ... cycles,
+# capped at max_interval_cycles so every stop still gets a guaranteed refresh.
+
+class AdaptiveStopScheduler:
+    def __init__(self, stop_ids, stop_sequences, lookahead_stops: int = 3,
+                 max_interval_cycles: int = 8):
+        """
+        stop_ids:       every stop that can be polled
+        stop_sequences: ordered stop_id lists (one per variant/direction) used to find
+                        the stops right after a hot stop
+        """
+        self.max_interval_cycles = max(1, int(max_interval_cycles))
+        self.cycle = 0
+
+        self.interval = {sid: 1 for sid in stop_ids}
+        self.next_cycle = {sid: 0 for sid in stop_ids}
+
+        # stop_id -> stops within lookahead_stops after it, on any sequence
+        self.downstream = {}
+        for seq in stop_sequences:
+            for i, sid in enumerate(seq):
+                nxt = self.downstream.setdefault(sid, {})
+                for later in seq[i + 1:i + 1 + lookahead_stops]:
+                    if later != sid:
+                        nxt[later] = None
+
+    def due_stops(self) -> list:
+        """Stops to poll this cycle, hot (shortest interval) first."""
+        due = [sid for sid, due in self.next_cycle.items() if due <= self.cycle]
+        return sorted(due, key=self.interval.__getitem__)
+
+    def _make_hot(self, stop_id: str):
+        if stop_id in self.interval:
+            self.interval[stop_id] = 1
+            self.next_cycle[stop_id] = self.cycle + 1
+
+    def end_cycle(self, gps_by_stop: dict):
+        """
+        Update schedules from this cycle's responses and advance to the next cycle.
+        gps_by_stop: stop_id -> True (had GPS arrivals), False (nothing), None (request failed)
+        """
+        for sid, has_gps in gps_by_stop.items():
+            if sid not in self.interval:
+                continue
+            if has_gps is None:
+                # Failed requests are retried next cycle without touching the backoff
+                self.next_cycle[sid] = self.cycle + 1
+            elif not has_gps:
+                self.interval[sid] = min(self.interval[sid] * 2, self.max_interval_cycles)
+                self.next_cycle[sid] = self.cycle + self.interval[sid]
+
+        # Applied last so an idle stop polled this cycle can't undo a hot neighbor
+        for sid, has_gps in gps_by_stop.items():
+            if has_gps:
+                self._make_hot(sid)
+                for later in self.downstream.get(sid, ()):
+                    self._make_hot(later)
+
+        self.cycle += 1
+
+# ----------------------------
+# WALL-CLOCK TICKS + RATE LIMIT
+# ----------------------------
+# Cycles start on fixed wall-clock ticks (every period_seconds since the epoch, so a 60 s
+# period lands on :00 each minute) instead of "sleep after the sweep", which drifted by
+# the sweep time every cycle. Within a tick, request i of n is released at
+#
+#   tick_start + i * (spread_fraction * period) / n
+#
+# and must also take a token from a TokenBucket shared by every route in the process.
+# A request that can't start before tick_start + deadline_fraction * period is deferred
+# to the next tick instead of pushing the cycle past its slot.
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        """rate_per_second <= 0 disables the limit."""
+        self.rate = float(rate_per_second)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float = None) -> bool:
+        """
+        Wait for a token. Returns False, without taking one, if it wouldn't be available
+        before deadline (time.monotonic() value).
+        """
+        if self.rate <= 0:
+            return True
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            wait = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+class DeferredRequest(Exception):
+    """Raised for a request that didn't fit in its tick; it's retried first next tick."""
+
+class TickScheduler:
+    def __init__(self, period_seconds: float, rate_limiter: TokenBucket = None,
+                 spread_fraction: float = 0.75, deadline_fraction: float = 0.9):
+        """period_seconds <= 0 runs cycles back to back with no spreading or deadline."""
+        self.period = float(period_seconds)
+        self.rate_limiter = rate_limiter
+        self.spread = self.period * spread_fraction
+        self.deadline_offset = self.period * deadline_fraction
+        self.tick_start = None      # time.monotonic() at the start of the current tick
+        self.tick_wall = None       # time.time() of the current tick
+        self.skipped_ticks = 0      # ticks skipped because a cycle ran past them (last wait)
+
+    @property
+    def deadline(self):
+        if self.period <= 0 or self.tick_start is None:
+            return None
+        return self.tick_start + self.deadline_offset
+
+    async def wait_for_tick(self) -> float:
+        """
+        Sleep until the next wall-clock tick and start it. The first call starts right
+        away. Returns the tick's wall-clock time.
+        """
+        now_wall = time.time()
+        self.skipped_ticks = 0
+        if self.period <= 0 or self.tick_wall is None:
+            tick_wall = now_wall
+        else:
+            tick_wall = math.floor(now_wall / self.period) * self.period + self.period
+            # Ticks that passed while the previous cycle was still running are dropped.
+            # (The first tick is off the grid, so there's nothing to count after it.)
+            if self.tick_wall % self.period == 0:
+                self.skipped_ticks = max(0, round((tick_wall - self.tick_wall) / self.period) - 1)
+            await asyncio.sleep(max(0.0, tick_wall - time.time()))
+
+        self.tick_wall = tick_wall
+        self.tick_start = time.monotonic()
+        return tick_wall
+
+    async def slot(self, index: int, count: int):
+        """Wait for request index (of count) in this tick. Raises DeferredRequest if it won't fit."""
+        deadline = self.deadline
+        if self.period > 0 and count > 0:
+            release = self.tick_start + index * self.spread / count
+            if release > deadline:
+                raise DeferredRequest("past tick deadline")
+            await asyncio.sleep(max(0.0, release - time.monotonic()))
+        await self.token()
+
+    async def token(self):
+        """Rate limit only (no spreading). Raises DeferredRequest if none comes before the deadline."""
+        if self.rate_limiter and not await self.rate_limiter.acquire(self.deadline):
+            raise DeferredRequest("rate limit")
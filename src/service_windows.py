@@ -0,0 +1,185 @@
+from pathlib import Path
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from gtfs_cache import MISSING_TIME
+from records import wall_epoch
+
+# ----------------------------
+# SERVICE-CALENDAR POLLING WINDOWS
+# ----------------------------
+# Overnight (and all day, for peak-only routes like 307) every arrivalsJSON answer is
+# empty or estimated == "2". ServiceWindows works out from GTFS when each polled stop
+# can actually see a bus:
+#
+#   service_ids running on a date   calendar.txt (weekday columns + date range),
+#                                   then calendar_dates.txt adds (1) / removes (2)
+#   stop window                     every scheduled visit of a tracked route's trip at
+#                                   that stop, widened to [time - lead, time + lag] and
+#                                   merged into intervals
+#   route window                    first to last stop_time of each of its trips, same
+#                                   margins; used for stops with no visit of their own
+#                                   (ex. extra_stops)
+#
+# Yesterday's and tomorrow's service days are included too, so trips past 24:00:00 and
+# trips just after midnight are covered. Windows are rebuilt when the date changes.
+# Stops of routes the feed doesn't know are never held back.
+
+DEFAULT_LEAD_MINUTES = 20
+DEFAULT_LAG_MINUTES = 30
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+def active_service_ids(gtfs_dir: Path, day: date):
+    """Set of service_ids running on day, or None if the feed has no calendar files (all run)."""
+    gtfs_dir = Path(gtfs_dir)
+    calendar, calendar_dates = gtfs_dir / "calendar.txt", gtfs_dir / "calendar_dates.txt"
+    if not calendar.exists() and not calendar_dates.exists():
+        return None
+
+    ymd = day.strftime("%Y%m%d")
+    active = set()
+    if calendar.exists():
+        cal = pd.read_csv(calendar, dtype=str).fillna("")
+        on = (cal[WEEKDAYS[day.weekday()]].str.strip() == "1") \
+            & (cal["start_date"].str.strip() <= ymd) & (cal["end_date"].str.strip() >= ymd)
+        active.update(cal.loc[on, "service_id"].str.strip())
+    if calendar_dates.exists():
+        cd = pd.read_csv(calendar_dates, dtype=str).fillna("")
+        cd = cd[cd["date"].str.strip() == ymd]
+        kind = cd["exception_type"].str.strip()
+        active.update(cd.loc[kind == "1", "service_id"].str.strip())
+        active.difference_update(cd.loc[kind == "2", "service_id"].str.strip())
+    return active
+
+def gtfs_route_ids(routes: pd.DataFrame, route_key: str) -> list:
+    """GTFS route_ids (routes.txt rows) for a poller route_key: route_short_name, or a route_id itself."""
+    key = str(route_key).strip()
+    ids = routes.loc[routes.get("route_short_name", pd.Series(dtype=str)).str.strip() == key, "route_id"]
+    if ids.empty:
+        ids = routes.loc[routes["route_id"].str.strip() == key, "route_id"]
+    return sorted(set(ids.str.strip()))
+
+def merge_intervals(groups: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> dict:
+    """group -> sorted, non-overlapping [(start, end), ...] (vectorized over every group at once)."""
+    if len(groups) == 0:
+        return {}
+    df = pd.DataFrame({"g": groups, "s": starts, "e": ends}).sort_values(["g", "s"], kind="stable")
+    # A new interval starts where the group changes or the start is past every earlier end
+    reach = df.groupby("g", sort=False)["e"].cummax().shift()
+    new = (df["g"] != df["g"].shift()) | (df["s"] > reach)
+    run = new.cumsum()
+    merged = df.groupby(run, sort=False).agg(g=("g", "first"), s=("s", "min"), e=("e", "max"))
+    out = {}
+    for g, s, e in zip(merged["g"], merged["s"], merged["e"]):
+        out.setdefault(g, []).append((int(s), int(e)))
+    return out
+
+class ServiceWindows:
+    def __init__(self, gtfs_dir: Path, gtfs, routes: list, lead_minutes: float = DEFAULT_LEAD_MINUTES,
+                 lag_minutes: float = DEFAULT_LAG_MINUTES):
+        """
+        gtfs: gtfs_cache.GTFSCache for gtfs_dir.
+        routes: poller routes (route_key, stop_ids).
+        """
+        self.gtfs_dir = Path(gtfs_dir)
+        self.gtfs = gtfs
+        self.lead = int(lead_minutes * 60)
+        self.lag = int(lag_minutes * 60)
+        self.day = None
+        self.stop_windows = {}     # stop_id -> [(start, end)] wall epoch
+        self.route_windows = {}    # route_key -> [(start, end)] wall epoch
+
+        route_code = {r: i for i, r in enumerate(gtfs.route_ids)}
+        routes_txt = pd.read_csv(self.gtfs_dir / "routes.txt", dtype=str).fillna("")
+        self.route_codes = {}      # route_key -> GTFS route codes
+        for route in routes:
+            codes = [route_code[r] for r in gtfs_route_ids(routes_txt, route["route_key"]) if r in route_code]
+            if codes:
+                self.route_codes[route["route_key"]] = codes
+            else:
+                print(f"[WARN] route '{route['route_key']}' not in {self.gtfs_dir.name}/routes.txt; "
+                      f"its stops are polled around the clock")
+        self.stop_routes = {}      # stop_id -> route_keys with a schedule
+        self.ungated = set()       # stops of routes the feed doesn't know
+        for route in routes:
+            for sid in route["stop_ids"]:
+                if route["route_key"] in self.route_codes:
+                    self.stop_routes.setdefault(sid, []).append(route["route_key"])
+                else:
+                    self.ungated.add(sid)
+
+    def _build(self, today: date):
+        g = self.gtfs
+        keys = list(self.route_codes)
+        key_of_code = np.full(len(g.route_ids), -1, dtype=np.int64)
+        for k, key in enumerate(keys):
+            key_of_code[self.route_codes[key]] = k
+        # (stop code, route_key index) pairs that are actually polled
+        stop_code = {s: i for i, s in enumerate(g.stop_ids)}
+        index_of = {key: k for k, key in enumerate(keys)}
+        polled = np.array(sorted(
+            stop_code[sid] * len(keys) + index_of[key]
+            for sid, rkeys in self.stop_routes.items() if sid in stop_code for key in rkeys
+        ), dtype=np.int64)
+
+        trip_route = np.asarray(g.trip_route)
+        trip_key = np.where(trip_route >= 0, key_of_code[np.maximum(trip_route, 0)], -1)
+        st_trip = np.asarray(g.st_trip)
+        st_stop = np.asarray(g.st_stop)
+        st_time = np.where(np.asarray(g.st_arrival) != MISSING_TIME, g.st_arrival, g.st_departure).astype(np.int64)
+
+        stop_g, stop_s, stop_e, route_g, route_s, route_e = [], [], [], [], [], []
+        for day in (today - timedelta(days=1), today, today + timedelta(days=1)):
+            svc = active_service_ids(self.gtfs_dir, day)
+            running = trip_key >= 0
+            if svc is not None:
+                svc_ok = np.isin(np.asarray(g.service_ids, dtype=object), list(svc))
+                trip_service = np.asarray(g.trip_service)
+                running &= (trip_service >= 0) & svc_ok[np.maximum(trip_service, 0)]
+            rows = running[st_trip] & (st_time != MISSING_TIME)
+            if not rows.any():
+                continue
+            base = wall_epoch(datetime.combine(day, datetime.min.time()))
+            t = base + st_time[rows]
+            trips, stops = st_trip[rows], st_stop[rows]
+
+            # Route windows: each trip's first..last stop_time
+            span = pd.DataFrame({"trip": trips, "t": t}).groupby("trip")["t"].agg(["min", "max"])
+            route_g.append(trip_key[span.index.to_numpy()])
+            route_s.append(span["min"].to_numpy() - self.lead)
+            route_e.append(span["max"].to_numpy() + self.lag)
+
+            # Stop windows: visits by a route that polls the stop
+            at = np.isin(stops.astype(np.int64) * len(keys) + trip_key[trips], polled)
+            stop_g.append(stops[at])
+            stop_s.append(t[at] - self.lead)
+            stop_e.append(t[at] + self.lag)
+
+        def cat(parts):
+            return np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+
+        by_key = merge_intervals(cat(route_g), cat(route_s), cat(route_e))
+        self.route_windows = {keys[k]: w for k, w in by_key.items()}
+        by_code = merge_intervals(cat(stop_g), cat(stop_s), cat(stop_e))
+        self.stop_windows = {g.stop_ids[c]: w for c, w in by_code.items()}
+        self.day = today
+
+    def is_active(self, stop_id: str, now: int) -> bool:
+        """now: wall epoch. True if stop_id should be polled at now."""
+        if stop_id in self.ungated:
+            return True
+        windows = self.stop_windows.get(stop_id)
+        if windows is None:
+            # No scheduled visit of its own: fall back to its routes' windows
+            windows = [w for key in self.stop_routes.get(stop_id, ()) for w in self.route_windows.get(key, ())]
+        return any(s <= now <= e for s, e in windows)
+
+    def active_stops(self, stop_ids: list, now: datetime) -> list:
+        """The stop_ids (in order) inside a service window at now."""
+        if self.day != now.date():
+            self._build(now.date())
+        ts = wall_epoch(now)
+        return [sid for sid in stop_ids if self.is_active(sid, ts)]
@@ -0,0 +1,176 @@
+import json
+from pathlib import Path
+from datetime import date, datetime
+
+from archive import service_date_for
+
+# ----------------------------
+# DELTA-ENCODED SNAPSHOTS
+# ----------------------------
+# Consecutive snapshots of a route (the list of per-stop arrivalsJSON objects the poller
+# writes to out_json) are nearly identical. DeltaSnapshotWriter keeps the previous one
+# in memory and appends one JSON line per cycle to <dir>/<service_date>.jsonl:
+#
+#   {"time": ..., "type": "key", "stop_ids": [...], "stops": [<full snapshot>]}
+#   {"time": ..., "type": "delta", "stops": {stop: {"timestamp", "set", "del", "order"}},
+#    "gone": [stops no longer in the snapshot]}
+#
+# Arrivals are keyed by (stop, trip) ("trip#2", ... for a trip listed twice at a stop).
+# "set" holds added or changed arrivals, "del" removed keys, and "order" the stop's
+# key order only when applying set/del wouldn't reproduce it. A keyframe is written
+# every keyframe_every cycles and first thing in each day's file, so read_snapshot only
+# replays from the last keyframe before the time asked for.
+
+KEYFRAME_EVERY_CYCLES = 60
+
+def _keyed(arrivals: list) -> dict:
+    """key -> arrival, in list order."""
+    out = {}
+    for a in arrivals:
+        trip = str(a.get("trip", ""))
+        key, n = trip, 1
+        while key in out:
+            n += 1
+            key = f"{trip}#{n}"
+        out[key] = a
+    return out
+
+def _snapshot_state(output: list) -> dict:
+    """stop -> (timestamp, {key: arrival})"""
+    return {s["stop"]: (s.get("timestamp", ""), _keyed(s.get("arrivals", []))) for s in output}
+
+def _stop_delta(old: tuple, new: tuple) -> dict:
+    old_ts, old_arr = old
+    new_ts, new_arr = new
+    d = {}
+    if new_ts != old_ts:
+        d["timestamp"] = new_ts
+    changed = {k: a for k, a in new_arr.items() if old_arr.get(k) != a}
+    if changed:
+        d["set"] = changed
+    removed = [k for k in old_arr if k not in new_arr]
+    if removed:
+        d["del"] = removed
+    # Order applying set/del gives: surviving keys in old order, then new keys
+    natural = [k for k in old_arr if k in new_arr] + [k for k in new_arr if k not in old_arr]
+    if natural != list(new_arr):
+        d["order"] = list(new_arr)
+    return d
+
+class DeltaSnapshotWriter:
+    def __init__(self, out_dir: Path, stop_ids: list, keyframe_every: int = KEYFRAME_EVERY_CYCLES):
+        """stop_ids: the route's stop order (snapshots list stops in this order)."""
+        self.out_dir = Path(out_dir)
+        self.stop_ids = list(stop_ids)
+        self.keyframe_every = max(1, int(keyframe_every))
+        self.prev = None
+        self.since_key = 0
+        self.day = None
+
+    def write(self, poll_time: datetime, output: list):
+        state = _snapshot_state(output)
+        day = service_date_for(poll_time)
+
+        if self.prev is None or day != self.day or self.since_key >= self.keyframe_every:
+            line = {"time": poll_time.isoformat(), "type": "key", "stop_ids": self.stop_ids, "stops": output}
+            self.since_key = 0
+        else:
+            stops = {}
+            for stop, new in state.items():
+                d = _stop_delta(self.prev.get(stop, ("", {})), new)
+                if d:
+                    stops[stop] = d
+            line = {"time": poll_time.isoformat(), "type": "delta", "stops": stops,
+                    "gone": [s for s in self.prev if s not in state]}
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / f"{day.isoformat()}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+        self.prev = state
+        self.day = day
+        self.since_key += 1
+
+# ----------------------------
+# READER
+# ----------------------------
+def _apply(state: dict, line: dict):
+    if line["type"] == "key":
+        state.clear()
+        state.update(_snapshot_state(line["stops"]))
+        return
+    for stop in line.get("gone", []):
+        state.pop(stop, None)
+    for stop, d in line["stops"].items():
+        ts, arr = state.get(stop, ("", {}))
+        arr = dict(arr)
+        for k in d.get("del", []):
+            arr.pop(k, None)
+        arr.update(d.get("set", {}))
+        if "order" in d:
+            arr = {k: arr[k] for k in d["order"]}
+        state[stop] = (d.get("timestamp", ts), arr)
+
+def _to_output(state: dict, stop_ids: list) -> list:
+    rank = {sid: i for i, sid in enumerate(stop_ids)}
+    stops = sorted(state, key=lambda s: rank.get(s, len(rank)))
+    return [{"stop": s, "timestamp": state[s][0], "arrivals": list(state[s][1].values())} for s in stops]
+
+def iter_snapshots(out_dir: Path, start: datetime = None, end: datetime = None):
+    """Yield (poll_time, snapshot) for every cycle recorded between start and end."""
+    files = sorted(Path(out_dir).glob("*.jsonl"))
+    if start is not None:
+        first_day = service_date_for(start).isoformat()
+        files = [p for p in files if p.stem >= first_day]
+    if end is not None:
+        last_day = service_date_for(end).isoformat()
+        files = [p for p in files if p.stem <= last_day]
+
+    state, stop_ids = {}, []
+    for path in files:
+        lines = _lines_from_last_keyframe(path, start)
+        for raw in lines:
+            line = json.loads(raw)
+            t = datetime.fromisoformat(line["time"])
+            if end is not None and t > end:
+                return
+            if line["type"] == "key":
+                stop_ids = line["stop_ids"]
+            _apply(state, line)
+            if start is None or t >= start:
+                yield t, _to_output(state, stop_ids)
+
+def _lines_from_last_keyframe(path: Path, before: datetime = None) -> list:
+    """Raw lines from the last keyframe at or before `before` (or the start) to the end."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    if before is None:
+        return lines
+    # Only the prefix is parsed here: {"time":"...","type":"key"...
+    cutoff = before.isoformat()
+    start = 0
+    for i, raw in enumerate(lines):
+        t = raw[9:raw.index('"', 9)]
+        if t > cutoff:
+            break
+        if raw.startswith('"type":"key"', raw.index('"', 9) + 2):
+            start = i
+    return lines[start:]
+
+def read_snapshot(out_dir: Path, at: datetime) -> list:
+    """The snapshot as written by the last cycle at or before `at` (empty list if none that day)."""
+    path = Path(out_dir) / f"{service_date_for(at).isoformat()}.jsonl"
+    if not path.exists():
+        return []
+    state, stop_ids = {}, []
+    for raw in _lines_from_last_keyframe(path, at):
+        line = json.loads(raw)
+        if datetime.fromisoformat(line["time"]) > at:
+            break
+        if line["type"] == "key":
+            stop_ids = line["stop_ids"]
+        _apply(state, line)
+    return _to_output(state, stop_ids)
+
+def snapshot_days(out_dir: Path) -> list:
+    return [date.fromisoformat(p.stem) for p in sorted(Path(out_dir).glob("*.jsonl"))]
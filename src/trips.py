@@ -0,0 +1,170 @@
+import numpy as np
+
+from gtfs_reader import MISSING_TIME
+from records import from_wall_epoch
+
+# ----------------------------
+# PREDICTIONS -> OBSERVED ARRIVALS
+# ----------------------------
+# Every cycle the same trip shows up at every stop it still has to reach, each with a
+# fresh stopTime prediction. Once the bus passes a stop, the trip drops off that stop's
+# arrivals list. TripTracker follows each trip's predictions per stop and, the first
+# cycle a polled stop no longer lists the trip, infers the arrival there:
+#
+#   arrival = last prediction, clamped to [last poll that listed it, this poll]
+#
+# and emits one ObservedArrival for that (trip, stop). Only stops actually polled this
+# cycle count as "dropped off" (adaptive polling skips idle stops). A prediction that
+# vanishes while still more than ARRIVAL_SLACK_SECONDS away is taken as the GPS going
+# away, not an arrival, and is dropped. Trips not seen for TRIP_IDLE_SECONDS are evicted,
+# and at most MAX_TRIPS are kept, so memory stays bounded.
+
+ARRIVAL_SLACK_SECONDS = 300
+TRIP_IDLE_SECONDS = 20 * 60
+MAX_TRIPS = 5000
+
+def service_day_delay(arrival_time: int, scheduled_seconds: int) -> int:
+    """
+    arrival_time (wall epoch) minus the scheduled time, in seconds. GTFS times count from
+    the trip's service day and can pass 24:00:00, so the service day is taken as the one
+    that puts the schedule nearest the arrival (ex. 24:10:00 seen at 00:12 is +2 min, not
+    -1438), not the arrival's calendar date. Works elementwise on int numpy arrays too.
+    """
+    delay = arrival_time % 86400 - scheduled_seconds
+    # Wrapped into [-12 h, +12 h)
+    return (delay + 43200) % 86400 - 43200
+
+class ObservedArrival:
+    __slots__ = (
+        "trip", "stop_id", "vehicle", "route", "headsign", "direction", "shape",
+        "arrival_time", "first_prediction", "last_prediction", "predictions", "last_seen",
+        "scheduled_seconds",
+    )
+
+    def __init__(self, trip, stop_id, vehicle, route, headsign, direction, shape, arrival_time,
+                 first_prediction, last_prediction, predictions, last_seen, scheduled_seconds):
+        self.trip = trip
+        self.stop_id = stop_id
+        self.vehicle = vehicle
+        self.route = route
+        self.headsign = headsign
+        self.direction = direction
+        self.shape = shape
+        self.arrival_time = arrival_time            # int wall epoch, inferred
+        self.first_prediction = first_prediction    # int wall epoch
+        self.last_prediction = last_prediction      # int wall epoch
+        self.predictions = predictions              # polls that listed this (trip, stop)
+        self.last_seen = last_seen                  # int wall epoch of the last such poll
+        self.scheduled_seconds = scheduled_seconds  # GTFS seconds past midnight, MISSING_TIME if unmatched
+
+    def to_dict(self) -> dict:
+        """
+        Row for observed_arrivals.jsonl. date/stopTime are in the arrivalsJSON format so
+        compare.py can read the file like a snapshot.
+        """
+        dt = from_wall_epoch(self.arrival_time)
+        out = {
+            "trip": self.trip,
+            "stop_id": self.stop_id,
+            "vehicle": self.vehicle,
+            "route": self.route,
+            "headsign": self.headsign,
+            "direction": self.direction,
+            "shape": self.shape,
+            "date": f"{dt.month}/{dt.day}/{dt.year}",
+            "stopTime": f"{(dt.hour % 12) or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}",
+            "arrival_time": dt.isoformat(),
+            "first_prediction": from_wall_epoch(self.first_prediction).isoformat(),
+            "last_prediction": from_wall_epoch(self.last_prediction).isoformat(),
+            "predictions": self.predictions,
+            "last_seen": from_wall_epoch(self.last_seen).isoformat(),
+        }
+        if self.scheduled_seconds != MISSING_TIME:
+            out["scheduled_seconds"] = int(self.scheduled_seconds)
+            out["delay_minutes"] = round(service_day_delay(self.arrival_time, int(self.scheduled_seconds)) / 60.0, 2)
+        return out
+
+class TripState:
+    __slots__ = ("vehicle", "route", "headsign", "direction", "shape", "last_seen", "pending", "done")
+
+    def __init__(self, a):
+        self.vehicle = a.vehicle
+        self.route = a.route
+        self.headsign = a.headsign
+        self.direction = a.direction
+        self.shape = a.shape
+        self.last_seen = a.poll_time
+        # stop_id -> [first_prediction, last_prediction, predictions, last_seen, scheduled_seconds]
+        self.pending = {}
+        self.done = set()
+
+class TripTracker:
+    def __init__(self, gtfs=None, arrival_slack_seconds: int = ARRIVAL_SLACK_SECONDS,
+                 idle_seconds: int = TRIP_IDLE_SECONDS, max_trips: int = MAX_TRIPS):
+        """gtfs: optional gtfs_cache.GTFSCache; if given, only (trip, stop) pairs in the schedule are tracked."""
+        self.gtfs = gtfs
+        self.slack = arrival_slack_seconds
+        self.idle = idle_seconds
+        self.max_trips = max_trips
+        self.trips = {}
+
+    def _scheduled(self, arrivals: list) -> np.ndarray:
+        if self.gtfs is None or not arrivals:
+            return np.full(len(arrivals), MISSING_TIME, dtype=np.int64)
+        return self.gtfs.lookup_arrival(
+            np.array([a.trip for a in arrivals], dtype=object),
+            np.array([a.stop_id for a in arrivals], dtype=object),
+        ).astype(np.int64)
+
+    def update(self, poll_time: int, polls: dict) -> list:
+        """
+        Consume one cycle. polls: stop_id -> records.StopPoll for every stop that answered
+        this cycle (GPS arrivals only). Returns ObservedArrivals inferred this cycle.
+        """
+        arrivals = [a for poll in polls.values() for a in poll.arrivals if a.trip and a.stop_time]
+        sched = self._scheduled(arrivals)
+
+        seen = set()
+        for a, s in zip(arrivals, sched):
+            if self.gtfs is not None and s == MISSING_TIME:
+                continue
+            ts = self.trips.get(a.trip)
+            if ts is None:
+                ts = self.trips[a.trip] = TripState(a)
+            ts.last_seen = a.poll_time
+            ts.vehicle = a.vehicle or ts.vehicle
+            if a.stop_id in ts.done:
+                continue
+            seen.add((a.trip, a.stop_id))
+            p = ts.pending.get(a.stop_id)
+            if p is None:
+                ts.pending[a.stop_id] = [a.stop_time, a.stop_time, 1, a.poll_time, int(s)]
+            else:
+                p[1] = a.stop_time
+                p[2] += 1
+                p[3] = a.poll_time
+
+        out = []
+        for trip, ts in self.trips.items():
+            for stop_id in [sid for sid in ts.pending if sid in polls and (trip, sid) not in seen]:
+                first, last, n, last_seen, sched_s = ts.pending.pop(stop_id)
+                ts.done.add(stop_id)
+                if last > poll_time + self.slack:
+                    continue  # lost GPS, not an arrival
+                arrival = min(max(last, last_seen), poll_time)
+                out.append(ObservedArrival(
+                    trip, stop_id, ts.vehicle, ts.route, ts.headsign, ts.direction, ts.shape,
+                    arrival, first, last, n, last_seen, sched_s,
+                ))
+
+        self._evict(poll_time)
+        return out
+
+    def _evict(self, poll_time: int):
+        cutoff = poll_time - self.idle
+        for trip in [t for t, ts in self.trips.items() if ts.last_seen < cutoff]:
+            del self.trips[trip]
+        if len(self.trips) > self.max_trips:
+            oldest = sorted(self.trips, key=lambda t: self.trips[t].last_seen)
+            for trip in oldest[:len(self.trips) - self.max_trips]:
+                del self.trips[trip]
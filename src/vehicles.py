@@ -0,0 +1,204 @@
+import math
+from datetime import datetime
+
+from records import from_wall_epoch, wall_epoch
+
+# ----------------------------
+# VEHICLE POSITIONS -> STOP EVENTS
+# ----------------------------
+# methodology.md asks whether an actual arrival can be detected by a bus coming within a
+# small distance of a stop. Each cycle the poller hands VehicleTracker one position per
+# vehicle behind the current GPS arrivals (from vehicle.JSON when it answers, otherwise
+# the bus lat/lon already in the arrivalsJSON payload). Each position is snapped to the
+# nearest stop on that vehicle's shape within ARRIVAL_RADIUS_METERS using a grid index,
+# and entering/leaving that radius becomes an "arrive"/"depart" event per (trip, stop).
+#
+# Positions are only as frequent as the poll, so a bus that passes a stop between two
+# polls without ever being seen inside the radius produces no event for it.
+
+ARRIVAL_RADIUS_METERS = 30.0
+GRID_CELL_METERS = 100.0
+
+# Forget vehicles with no new position for this long
+STALE_VEHICLE_SECONDS = 15 * 60
+
+# ----------------------------
+# SPATIAL STOP INDEX
+# ----------------------------
+class StopIndex:
+    """Uniform grid over stop coordinates (local equirectangular meters)."""
+    def __init__(self, stops: dict, cell_meters: float = GRID_CELL_METERS):
+        """stops: stop_id -> (lat, lon)"""
+        self.cell = cell_meters
+        lat0 = sum(lat for lat, _ in stops.values()) / max(1, len(stops))
+        self.m_per_lat = 110_574.0
+        self.m_per_lon = 111_320.0 * math.cos(math.radians(lat0))
+
+        self.stop_ids = list(stops)
+        self.xy = [self._project(lat, lon) for lat, lon in stops.values()]
+        self.grid = {}
+        for i, (x, y) in enumerate(self.xy):
+            self.grid.setdefault((int(x // self.cell), int(y // self.cell)), []).append(i)
+
+    def _project(self, lat: float, lon: float) -> tuple:
+        return lon * self.m_per_lon, lat * self.m_per_lat
+
+    def near(self, lat: float, lon: float, radius_m: float, allowed=None) -> list:
+        """(distance_m, stop_id) within radius_m, closest first. allowed: optional stop_id set."""
+        x, y = self._project(lat, lon)
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        reach = int(math.ceil(radius_m / self.cell))
+        r2 = radius_m * radius_m
+
+        out = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for i in self.grid.get((gx, gy), ()):
+                    sx, sy = self.xy[i]
+                    d2 = (sx - x) ** 2 + (sy - y) ** 2
+                    if d2 <= r2 and (allowed is None or self.stop_ids[i] in allowed):
+                        out.append((math.sqrt(d2), self.stop_ids[i]))
+        out.sort()
+        return out
+
+    def nearest(self, lat: float, lon: float, radius_m: float, allowed=None):
+        """(distance_m, stop_id) of the closest stop within radius_m, or None."""
+        hits = self.near(lat, lon, radius_m, allowed)
+        return hits[0] if hits else None
+
+def load_stop_index(all_data: dict, cell_meters: float = GRID_CELL_METERS) -> tuple:
+    """
+    From all_routes_stops_by_variant.json: (StopIndex over every stop with coordinates,
+    shape_id -> set of stop_ids on that shape).
+    """
+    stops, stops_by_shape = {}, {}
+    for route in all_data.values():
+        for v in route.get("variants", []):
+            shape_stops = stops_by_shape.setdefault(str(v.get("shapeID", "")).strip(), set())
+            by_dir = v.get("by_direction", {})
+            if not isinstance(by_dir, dict):
+                continue
+            for drec in by_dir.values():
+                for s in drec.get("stops_ordered", []):
+                    if not isinstance(s, dict):
+                        continue
+                    sid = str(s.get("stop_id", "")).strip()
+                    try:
+                        lat, lon = float(s.get("stop_lat")), float(s.get("stop_lon"))
+                    except (TypeError, ValueError):
+                        continue
+                    if sid and lat == lat and lon == lon:
+                        stops[sid] = (lat, lon)
+                        shape_stops.add(sid)
+    stops_by_shape.pop("", None)
+    return StopIndex(stops, cell_meters), stops_by_shape
+
+# ----------------------------
+# POSITIONS
+# ----------------------------
+def parse_vehicle_time(s: str) -> int:
+    """vehicle.JSON last_message, ex. "2/5/2026 10:30:00 AM" -> wall epoch (0 if bad)."""
+    try:
+        return wall_epoch(datetime.strptime(str(s).strip(), "%m/%d/%Y %I:%M:%S %p"))
+    except ValueError:
+        return 0
+
+def positions_from_arrivals(polls: dict) -> dict:
+    """vehicle -> position dict from this cycle's StopPolls (the bus lat/lon on each arrival)."""
+    out = {}
+    for poll in polls.values():
+        for a in poll.arrivals:
+            if not a.vehicle or a.latitude != a.latitude or a.longitude != a.longitude:
+                continue
+            out[a.vehicle] = {
+                "vehicle": a.vehicle, "trip": a.trip, "route": a.route, "shape": a.shape,
+                "lat": a.latitude, "lon": a.longitude, "time": a.poll_time,
+            }
+    return out
+
+def position_from_vehicle_json(data: dict, fallback: dict) -> dict:
+    """Overlay a vehicle.JSON response on the arrivals-derived position (keeps shape/route)."""
+    v = data.get("vehicle") if isinstance(data, dict) else None
+    if isinstance(v, list):
+        v = v[0] if v else None
+    if not isinstance(v, dict):
+        return fallback
+    try:
+        lat, lon = float(v.get("latitude")), float(v.get("longitude"))
+    except (TypeError, ValueError):
+        return fallback
+    pos = dict(fallback, lat=lat, lon=lon)
+    trip = str(v.get("trip", "")).strip()
+    if trip:
+        pos["trip"] = trip
+    t = parse_vehicle_time(v.get("last_message", ""))
+    if t:
+        pos["time"] = t
+    return pos
+
+# ----------------------------
+# ARRIVE / DEPART EVENTS
+# ----------------------------
+class StopEvent:
+    __slots__ = ("kind", "time", "trip", "stop_id", "vehicle", "route", "distance_m")
+
+    def __init__(self, kind, time, trip, stop_id, vehicle, route, distance_m):
+        self.kind = kind             # "arrive" or "depart"
+        self.time = time             # int wall epoch
+        self.trip = trip
+        self.stop_id = stop_id
+        self.vehicle = vehicle
+        self.route = route
+        self.distance_m = distance_m
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "time": from_wall_epoch(self.time).isoformat(),
+            "trip": self.trip,
+            "stop_id": self.stop_id,
+            "vehicle": self.vehicle,
+            "route": self.route,
+            "distance_m": round(self.distance_m, 1),
+        }
+
+class VehicleTracker:
+    def __init__(self, index: StopIndex, stops_by_shape: dict = None,
+                 radius_m: float = ARRIVAL_RADIUS_METERS, stale_seconds: int = STALE_VEHICLE_SECONDS):
+        self.index = index
+        self.stops_by_shape = stops_by_shape or {}
+        self.radius_m = radius_m
+        self.stale_seconds = stale_seconds
+        # vehicle -> [trip, route, stop_id or None, distance_m, last_seen_at_stop, last_time]
+        self.state = {}
+
+    def update(self, positions) -> list:
+        """Consume one cycle's positions (dicts from positions_from_arrivals). Returns StopEvents."""
+        events = []
+        latest = 0
+        for p in positions:
+            vehicle, trip, t = p["vehicle"], p["trip"], p["time"]
+            latest = max(latest, t)
+            hit = self.index.nearest(p["lat"], p["lon"], self.radius_m, self.stops_by_shape.get(p.get("shape")))
+            stop_id = hit[1] if hit else None
+
+            st = self.state.get(vehicle)
+            if st is not None and t <= st[5]:
+                continue  # same fix as last cycle
+
+            if st is not None and st[2] is not None and (st[2] != stop_id or st[0] != trip):
+                # Left the stop sometime after the last fix inside the radius
+                events.append(StopEvent("depart", st[4], st[0], st[2], vehicle, st[1], st[3]))
+            if stop_id is not None and (st is None or st[2] != stop_id or st[0] != trip):
+                events.append(StopEvent("arrive", t, trip, stop_id, vehicle, p["route"], hit[0]))
+
+            if stop_id is not None:
+                self.state[vehicle] = [trip, p["route"], stop_id, hit[0], t, t]
+            else:
+                self.state[vehicle] = [trip, p["route"], None, 0.0, 0, t]
+
+        # Bounded: vehicles that stopped reporting are dropped
+        cutoff = latest - self.stale_seconds
+        for vehicle in [v for v, st in self.state.items() if st[5] < cutoff]:
+            del self.state[vehicle]
+        return events
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ----------------------------
+# BACKGROUND WRITER
+# ----------------------------
+# The poll loop never touches the disk itself: it publishes (sink, payload) messages to a
+# bounded queue and one background thread hands them to the sinks in batches. When the
+# queue is full, the loop waits off-thread for room (backpressure) rather than growing
+# memory without limit or dropping data.
+#
+# Sinks (payload each one takes):
+#   AtomicFileSink   (path, obj)          latest wins per path within a batch; JSON (indent=2)
+#                                         or str, written to a temp file then os.replace'd
+#   JsonLinesSink    (path, records)      appended, one line per record (dict or .to_dict())
+#   SqliteSink       (table, records)     inserted, table/columns created on first sight
+#   ParquetSink      arrivals             archive.ArchiveWriter (it has its own batching)
+#   CallbackSink     (key, *args)         any callable, ex. snapshots.DeltaSnapshotWriter
+
+WRITER_QUEUE_SIZE = 256
+BATCH_MAX_MESSAGES = 64
+BATCH_WAIT_SECONDS = 0.5
+
+def _as_dict(record) -> dict:
+    return record if isinstance(record, dict) else record.to_dict()
+
+def _q(name: str) -> str:
+    """Quoted SQLite identifier."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+class AtomicFileSink:
+    def write_batch(self, payloads: list):
+        latest = {}
+        for path, obj in payloads:
+            latest[Path(path)] = obj
+        for path, obj in latest.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                if isinstance(obj, str):
+                    f.write(obj)
+                else:
+                    json.dump(obj, f, indent=2)
+            os.replace(tmp, path)
+
+    def close(self):
+        pass
+
+class JsonLinesSink:
+    def write_batch(self, payloads: list):
+        by_path = {}
+        for path, records in payloads:
+            by_path.setdefault(Path(path), []).extend(records)
+        for path, records in by_path.items():
+            if not records:
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(_as_dict(r)) + "\n" for r in records))
+
+    def close(self):
+        pass
+
+class SqliteSink:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.conn = None
+        self.columns = {}   # table -> list of columns
+
+    def _table(self, table: str, row: dict) -> list:
+        cols = self.columns.get(table)
+        if cols is None:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(table)} ({', '.join(_q(c) for c in row)})")
+            cols = [r[1] for r in self.conn.execute(f"PRAGMA table_info({_q(table)})")]
+            self.columns[table] = cols
+        for c in row:
+            if c not in cols:
+                self.conn.execute(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(c)}")
+                cols.append(c)
+        return cols
+
+    def write_batch(self, payloads: list):
+        if self.conn is None:
+            # Opened by the writer thread; close() runs on the caller's after the thread exits
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.conn:
+            for table, records in payloads:
+                rows = [_as_dict(r) for r in records]
+                if not rows:
+                    continue
+                for row in rows:
+                    self._table(table, row)
+                cols = self.columns[table]
+                self.conn.executemany(
+                    f"INSERT INTO {_q(table)} ({', '.join(_q(c) for c in cols)}) "
+                    f"VALUES ({', '.join('?' * len(cols))})",
+                    [tuple(row.get(c) for c in cols) for row in rows],
+                )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+class ParquetSink:
+    def __init__(self, archive_writer):
+        self.archive = archive_writer
+
+    def write_batch(self, payloads: list):
+        for arrivals in payloads:
+            self.archive.append(arrivals)
+
+    def close(self):
+        self.archive.close()
+
+class CallbackSink:
+    def __init__(self, callbacks: dict):
+        """key -> callable(*args)"""
+        self.callbacks = callbacks
+
+    def write_batch(self, payloads: list):
+        for key, *args in payloads:
+            self.callbacks[key](*args)
+
+    def close(self):
+        pass
+
+class BackgroundWriter:
+    def __init__(self, sinks: dict, max_queue: int = WRITER_QUEUE_SIZE,
+                 batch_max: int = BATCH_MAX_MESSAGES, batch_wait_seconds: float = BATCH_WAIT_SECONDS):
+        """sinks: name -> sink object (write_batch(payloads), close())"""
+        self.sinks = sinks
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait_seconds
+        self.backpressure_waits = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="poller-writer", daemon=True)
+        self._thread.start()
+
+    # ---- producer side (poll loop) ----
+    async def put(self, sink: str, payload):
+        """Queue one message; waits (without blocking the event loop) while the queue is full."""
+        try:
+            self.queue.put_nowait((sink, payload))
+        except queue.Full:
+            self.backpressure_waits += 1
+            await asyncio.to_thread(self.queue.put, (sink, payload))
+
+    def offer(self, sink: str, payload) -> bool:
+        """Queue one message if there's room, else drop it. For best-effort output (metrics)."""
+        try:
+            self.queue.put_nowait((sink, payload))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        """Write everything still queued, then close every sink."""
+        self.queue.put(None)
+        self._thread.join()
+        for name, sink in self.sinks.items():
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"[WARN] writer sink {name} close failed: {type(e).__name__}: {e}")
+
+    # ---- consumer side (writer thread) ----
+    def _run(self):
+        done = False
+        while not done:
+            msg = self.queue.get()
+            batch = [msg]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_max and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+
+            by_sink = {}
+            for sink, payload in batch:
+                by_sink.setdefault(sink, []).append(payload)
+            for sink, payloads in by_sink.items():
+                try:
+                    self.sinks[sink].write_batch(payloads)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[WARN] writer sink {sink} failed: {type(e).__name__}: {e}")
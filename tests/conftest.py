@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The modules are scripts in src/ that import each other by name
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
@@ -0,0 +1,39 @@
+import csv
+from pathlib import Path
+
+# Tiny hand-written GTFS feeds for the tests
+
+def _write(path: Path, rows: list):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+def write_feed(gtfs_dir: Path, trips: dict, calendar: list = None, calendar_dates: list = None) -> Path:
+    """
+    trips: trip_id -> (route_id, service_id, [(stop_id, "HH:MM:SS"), ...]).
+    calendar: calendar.txt rows (default: service "WK" every day of 2026).
+    calendar_dates: calendar_dates.txt rows (service_id, date, exception_type), if any.
+    """
+    gtfs_dir = Path(gtfs_dir)
+    gtfs_dir.mkdir(parents=True, exist_ok=True)
+    stops = list(dict.fromkeys(s for _r, _svc, visits in trips.values() for s, _t in visits))
+    _write(gtfs_dir / "stops.txt", [{"stop_id": s, "stop_lat": 21.3 + i * 0.01, "stop_lon": -157.8}
+                                    for i, s in enumerate(stops)])
+    routes = list(dict.fromkeys(r for r, _svc, _v in trips.values()))
+    _write(gtfs_dir / "routes.txt", [{"route_id": r, "route_short_name": r} for r in routes])
+    _write(gtfs_dir / "trips.txt", [{"route_id": r, "service_id": svc, "trip_id": t, "direction_id": 0,
+                                     "shape_id": f"{r}_0"} for t, (r, svc, _v) in trips.items()])
+    _write(gtfs_dir / "stop_times.txt", [
+        {"trip_id": t, "arrival_time": hms, "departure_time": hms, "stop_id": s, "stop_sequence": i + 1}
+        for t, (_r, _svc, visits) in trips.items() for i, (s, hms) in enumerate(visits)
+    ])
+    if calendar is None:
+        calendar = [dict({"service_id": "WK", "start_date": "20260101", "end_date": "20261231"},
+                         **{d: 1 for d in ("monday", "tuesday", "wednesday", "thursday", "friday",
+                                           "saturday", "sunday")})]
+    if calendar:
+        _write(gtfs_dir / "calendar.txt", calendar)
+    if calendar_dates:
+        _write(gtfs_dir / "calendar_dates.txt", calendar_dates)
+    return gtfs_dir
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from archive import SCHEMA, ArchiveWriter, list_partitions, read_archive, read_partition
+from records import Arrival, wall_epoch
+
+def _arrival(poll: datetime, trip: str, route: str, stop: str = "983", stop_time: int = None):
+    t = wall_epoch(poll)
+    return Arrival(t, stop, "1", trip, route, "HEADSIGN", "151", "East", "s1", "2/5/2026", "10:34 AM",
+                   t + 240 if stop_time is None else stop_time, 1, 21.3, -157.8, 0)
+
+def _write(archive_dir, segment_max_rows=50_000):
+    w = ArchiveWriter(archive_dir, segment_max_rows=segment_max_rows)
+    w.append([_arrival(datetime(2026, 2, 5, 10, 0), "T1", "23"), _arrival(datetime(2026, 2, 5, 10, 0), "T2", "A LINE")])
+    w.append([_arrival(datetime(2026, 2, 6, 1, 30), "T3", "23")])        # before 3am: Feb 5's service day
+    w.append([_arrival(datetime(2026, 2, 6, 9, 0), "T4", "23", stop_time=0)])
+    w.append([_arrival(datetime(2026, 2, 7, 9, 0), "T5", "")])           # no route
+    w.close()
+
+def test_round_trip_by_partition(tmp_path):
+    _write(tmp_path)
+    parts = [(d, r) for d, r, _folder in list_partitions(tmp_path, date(2026, 2, 1), date(2026, 2, 28))]
+    assert parts == [(date(2026, 2, 5), "23"), (date(2026, 2, 5), "A LINE"),
+                     (date(2026, 2, 6), "23"), (date(2026, 2, 7), "unknown")]
+
+    df = read_archive(tmp_path, date(2026, 2, 5), date(2026, 2, 7))
+    assert list(df.columns) == ["service_date"] + SCHEMA.names
+    assert sorted(df["trip"]) == ["T1", "T2", "T3", "T4", "T5"]
+    row = df[df["trip"] == "T3"].iloc[0]
+    assert row["service_date"] == date(2026, 2, 5)
+    assert row["poll_time"] == pd.Timestamp("2026-02-06 01:30")
+    assert row["stop_time"] == pd.Timestamp("2026-02-06 01:34")
+    assert (row["route"], row["vehicle"], row["estimated"], row["latitude"]) == ("23", "151", 1, 21.3)
+    assert pd.isna(df[df["trip"] == "T4"].iloc[0]["stop_time"])             # unparsed stopTime
+
+def test_date_range_and_route_filters(tmp_path):
+    _write(tmp_path)
+    assert sorted(read_archive(tmp_path, date(2026, 2, 5))["trip"]) == ["T1", "T2", "T3"]
+    assert sorted(read_archive(tmp_path, date(2026, 2, 5), date(2026, 2, 6), routes=["23"])["trip"]) == ["T1", "T3", "T4"]
+    assert list(read_archive(tmp_path, date(2026, 2, 5), routes=["A LINE"])["trip"]) == ["T2"]
+    assert [r for _d, r, _f in list_partitions(tmp_path, date(2026, 2, 6), date(2026, 2, 7))] == ["23", "unknown"]
+
+    df = read_archive(tmp_path, date(2026, 2, 5), columns=["trip", "stop_time"])
+    assert list(df.columns) == ["service_date", "trip", "stop_time"]
+
+def test_nothing_matched_keeps_the_columns(tmp_path):
+    _write(tmp_path)
+    for kwargs in ({"start_date": date(2025, 1, 1)}, {"start_date": date(2026, 2, 5), "routes": ["307"]}):
+        empty = read_archive(tmp_path, **kwargs)
+        assert empty.empty and list(empty.columns) == ["service_date"] + SCHEMA.names
+        assert str(empty["stop_time"].dtype).startswith("datetime64")
+    empty = read_archive(tmp_path / "missing", date(2026, 2, 5), columns=["trip"])
+    assert empty.empty and list(empty.columns) == ["service_date", "trip"]
+    assert list(read_partition(tmp_path / "missing", ["trip", "route"]).columns) == ["trip", "route"]
+
+def test_segments_roll_and_read_back_together(tmp_path):
+    w = ArchiveWriter(tmp_path, segment_max_rows=2)
+    for i in range(5):
+        w.append([_arrival(datetime(2026, 2, 5, 10, i), f"T{i}", "23")])
+        if i == 1:
+            assert len(list(tmp_path.rglob("*.parquet"))) == 1   # rolled at 2 rows, before close()
+    w.close()
+    assert len(list(tmp_path.rglob("*.parquet"))) == 3
+    assert not list(tmp_path.rglob("*.tmp"))
+    assert list(read_archive(tmp_path, date(2026, 2, 5))["trip"]) == [f"T{i}" for i in range(5)]
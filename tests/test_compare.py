@@ -0,0 +1,48 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import compare
+from archive import ArchiveWriter
+from feeds import write_feed
+from gtfs_cache import open_gtfs_cache
+from records import Arrival, wall_epoch
+
+def _arrival(poll: datetime, trip: str, route: str, stop: str, est: datetime, estimated: int = 1):
+    return Arrival(wall_epoch(poll), stop, "1", trip, route, "", "151", "", "", f"{est.month}/{est.day}/{est.year}",
+                   est.strftime("%I:%M %p").lstrip("0"), wall_epoch(est), estimated, 21.3, -157.8, 0)
+
+@pytest.fixture
+def archive(tmp_path):
+    gtfs_dir = write_feed(tmp_path / "gtfs", {
+        "T1": ("23", "WK", [("A", "08:00:00"), ("B", "08:10:00")]),
+        "T2": ("307", "WK", [("B", "09:00:00")]),
+    })
+    w = ArchiveWriter(tmp_path / "archive")
+    for i in range(3):
+        day = datetime(2026, 2, 5 + i)
+        poll = day + timedelta(hours=7, minutes=55)
+        w.append([_arrival(poll, "T1", "23", "A", day + timedelta(hours=8, minutes=i)),
+                  _arrival(poll, "T1", "23", "C", day + timedelta(hours=8, minutes=9))])       # not in GTFS
+        w.append([_arrival(poll, "T2", "307", "B", day + timedelta(hours=9, minutes=2 * i)),
+                  _arrival(poll, "T2", "307", "B", day + timedelta(hours=9), estimated=0)])  # no GPS
+    w.close()
+    return tmp_path / "archive", open_gtfs_cache(gtfs_dir, tmp_path / "compiled")
+
+def test_workers_give_identical_rows(archive):
+    archive_dir, gtfs = archive
+    serial, missing = compare.compare_archive_parallel(archive_dir, date(2026, 2, 5), date(2026, 2, 7), gtfs, workers=1)
+    pooled, pooled_missing = compare.compare_archive_parallel(archive_dir, date(2026, 2, 5), date(2026, 2, 7), gtfs,
+                                                              workers=2)
+    assert serial.equals(pooled)
+    assert missing == pooled_missing == 3
+    assert sorted(serial["diff_minutes"]) == [0, 0, 1, 2, 2, 4]
+
+def test_workers_none_stays_in_process_for_short_ranges(archive, monkeypatch):
+    archive_dir, gtfs = archive
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("pool started")
+    monkeypatch.setattr(compare, "ProcessPoolExecutor", no_pool)
+    rows, _ = compare.compare_archive_parallel(archive_dir, date(2026, 2, 5), date(2026, 2, 7), gtfs, workers=None)
+    assert len(rows) == 6
@@ -0,0 +1,49 @@
+import pytest
+
+import fetch
+from fetch import CircuitBreaker
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fetch.time, "monotonic", lambda: now[0])
+    return now
+
+def test_opens_after_threshold_and_probes_once_per_cooldown(clock):
+    b = CircuitBreaker(failure_threshold=3, reset_seconds=10, max_reset_seconds=40)
+    assert not b.record_failure()
+    assert not b.record_failure()
+    assert b.record_failure()
+    assert b.is_open
+
+    assert not b.probe_due()           # still cooling down
+    clock[0] += 10
+    assert b.probe_due()
+    assert not b.probe_due()           # one probe in flight at a time
+
+def test_failed_probe_reopens_with_doubled_cooldown(clock):
+    b = CircuitBreaker(failure_threshold=1, reset_seconds=10, max_reset_seconds=25)
+    assert b.record_failure()
+    for cooldown in (20, 25, 25):      # doubled, then capped at max_reset_seconds
+        clock[0] += b.reset_seconds
+        assert b.probe_due()
+        assert b.record_failure()
+        assert b.reset_seconds == cooldown
+        clock[0] += cooldown - 1
+        assert not b.probe_due()
+        clock[0] -= cooldown - 1
+
+def test_success_closes_and_resets(clock):
+    b = CircuitBreaker(failure_threshold=2, reset_seconds=10, max_reset_seconds=40)
+    b.record_failure()
+    b.record_failure()
+    clock[0] += 10
+    assert b.probe_due()
+    b.record_failure()
+    clock[0] += b.reset_seconds
+    assert b.probe_due()
+    b.record_success()
+
+    assert not b.is_open and b.failures == 0 and b.reset_seconds == 10
+    assert not b.record_failure()      # needs the full threshold again
+    assert b.record_failure()
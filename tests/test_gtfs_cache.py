@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+
+import gtfs_cache
+from feeds import write_feed
+from gtfs_cache import MISSING_TIME, GTFSCache, compile_gtfs, current_version_dir, open_gtfs_cache
+
+TRIPS = {
+    "T1": ("23", "WK", [("A", "08:00:00"), ("B", "08:10:00"), ("A", "08:30:00")]),
+    "T2": ("23", "WK", [("B", "09:00:00"), ("C", "24:15:00")]),
+}
+
+def test_lookup_and_stop_times(tmp_path):
+    gtfs = open_gtfs_cache(write_feed(tmp_path / "gtfs", TRIPS), tmp_path / "compiled")
+    got = gtfs.lookup_arrival(["T1", "T1", "T2", "T2", "NOPE"], ["A", "B", "C", "A", "A"])
+    # A repeated stop keeps its first visit; after-midnight times stay past 24h
+    assert got.tolist() == [8 * 3600, 8 * 3600 + 600, 24 * 3600 + 900, MISSING_TIME, MISSING_TIME]
+
+    st = gtfs.stop_times_for_trips(["T2", "NOPE"])
+    assert st["trip_id"].tolist() == ["T2", "T2"]
+    assert st["stop_id"].tolist() == ["B", "C"]
+
+def test_empty_schedule_finds_nothing(tmp_path):
+    gtfs_dir = write_feed(tmp_path / "gtfs", TRIPS)
+    with open(gtfs_dir / "stop_times.txt", "r+", encoding="utf-8") as f:
+        header = f.readline()
+        f.seek(0)
+        f.truncate()
+        f.write(header)
+    gtfs = open_gtfs_cache(gtfs_dir, tmp_path / "compiled")
+    assert len(gtfs.sched_key) == 0
+    assert gtfs.lookup_arrival(["T1"], ["A"]).tolist() == [MISSING_TIME]
+
+def test_unchanged_feed_reuses_the_current_version(tmp_path):
+    gtfs_dir = write_feed(tmp_path / "gtfs", TRIPS)
+    first = open_gtfs_cache(gtfs_dir, tmp_path / "compiled")
+    os.utime(gtfs_dir / "trips.txt")       # mtime moves, contents don't
+    second = open_gtfs_cache(gtfs_dir, tmp_path / "compiled")
+    assert second.cache_dir == first.cache_dir
+
+def test_recompile_switches_version_and_old_handle_keeps_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr(gtfs_cache, "CLEANUP_AFTER_SECONDS", -1)   # delete superseded versions at once
+    cache_dir = tmp_path / "compiled"
+    gtfs_dir = write_feed(tmp_path / "gtfs", TRIPS)
+    old = open_gtfs_cache(gtfs_dir, cache_dir)
+
+    write_feed(gtfs_dir, {"T1": ("23", "WK", [("A", "10:00:00")])})
+    new = open_gtfs_cache(gtfs_dir, cache_dir)
+
+    assert new.cache_dir != old.cache_dir
+    assert current_version_dir(cache_dir) == new.cache_dir
+    assert json.loads((cache_dir / "current.json").read_text())["version"] == new.cache_dir.name
+    assert not old.cache_dir.exists()
+    # The old handle mapped its arrays at open, so it still sees its own build
+    assert old.lookup_arrival(["T1"], ["A"]).tolist() == [8 * 3600]
+    assert new.lookup_arrival(["T1"], ["A"]).tolist() == [10 * 3600]
+    # Another process given the version folder opens that exact build
+    assert GTFSCache(new.cache_dir).cache_dir == new.cache_dir
+
+def test_superseded_versions_wait_out_the_grace_period(tmp_path):
+    cache_dir = tmp_path / "compiled"
+    gtfs_dir = write_feed(tmp_path / "gtfs", TRIPS)
+    first = compile_gtfs(gtfs_dir, cache_dir)
+    second = compile_gtfs(gtfs_dir, cache_dir)
+    assert first != second
+    assert first.exists()
+    assert current_version_dir(cache_dir) == second
+
+def test_old_unversioned_layout_is_replaced(tmp_path):
+    cache_dir = tmp_path / "compiled"
+    cache_dir.mkdir()
+    np.save(cache_dir / "sched_key.npy", np.array([1]))
+    (cache_dir / "manifest.json").write_text(json.dumps({"version": gtfs_cache.CACHE_VERSION, "sources": {}}))
+    (cache_dir / "vocab.json").write_text("{}")
+
+    gtfs = open_gtfs_cache(write_feed(tmp_path / "gtfs", TRIPS), cache_dir)
+    assert gtfs.cache_dir.parent == cache_dir
+    assert not (cache_dir / "manifest.json").exists()
+    assert not (cache_dir / "sched_key.npy").exists()
+    assert GTFSCache(cache_dir).cache_dir == gtfs.cache_dir
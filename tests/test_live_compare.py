@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from feeds import write_feed
+from gtfs_cache import open_gtfs_cache
+from live_compare import StreamingComparator
+from records import Arrival, wall_epoch
+
+def _arrival(poll_time, trip, stop, route, est: datetime):
+    stop_time = wall_epoch(est)
+    return Arrival(poll_time, stop, "1", trip, route, "", "v1", "", "", f"{est.month}/{est.day}/{est.year}",
+                   est.strftime("%I:%M %p").lstrip("0"), stop_time, 1, 21.3, -157.8, 0)
+
+@pytest.fixture
+def comparator(tmp_path):
+    gtfs_dir = write_feed(tmp_path / "gtfs", {
+        "LATE": ("23", "WK", [("A", "24:00:00"), ("B", "24:30:00")]),
+        "DAY": ("23", "WK", [("A", "00:20:00"), ("B", "00:35:00")]),
+        "HOLIDAY": ("A", "HOL", [("A", "00:25:00")]),
+    }, calendar_dates=[{"service_id": "HOL", "date": "20261225", "exception_type": 1}])
+    gtfs = open_gtfs_cache(gtfs_dir, tmp_path / "compiled")
+    return StreamingComparator(gtfs, gtfs_dir)
+
+def test_after_midnight_trip_is_measured_from_its_service_day(comparator):
+    poll = wall_epoch(datetime(2026, 2, 6, 0, 30))
+    rows = comparator.update(poll, [
+        _arrival(poll, "LATE", "B", "23", datetime(2026, 2, 6, 0, 30)),   # yesterday's 24:30:00, on time
+        _arrival(poll, "DAY", "B", "23", datetime(2026, 2, 6, 0, 38)),    # today's 00:35:00, 3 min late
+        _arrival(poll, "HOLIDAY", "A", "A", datetime(2026, 2, 6, 0, 31)),  # not running either day
+    ])
+    diffs = {r["trip_id"]: r["diff_minutes"] for r in rows}
+    assert diffs == {"LATE": 0.0, "DAY": 3.0}
+    assert rows[0]["scheduled_arrival_time"] == "24:30:00"
+
+    summary = comparator.summary(poll)
+    assert summary["service_date"] == "2026-02-05"       # before 3am: still yesterday's service day
+    assert (summary["matched"], summary["unmatched"]) == (2, 1)
+    assert summary["routes"]["23"]["mean_diff_minutes"] == 1.5
+    assert summary["routes"]["23"]["early_share"] == 0.0
+
+def test_new_prediction_replaces_the_old_one(comparator):
+    t0 = wall_epoch(datetime(2026, 2, 6, 0, 10))
+    comparator.update(t0, [_arrival(t0, "LATE", "B", "23", datetime(2026, 2, 6, 0, 40))])
+    t1 = t0 + 60
+    comparator.update(t1, [_arrival(t1, "LATE", "B", "23", datetime(2026, 2, 6, 0, 32))])
+    stop = comparator.summary(t1)["stops"]["B"]
+    assert (stop["n"], stop["mean_diff_minutes"]) == (1, 2.0)
+
+    # Gone quiet: leaves memory, keeps its last diff in the aggregates
+    comparator.update(t1 + 21 * 60, [])
+    summary = comparator.summary(t1 + 21 * 60)
+    assert summary["open_pairs"] == 0 and summary["stops"]["B"]["n"] == 1
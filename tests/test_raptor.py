@@ -0,0 +1,118 @@
+import csv
+import random
+
+import numpy as np
+import pytest
+
+from gtfs_cache import open_gtfs_cache
+from raptor import UNREACHED, build_network
+
+# GRID x GRID intersections ~550 m apart (too far to walk). Row routes stop at s<r>_<c>,
+# column routes at t<r>_<c> ~90 m away, so changing lines takes a walk and a transfer.
+GRID = 6
+SPACING_DEG = 0.005
+SIBLING_DEG = 0.0008
+
+def _write(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+def _hms(secs):
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+@pytest.fixture(scope="module")
+def feed(tmp_path_factory):
+    """Small random grid network: (TransitNetwork, trips as [(stop_ids, arrivals, departures)])."""
+    rng = random.Random(7)
+    root = tmp_path_factory.mktemp("feed")
+    coords = {}
+    for r in range(GRID):
+        for c in range(GRID):
+            coords[f"s{r}_{c}"] = (21.30 + r * SPACING_DEG, -157.85 + c * SPACING_DEG)
+            coords[f"t{r}_{c}"] = (21.30 + r * SPACING_DEG + SIBLING_DEG, -157.85 + c * SPACING_DEG)
+    lines = [[f"s{r}_{c}" for c in range(GRID)] for r in range(GRID)] \
+        + [[f"t{r}_{c}" for r in range(GRID)] for c in range(0, GRID, 2)]
+
+    trips_txt, stop_times, trips, variants = [], [], [], {}
+    for li, stops in enumerate(lines):
+        route = f"R{li}"
+        for direction, seq in ((0, stops), (1, stops[::-1])):
+            shape = f"{route}_{direction}"
+            variants.setdefault(route, {"variants": []})["variants"].append({
+                "shapeID": shape,
+                "by_direction": {str(direction): {"stops_ordered": [
+                    {"stop_id": s, "stop_lat": coords[s][0], "stop_lon": coords[s][1]} for s in seq]}},
+            })
+            for k in range(rng.randint(3, 6)):
+                trip = f"{shape}_{k}"
+                trips_txt.append({"route_id": route, "service_id": "WK", "trip_id": trip,
+                                  "direction_id": direction, "shape_id": shape})
+                # Random hop and dwell times, so some trips overtake others
+                t, arr, dep = rng.randint(7 * 3600, 9 * 3600), [], []
+                for i, s in enumerate(seq):
+                    if i:
+                        t += rng.randint(60, 300)
+                    arr.append(t)
+                    t += rng.choice([0, 0, 30])
+                    dep.append(t)
+                    stop_times.append({"trip_id": trip, "arrival_time": _hms(arr[-1]),
+                                       "departure_time": _hms(dep[-1]), "stop_id": s, "stop_sequence": i + 1})
+                trips.append((seq, arr, dep))
+
+    gtfs_dir = root / "thebus_gtfs"
+    gtfs_dir.mkdir()
+    _write(gtfs_dir / "stops.txt", [{"stop_id": s, "stop_lat": lat, "stop_lon": lon} for s, (lat, lon) in coords.items()])
+    _write(gtfs_dir / "routes.txt", [{"route_id": f"R{i}", "route_short_name": f"R{i}"} for i in range(len(lines))])
+    _write(gtfs_dir / "trips.txt", trips_txt)
+    _write(gtfs_dir / "stop_times.txt", stop_times)
+    network = build_network(variants, open_gtfs_cache(gtfs_dir, root / "compiled"))
+    return network, trips
+
+def brute_force(network, trips, origin, depart):
+    """Earliest arrivals with unlimited transfers: relax every trip and walk until nothing improves."""
+    best = np.full(network.n_stops, UNREACHED, dtype=np.int64)
+    best[network.stop_code[origin]] = depart
+    changed = True
+    while changed:
+        changed = False
+        for i, j, w in zip(network.transfer_from, network.transfer_to, network.transfer_seconds):
+            if best[i] + w < best[j]:
+                best[j] = best[i] + w
+                changed = True
+        for seq, arr, dep in trips:
+            boarded = False
+            for s, a, d in zip(seq, arr, dep):
+                code = network.stop_code[s]
+                if boarded and a < best[code]:
+                    best[code] = a
+                    changed = True
+                boarded = boarded or best[code] <= d
+    return best
+
+def test_network_has_only_sibling_walks(feed):
+    network, _ = feed
+    walks = {(network.stop_ids[i], network.stop_ids[j]) for i, j in zip(network.transfer_from, network.transfer_to)}
+    assert ("s0_0", "t0_0") in walks and ("t0_0", "s0_0") in walks
+    assert all(a[1:] == b[1:] for a, b in walks)
+
+def test_transfers_extend_reach(feed):
+    network, trips = feed
+    one_trip = network.earliest_arrival({"s0_0": 0}, 7 * 3600, max_transfers=0)
+    many = network.earliest_arrival({"s0_0": 0}, 7 * 3600, max_transfers=50)
+    assert (many < UNREACHED).sum() > (one_trip < UNREACHED).sum()
+
+@pytest.mark.parametrize("origin,depart", [("s0_0", 7 * 3600), ("t3_2", 7 * 3600 + 1800), ("s5_5", 8 * 3600 + 600), ("s2_3", 8 * 3600)])
+def test_earliest_arrival_matches_brute_force(feed, origin, depart):
+    network, trips = feed
+    got = network.earliest_arrival({origin: 0}, depart, max_transfers=50)
+    np.testing.assert_array_equal(got, brute_force(network, trips, origin, depart))
+
+def test_isochrone_is_within_budget(feed):
+    network, trips = feed
+    iso = network.isochrone({"s0_0": 0}, 7 * 3600, 20 * 60)
+    assert iso["stop_id"].iloc[0] == "s0_0"
+    assert (iso["minutes"] <= 20).all()
+    ref = brute_force(network, trips, "s0_0", 7 * 3600)
+    assert len(iso) <= int((ref <= 7 * 3600 + 20 * 60).sum())
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+
+from poller import api_stop_object, filter_gps_arrivals, route_output
+from records import Arrival, StopPoll, from_wall_epoch, parse_api_stop_time, wall_epoch
+
+PAYLOAD = {
+    "stop": "983",
+    "timestamp": "10:30:01 AM",
+    "arrivals": [
+        {"id": "1", "trip": "T1", "route": "23", "headsign": "HAWAII KAI", "vehicle": "151",
+         "direction": "East", "stopTime": "10:34 AM", "date": "2/5/2026", "estimated": "1",
+         "longitude": "-157.8600000", "latitude": "21.3000", "shape": "23001", "canceled": "0",
+         "extraField": "kept"},
+        {"id": "2", "trip": "T2", "route": "A", "stopTime": "10:40 AM", "date": "2/5/2026", "estimated": "0"},
+        {"id": "3", "trip": "T3", "route": "A", "headsign": "UH", "vehicle": "152",
+         "stopTime": "12:05 PM", "date": "2/5/2026", "estimated": "1"},
+    ],
+    "note": "outer fields after arrivals stay where they are",
+}
+
+def _poll():
+    gps = filter_gps_arrivals(PAYLOAD)
+    return StopPoll.from_api(wall_epoch(datetime(2026, 2, 5, 10, 30)), "983", PAYLOAD, gps), gps
+
+def test_wall_epoch_round_trip():
+    dt = datetime(2026, 2, 5, 23, 59)
+    assert from_wall_epoch(wall_epoch(dt)) == dt
+    assert parse_api_stop_time("2/5/2026", "12:05 PM") == wall_epoch(datetime(2026, 2, 5, 12, 5))
+    assert parse_api_stop_time("", "soon") == 0
+
+def test_from_api_keeps_gps_arrivals_as_compact_records():
+    poll, _ = _poll()
+    assert [a.trip for a in poll.arrivals] == ["T1", "T3"]
+    a = poll.arrivals[0]
+    assert (a.stop_id, a.route, a.estimated, a.canceled) == ("983", "23", 1, 0)
+    assert a.stop_time == wall_epoch(datetime(2026, 2, 5, 10, 34))
+    assert (a.latitude, a.longitude) == (21.3, -157.86)
+    # Categorical strings are interned: every record shares one object per value
+    again = StopPoll.from_api(0, "983", PAYLOAD, [PAYLOAD["arrivals"][0]]).arrivals[0]
+    assert a.headsign is again.headsign and a.stopTime is again.stopTime
+    assert not hasattr(a, "__dict__") and "raw" not in Arrival.__slots__
+    assert poll.arrivals[1].latitude != poll.arrivals[1].latitude   # missing -> nan
+
+def test_snapshot_is_the_api_payload_with_only_gps_arrivals():
+    poll, gps = _poll()
+    api_stops = {"983": api_stop_object(PAYLOAD, gps)}
+    expected = dict(PAYLOAD, arrivals=[PAYLOAD["arrivals"][0], PAYLOAD["arrivals"][2]])
+
+    out = route_output({"stop_ids": ["983", "12"]}, {"983": poll}, api_stops)
+    assert json.dumps(out, indent=2) == json.dumps([expected], indent=2)
+
+    only_23 = route_output({"stop_ids": ["983"], "only_route": "23"}, {"983": poll}, api_stops)
+    assert only_23 == [dict(PAYLOAD, arrivals=[PAYLOAD["arrivals"][0]])]
+    assert route_output({"stop_ids": ["983"], "only_route": "307"}, {"983": poll}, api_stops) == []
+
+def test_route_output_stop_fields_keeps_parse_routes_shape():
+    poll, gps = _poll()
+    api_stops = {"983": api_stop_object(PAYLOAD, gps)}
+    out = route_output({"stop_ids": ["983"], "stop_fields": ("stop", "timestamp")}, {"983": poll}, api_stops)
+    assert out == [{"stop": "983", "timestamp": "10:30:01 AM", "arrivals": gps}]
+    assert list(out[0]) == ["stop", "timestamp", "arrivals"]
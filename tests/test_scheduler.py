@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+import scheduler
+from scheduler import AdaptiveStopScheduler, DeferredRequest, TickScheduler, TokenBucket
+
+def test_stops_left_out_of_a_cycle_stay_due():
+    # Deferred and circuit-open stops are never requested, so the poller leaves them out
+    sched = AdaptiveStopScheduler(["A", "B", "C"], [["A", "B", "C"]], lookahead_stops=1)
+    sched.end_cycle({"A": False, "B": None})
+    assert sorted(sched.due_stops()) == ["B", "C"]
+
+def test_idle_stops_back_off_up_to_the_cap():
+    sched = AdaptiveStopScheduler(["A"], [], max_interval_cycles=4)
+    polled = []
+    for cycle in range(12):
+        if sched.due_stops():
+            polled.append(cycle)
+            sched.end_cycle({"A": False})
+        else:
+            sched.end_cycle({})
+    # Every 2, 4, then capped at 4 cycles
+    assert polled == [0, 2, 6, 10]
+
+def test_hot_stop_polls_every_cycle_and_warms_the_next_stops():
+    sched = AdaptiveStopScheduler(["A", "B", "C", "D"], [["A", "B", "C", "D"]], lookahead_stops=2)
+    sched.end_cycle({sid: False for sid in "ABCD"})     # all idle: next due in 2 cycles
+    assert sched.due_stops() == []
+    sched.end_cycle({})
+    sched.end_cycle({"A": True, "B": False, "C": False, "D": False})
+    # A is hot; B and C come right after it, so a False from them this cycle doesn't count
+    assert sorted(sched.due_stops()) == ["A", "B", "C"]
+    assert sched.interval["D"] == 4
+
+def test_failed_requests_retry_next_cycle_without_backing_off():
+    sched = AdaptiveStopScheduler(["A"], [])
+    sched.end_cycle({"A": False})
+    sched.end_cycle({})
+    sched.end_cycle({"A": None})
+    assert sched.due_stops() == ["A"]
+    assert sched.interval["A"] == 2
+
+def test_token_bucket_refuses_past_the_deadline_without_taking_a_token():
+    async def go():
+        bucket = TokenBucket(10, burst=2)
+        assert await bucket.acquire() and await bucket.acquire()
+        assert not await bucket.acquire(deadline=time.monotonic() + 0.01)
+        t0 = time.monotonic()
+        assert await bucket.acquire()
+        return time.monotonic() - t0
+    assert 0.05 < asyncio.run(go()) < 0.5
+    assert asyncio.run(TokenBucket(0).acquire(deadline=0))          # rate <= 0: no limit
+
+def test_ticks_land_on_the_wall_clock_grid_and_count_skips(monkeypatch):
+    clock = iter([1000.5, 1010.0, 1010.0, 1150.0, 1150.0])
+    monkeypatch.setattr(scheduler.time, "time", lambda: next(clock))
+
+    async def no_sleep(_seconds):
+        pass
+    monkeypatch.setattr(scheduler.asyncio, "sleep", no_sleep)
+
+    async def go():
+        ticks = TickScheduler(60)
+        assert await ticks.wait_for_tick() == 1000.5     # first tick starts right away
+        assert await ticks.wait_for_tick() == 1020
+        assert ticks.skipped_ticks == 0
+        assert await ticks.wait_for_tick() == 1200       # the cycle ran past 1080 and 1140
+        assert ticks.skipped_ticks == 2
+    asyncio.run(go())
+
+def test_requests_past_the_tick_deadline_are_deferred():
+    async def go():
+        ticks = TickScheduler(0.2, spread_fraction=1.0, deadline_fraction=0.5)
+        await ticks.wait_for_tick()
+        await ticks.slot(1, 4)                            # released 0.05 s into the tick
+        with pytest.raises(DeferredRequest):
+            await ticks.slot(3, 4)                        # 0.15 s is past the 0.1 s deadline
+    asyncio.run(go())
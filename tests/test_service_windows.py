@@ -0,0 +1,51 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from feeds import write_feed
+from gtfs_cache import open_gtfs_cache
+from service_windows import ServiceWindows, active_service_ids, merge_intervals
+
+WEEKDAYS_ONLY = [dict({"service_id": "WK", "start_date": "20260101", "end_date": "20261231"},
+                      **{d: int(d not in ("saturday", "sunday")) for d in
+                         ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")})]
+
+def _feed(tmp_path, calendar_dates=None):
+    return write_feed(tmp_path / "gtfs", {
+        "AM": ("307", "WK", [("A", "07:00:00"), ("B", "07:30:00")]),
+        "LATE": ("307", "WK", [("A", "24:10:00")]),
+    }, calendar=WEEKDAYS_ONLY, calendar_dates=calendar_dates)
+
+def test_active_service_ids(tmp_path):
+    gtfs_dir = _feed(tmp_path, calendar_dates=[
+        {"service_id": "WK", "date": "20260216", "exception_type": 2},    # holiday Monday
+        {"service_id": "SAT", "date": "20260216", "exception_type": 1},
+    ])
+    assert active_service_ids(gtfs_dir, date(2026, 2, 5)) == {"WK"}       # Thursday
+    assert active_service_ids(gtfs_dir, date(2026, 2, 7)) == set()        # Saturday
+    assert active_service_ids(gtfs_dir, date(2026, 2, 16)) == {"SAT"}
+    assert active_service_ids(gtfs_dir, date(2027, 1, 4)) == set()        # past end_date
+    assert active_service_ids(tmp_path, date(2026, 2, 5)) is None         # no calendar files
+
+def test_merge_intervals():
+    out = merge_intervals(np.array([1, 1, 1, 2, 1]), np.array([0, 5, 30, 0, 2]), np.array([10, 8, 40, 5, 3]))
+    assert out == {1: [(0, 10), (30, 40)], 2: [(0, 5)]}
+    assert merge_intervals(np.array([]), np.array([]), np.array([])) == {}
+
+def test_active_stops_follow_the_schedule(tmp_path):
+    gtfs_dir = _feed(tmp_path)
+    routes = [{"route_key": "307", "stop_ids": ["A", "B", "X"]}, {"route_key": "NOT IN FEED", "stop_ids": ["Z"]}]
+    windows = ServiceWindows(gtfs_dir, open_gtfs_cache(gtfs_dir, tmp_path / "compiled"), routes,
+                             lead_minutes=20, lag_minutes=30)
+    stops = ["A", "B", "X", "Z"]
+
+    def active(*when):
+        return windows.active_stops(stops, datetime(2026, 2, *when))
+
+    assert active(5, 6, 30) == ["Z"]                   # before A's 06:40 lead
+    assert active(5, 6, 45) == ["A", "X", "Z"]         # X has no visits: route window (06:40-08:00)
+    assert active(5, 7, 25) == ["A", "B", "X", "Z"]
+    assert active(5, 7, 45) == ["B", "X", "Z"]         # A's 07:00 visit + 30 min lag is over
+    assert active(5, 8, 5) == ["Z"]
+    assert active(6, 0, 15) == ["A", "X", "Z"]         # Thursday's 24:10:00 trip
+    assert active(7, 7, 0) == ["Z"]                    # Saturday: no service
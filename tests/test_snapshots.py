@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+
+from snapshots import DeltaSnapshotWriter, iter_snapshots, read_snapshot
+
+STOPS = ["983", "12", "40", "7", "311"]
+
+def _arrival(rng, trip):
+    return {
+        "id": str(rng.randint(1, 99999)), "trip": trip, "route": rng.choice(["23", "A"]),
+        "headsign": "HAWAII KAI", "vehicle": str(rng.randint(100, 999)), "direction": "East",
+        "stopTime": f"{rng.randint(1, 12)}:{rng.randint(0, 59):02d} AM", "date": "2/5/2026",
+        "estimated": "1", "longitude": "-157.7", "latitude": "21.3", "shape": "23001", "canceled": "0",
+    }
+
+def _cycles(n, seed=1):
+    """Consecutive route snapshots with the churn a real route sees."""
+    rng = random.Random(seed)
+    state = {s: [_arrival(rng, f"t{rng.randint(1, 8)}") for _ in range(rng.randint(1, 3))] for s in STOPS[:3]}
+    for _ in range(n):
+        for stop in STOPS:
+            r = rng.random()
+            if r < 0.15:
+                state.pop(stop, None)
+            elif r < 0.35:
+                state.setdefault(stop, []).append(_arrival(rng, f"t{rng.randint(1, 8)}"))  # may repeat a trip
+            elif r < 0.5 and state.get(stop):
+                state[stop][0] = dict(state[stop][0], stopTime="11:59 AM")
+            elif r < 0.6 and state.get(stop):
+                rng.shuffle(state[stop])
+            elif r < 0.7 and state.get(stop):
+                state[stop].pop()
+        yield [{"stop": s, "timestamp": f"10:{rng.randint(0, 59):02d} AM", "arrivals": [dict(a) for a in state[s]]}
+               for s in STOPS if state.get(s)]
+
+def test_read_snapshot_reproduces_every_cycle(tmp_path):
+    writer = DeltaSnapshotWriter(tmp_path, STOPS, keyframe_every=4)
+    start = datetime(2026, 2, 5, 10, 0)
+    written = []
+    for i, output in enumerate(_cycles(25)):
+        t = start + timedelta(minutes=i)
+        writer.write(t, output)
+        written.append((t, output))
+
+    for t, output in written:
+        assert read_snapshot(tmp_path, t) == output
+    assert list(iter_snapshots(tmp_path)) == written
+    # Between cycles: the last one written before
+    assert read_snapshot(tmp_path, written[6][0] + timedelta(seconds=30)) == written[6][1]
+    assert read_snapshot(tmp_path, start - timedelta(minutes=1)) == []
+
+def test_new_service_day_starts_with_a_keyframe(tmp_path):
+    writer = DeltaSnapshotWriter(tmp_path, STOPS, keyframe_every=100)
+    outputs = list(_cycles(2, seed=3))
+    before, after = datetime(2026, 2, 6, 2, 59), datetime(2026, 2, 6, 3, 0)   # service day starts at 3am
+    writer.write(before, outputs[0])
+    writer.write(after, outputs[1])
+
+    assert (tmp_path / "2026-02-06.jsonl").read_text().startswith('{"time":"2026-02-06T03:00:00","type":"key"')
+    assert read_snapshot(tmp_path, before) == outputs[0]
+    assert read_snapshot(tmp_path, after) == outputs[1]
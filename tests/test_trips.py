@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from feeds import write_feed
+from gtfs_cache import open_gtfs_cache
+from records import Arrival, StopPoll, wall_epoch
+from trips import TripTracker, service_day_delay
+
+T0 = datetime(2026, 2, 5, 8, 0)
+
+def _at(minutes: float) -> int:
+    return wall_epoch(T0 + timedelta(minutes=minutes))
+
+def _polls(poll_min: float, stops: dict) -> dict:
+    """stops: stop_id -> [(trip, predicted minute), ...]; every stop listed was polled."""
+    poll = _at(poll_min)
+    return {sid: StopPoll(sid, "", poll, tuple(
+        Arrival(poll, sid, "1", trip, "23", "HAWAII KAI", "151", "East", "s1", "2/5/2026", "", _at(m), 1, 21.3,
+                -157.8, 0)
+        for trip, m in preds
+    )) for sid, preds in stops.items()}
+
+def test_service_day_delay():
+    at = wall_epoch(datetime(2026, 2, 6, 0, 12))
+    assert service_day_delay(at, 24 * 3600 + 600) == 120           # yesterday's 24:10:00
+    assert service_day_delay(at, 23 * 3600 + 50 * 60) == 22 * 60   # yesterday's 23:50:00
+    assert service_day_delay(at, 5 * 60) == 7 * 60
+    arr = service_day_delay(np.array([at, at]), np.array([24 * 3600 + 600, 5 * 60]))
+    assert arr.tolist() == [120, 7 * 60]
+
+def test_trip_dropping_off_a_polled_stop_is_an_arrival():
+    tracker = TripTracker()
+    assert tracker.update(_at(0), _polls(0, {"A": [("T1", 2)], "B": [("T1", 6)]})) == []
+    assert tracker.update(_at(1), _polls(1, {"A": [("T1", 3)], "B": [("T1", 7)]})) == []
+
+    # A no longer lists T1; B wasn't polled this cycle, so it's still pending
+    out = tracker.update(_at(4), _polls(4, {"A": []}))
+    assert [(o.trip, o.stop_id) for o in out] == [("T1", "A")]
+    o = out[0]
+    assert (o.arrival_time, o.first_prediction, o.predictions, o.last_seen) == (_at(3), _at(2), 2, _at(1))
+    assert o.to_dict()["stopTime"] == "8:03 AM"
+    assert "delay_minutes" not in o.to_dict()
+
+    # Gone from B too; the last prediction (8:07) is after this poll, so it's clamped to 8:05
+    out = tracker.update(_at(5), _polls(5, {"A": [], "B": []}))
+    assert [(o.stop_id, o.arrival_time) for o in out] == [("B", _at(5))]
+
+def test_prediction_vanishing_far_ahead_is_not_an_arrival():
+    tracker = TripTracker(arrival_slack_seconds=300)
+    tracker.update(_at(0), _polls(0, {"A": [("T1", 20)]}))
+    assert tracker.update(_at(1), _polls(1, {"A": []})) == []
+    # Nor is the trip reported there later
+    assert tracker.update(_at(2), _polls(2, {"A": [("T1", 2)]})) == []
+    assert tracker.update(_at(3), _polls(3, {"A": []})) == []
+
+def test_gtfs_limits_tracking_to_scheduled_pairs_and_adds_delay(tmp_path):
+    gtfs_dir = write_feed(tmp_path / "gtfs", {"T1": ("23", "WK", [("A", "08:01:00")])})
+    tracker = TripTracker(open_gtfs_cache(gtfs_dir, tmp_path / "compiled"))
+    tracker.update(_at(0), _polls(0, {"A": [("T1", 3), ("NOPE", 3)]}))
+    out = tracker.update(_at(4), _polls(4, {"A": []}))
+    assert [o.trip for o in out] == ["T1"]
+    assert out[0].to_dict()["delay_minutes"] == 2.0
+
+def test_idle_trips_are_evicted():
+    tracker = TripTracker(idle_seconds=600, max_trips=1)
+    tracker.update(_at(0), _polls(0, {"A": [("T1", 30)]}))
+    tracker.update(_at(1), _polls(1, {"B": [("T2", 31)]}))
+    assert list(tracker.trips) == ["T2"]         # over max_trips: least recently seen goes
+    tracker.update(_at(12), _polls(12, {}))
+    assert tracker.trips == {}